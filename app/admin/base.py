@@ -7,6 +7,7 @@ from django.contrib.admin import AdminSite
 from app.admin.file import ImageFileAdmin
 from app.models.book.page import BookPage
 from app.models.book.paragraph import BookParagraph
+from app.models.ocr_job import OcrJob
 from app.models.person_typed import PersonTyped
 from core.models.activity import Activity
 from core.models.address import Address
@@ -76,12 +77,22 @@ class PersonTypedAdmin(admin.ModelAdmin):
     raw_id_fields = ('avatar', )
 
 
+class OcrJobAdmin(admin.ModelAdmin):
+    list_display = ('page', 'status', 'attempts', 'worker', 'lease_expires',
+                    'folder_dst', 'date_done')
+    list_display_links = list_display
+    list_filter = ('status', 'collected')
+    search_fields = ('page', 'worker', 'error')
+    exclude = ('features', )
+
+
 my_admin_site = MyAdminSite(name='my_admin')
 
 # region - app models -
 my_admin_site.register(Book)
 my_admin_site.register(BookPage)
 my_admin_site.register(BookParagraph)
+my_admin_site.register(OcrJob, OcrJobAdmin)
 # endregion - app models -
 
 # region - core models -
@@ -1,4 +1,5 @@
 import sys
+import time
 
 from django.core.management.base import CommandError
 from django.utils.termcolors import colorize
@@ -188,3 +189,44 @@ class OutMixin:
             obj.out_error("An error occurred")
         """
         self.out(msg, **{"is_error": True, **kwargs})
+
+    def out_progress(self, done: int, total, started: float, **kwargs):
+        """
+        Writes a progress line: count, percentage, speed and ETA.
+
+        Args:
+            done: number of items processed so far
+            total: total number of items to process, None if not known yet
+                   (then no percentage nor ETA)
+            started: ``time.monotonic()`` value when the processing started
+            **kwargs: Arbitrary keyword arguments. Any additional flags
+                      for 'out_verbose', and 'unit' (str): the name of the
+                      items (default: "items").
+
+        Returns:
+            None.
+
+        Usage:
+            started = time.monotonic()
+            obj.out_progress(120, 1000, started, unit="pages")
+            # "120/1000 pages (12.0%) - 4.10 pages/s - ETA 0:03:34"
+        """
+        unit = kwargs.pop("unit", "items")
+        elapsed = max(time.monotonic() - started, 1e-9)
+        speed = done / elapsed
+        if total is None:
+            self.out(f"{done} {unit} - {speed:.2f} {unit}/s", **kwargs)
+            return
+        if speed > 0:
+            remaining = int((total - done) / speed)
+            eta = "{}:{:02}:{:02}".format(
+                remaining // 3600, remaining % 3600 // 60, remaining % 60
+            )
+        else:
+            eta = "?"
+        percent = done * 100 / total if total else 100.0
+        self.out(
+            f"{done}/{total} {unit} ({percent:.1f}%) - "
+            f"{speed:.2f} {unit}/s - ETA {eta}",
+            **kwargs,
+        )
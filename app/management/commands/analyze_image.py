@@ -1,22 +1,100 @@
+import itertools
 import json
 import os
+import queue
+import threading
+import time
+import traceback
 from pathlib import Path
-from typing import List, Tuple, Dict, Any
+from typing import List, Set, Tuple, Dict, Any, Iterator, Optional, Callable
 import multiprocessing as mp
 
 import cv2
 import numpy as np
-import pytesseract
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
-from skimage.feature import hog
 
+from app.models.ocr_job import OcrJob
+from app.ocr.consensus import consensus_ocr
+from app.ocr.discovery import (
+    IMAGE_EXTENSIONS,
+    PageDiscovery,
+    output_name,
+    split_page_key,
+)
+from app.ocr.east import (
+    EAST_MODES,
+    EAST_TILE_SIZES,
+    boxes_to_regions,
+    detect_east_boxes,
+    detect_east_boxes_tiled,
+)
+from app.ocr.features import font_patches, hog_features
+from app.ocr.font_store import FontStore
+from app.ocr.job_queue import ENQUEUE_BATCH_SIZE, enqueue, job_result
+from app.ocr.layout import LAYOUT_LEVELS, detect_profile_regions
+from app.ocr.manifest import RunManifest
+from app.ocr.merge import merge_regions
+from app.ocr.preprocess_cache import PreprocessCache
+from app.ocr.profiling import profiler, summarize
+from app.ocr.pyramid import (
+    DENOISE_STRENGTH,
+    SCALES,
+    enhance,
+    enhance_regions,
+    read_image,
+    scale_regions,
+)
+from app.ocr.region_cache import (
+    RegionCache,
+    band_regions,
+    get_region_cache,
+    region_fingerprint,
+)
+from app.ocr.registry import DEFAULT_EAST_MODEL_PATH, init_worker, registry
+from app.ocr.scheduler import SCHEDULES, CoreLayout, available_cpus
+from app.ocr.tesseract import (
+    OCR_MODES,
+    PSM,
+    THRESHOLD_BLOCK,
+    binarize,
+    ocr_each,
+    ocr_mosaic,
+    ocr_page,
+    tesseract_config,
+)
+from app.ocr.triage import (
+    SPARSE_DETECT_SCALE,
+    TRIAGE_MODES,
+    TRIAGE_ROUTES,
+    classify_page,
+    page_statistics,
+    triage_summary,
+)
+from app.ocr.validation import MIN_EDGE_DENSITY, MIN_VARIANCE, filter_regions
+from app.ocr.writer import get_writer
 from ..base.out_mixin import OutMixin
 
 
 class Command(OutMixin, BaseCommand):
     help = "Detect text and analyze fonts in images from a specified folder using multiprocessing"
 
+    # increase it each time a change of the pipeline changes its outputs: the
+    # pages analyzed by a previous version will be analyzed again
+    PIPELINE_VERSION: int = 7
+    FAILURES_FILE_NAME: str = "analyze_failures.jsonl"
+    PROFILE_FILE_NAME: str = "analyze_profile.json"
+    DETECTORS: List[str] = ["mser-east", "profile"]
+    # parameters that don't change the outputs (ignored by the run manifest):
+    RUNTIME_PARAMS: List[str] = [
+        "east_batch",
+        "write_queue",
+        "preprocess_cache",
+    ]
+    ANNOTATE_MODES: List[str] = ["off", "thumbnail", "full"]
+    # biggest side of the annotated image with --annotate=thumbnail:
+    ANNOTATE_THUMBNAIL_SIZE: int = 1024
+
     def __init__(self, stdout=None, stderr=None, no_color=False, force_color=False):
         super().__init__(stdout, stderr, no_color, force_color)
 
@@ -33,11 +111,26 @@ class Command(OutMixin, BaseCommand):
             default="analyzed_images",
             help="Destination folder for results (relative to MEDIA_ROOT)",
         )
+        parser.add_argument(
+            "--extensions",
+            type=str,
+            nargs="+",
+            default=IMAGE_EXTENSIONS,
+            help="Extensions of the files to analyze, case insensitive "
+            f"(default: {' '.join(IMAGE_EXTENSIONS)})",
+        )
+        parser.add_argument(
+            "--sniff",
+            type=int,
+            default=1,
+            help="Check the first bytes of the files and ignore the ones that "
+            "aren't images (0=no, 1=yes), default: 1",
+        )
         parser.add_argument(
             "--max-images",
             type=int,
             default=0,
-            help="Maximum number of images to process (0 = all images)",
+            help="Maximum number of pages to process (0 = all pages)",
         )
         parser.add_argument(
             "--verbose",
@@ -48,8 +141,243 @@ class Command(OutMixin, BaseCommand):
         parser.add_argument(
             "--num-processes",
             type=int,
-            default=mp.cpu_count(),
-            help="Number of processes to use (default: number of CPU cores)",
+            default=len(available_cpus()),
+            help="Number of processes to use (default: number of CPUs available)",
+        )
+        parser.add_argument(
+            "--schedule",
+            type=str,
+            choices=SCHEDULES,
+            default="off",
+            help="CPUs of the workers: 'off' = OpenCV and Tesseract each run "
+            "as many threads as CPUs in every worker, 'shared' = the CPUs "
+            "are shared between the workers and their threads, 'pinned' = "
+            "same and each worker is bound to its CPUs (Linux) "
+            "(default: off)",
+        )
+        parser.add_argument(
+            "--threads-per-process",
+            type=int,
+            default=0,
+            help="With --schedule=shared or pinned: OpenCV and Tesseract "
+            "threads of each worker (default: 0 = CPUs / processes)",
+        )
+        parser.add_argument(
+            "--east-model",
+            type=str,
+            default=DEFAULT_EAST_MODEL_PATH,
+            help=f"EAST model file (default: {DEFAULT_EAST_MODEL_PATH})",
+        )
+        parser.add_argument(
+            "--east-mode",
+            type=str,
+            choices=EAST_MODES,
+            default="resize",
+            help="'resize' = the page is resized to one 320x320 blob, "
+            "'tiled' = overlapping tiles at native resolution, better for "
+            "small print on large scans (default: resize)",
+        )
+        parser.add_argument(
+            "--east-tile",
+            type=int,
+            choices=EAST_TILE_SIZES,
+            default=640,
+            help="With --east-mode=tiled: size of the tiles (default: 640)",
+        )
+        parser.add_argument(
+            "--east-batch",
+            type=int,
+            default=8,
+            help="With --east-mode=tiled: tiles per network call, more = "
+            "faster but more memory (default: 8)",
+        )
+        parser.add_argument(
+            "--warm-models",
+            type=int,
+            default=1,
+            help="Load the models in each worker before the first page "
+            "(0=no, lazy loading, 1=yes), default: 1",
+        )
+        parser.add_argument(
+            "--ocr-mode",
+            type=str,
+            choices=OCR_MODES,
+            default="mosaic",
+            help="Tesseract calls: 'region' = one per region, 'mosaic' = one "
+            "per mosaic of regions, 'page' = one per page (default: mosaic)",
+        )
+        parser.add_argument(
+            "--detector",
+            type=str,
+            choices=self.DETECTORS,
+            default="mser-east",
+            help="Text regions detector: 'mser-east' = MSER + EAST, "
+            "'profile' = projection profiles, fast on book pages "
+            "(default: mser-east)",
+        )
+        parser.add_argument(
+            "--profile-level",
+            type=str,
+            choices=LAYOUT_LEVELS,
+            default="lines",
+            help="With --detector=profile: regions returned (default: lines)",
+        )
+        parser.add_argument(
+            "--detect-scale",
+            type=int,
+            choices=SCALES,
+            default=1,
+            help="Detect text regions on the page reduced this number of "
+            "times, then denoise and OCR only these regions at full "
+            "resolution (default: 1 = everything at full resolution)",
+        )
+        parser.add_argument(
+            "--triage",
+            type=str,
+            choices=TRIAGE_MODES,
+            default="off",
+            help="Classify each page (blank, image, light text, dense text) "
+            "from cheap statistics before the analysis: 'off' = no triage, "
+            "'blank' = blank pages are skipped, 'all' = blank and image-only "
+            "pages are skipped, light text pages detected at a reduced "
+            "scale (default: off)",
+        )
+        parser.add_argument(
+            "--dedupe",
+            type=int,
+            default=0,
+            help="Reuse the text of the single lines of the header and "
+            "footer bands identical, pixel for pixel, to a line already read "
+            "during the run (running headers), cache shared by the workers "
+            "(0=no, 1=yes), default: 0",
+        )
+        parser.add_argument(
+            "--preprocess-cache",
+            type=int,
+            default=0,
+            help="Keep the denoised and equalized pages in the destination "
+            "folder ('preprocessed'), and read them from there on the next "
+            "runs: runs changing only the detection parameters skip the "
+            "denoising (0=no, 1=yes), default: 0",
+        )
+        parser.add_argument(
+            "--denoise-strength",
+            type=float,
+            default=DENOISE_STRENGTH,
+            help="Strength of the denoising of the pages (non-local means "
+            f"filter), see evaluate_ocr (default: {DENOISE_STRENGTH})",
+        )
+        parser.add_argument(
+            "--threshold-block",
+            type=int,
+            default=THRESHOLD_BLOCK,
+            help="Neighbourhood (odd number of pixels) of the adaptive "
+            f"threshold before OCR, see evaluate_ocr (default: {THRESHOLD_BLOCK})",
+        )
+        parser.add_argument(
+            "--min-variance",
+            type=float,
+            default=MIN_VARIANCE,
+            help="With --detector=mser-east: candidate regions with a lower "
+            f"pixel variance are not text (default: {MIN_VARIANCE})",
+        )
+        parser.add_argument(
+            "--min-edge-density",
+            type=float,
+            default=MIN_EDGE_DENSITY,
+            help="With --detector=mser-east: candidate regions with less "
+            f"edges are not text (default: {MIN_EDGE_DENSITY})",
+        )
+        parser.add_argument(
+            "--psm",
+            type=int,
+            default=PSM,
+            help=f"Tesseract page segmentation mode (default: {PSM})",
+        )
+        parser.add_argument(
+            "--consensus",
+            type=int,
+            default=0,
+            help="Regions Tesseract isn't confident about are read again "
+            "under other binarizations (Otsu, Sauvola, wider adaptive "
+            "threshold) until they agree, else their texts are voted per "
+            "character; regions are read as mosaics, whatever --ocr-mode "
+            "(0=no, 1=yes), default: 0",
+        )
+        parser.add_argument(
+            "--merge-padding",
+            type=int,
+            nargs=2,
+            default=[0, 0],
+            metavar=("X", "Y"),
+            help="Regions closer than X pixels horizontally and Y pixels "
+            "vertically are merged: X groups characters into words, Y words "
+            "into lines (default: 0 0 = only overlapping regions)",
+        )
+        parser.add_argument(
+            "--annotate",
+            type=str,
+            choices=self.ANNOTATE_MODES,
+            default="full",
+            help="Image of the page with the text regions drawn: 'off' = "
+            "none, 'thumbnail' = reduced to "
+            f"{self.ANNOTATE_THUMBNAIL_SIZE} pixels, 'full' = full "
+            "resolution (default: full)",
+        )
+        parser.add_argument(
+            "--write-queue",
+            type=int,
+            default=4,
+            help="Pages whose outputs can wait to be written by the "
+            "background writer of each worker before the analysis waits "
+            "for the disk (default: 4)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1,
+            help="Number of pages sent at once to a worker (default: 1 = "
+            "best balancing, increase it for many small pages)",
+        )
+        parser.add_argument(
+            "--max-tasks-per-child",
+            type=int,
+            default=0,
+            help="Replace a worker after it analyzed this number of pages, "
+            "to bound memory on long runs (0 = never), default: 0",
+        )
+        parser.add_argument(
+            "--progress-every",
+            type=float,
+            default=5.0,
+            help="Seconds between two progress lines (0 = no progress), default: 5",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Analyze all the images, even the ones the run manifest "
+            "says are already analyzed with the same parameters",
+        )
+        parser.add_argument(
+            "--distributed",
+            action="store_true",
+            help="Don't analyze the pages here: queue them in the database "
+            "for the 'ocr_worker' of all the nodes, and collect their "
+            "results (source and destination folders must be shared)",
+        )
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=3,
+            help="With --distributed: analyses of a page before it's "
+            "considered failed (default: 3)",
+        )
+        parser.add_argument(
+            "--poll",
+            type=float,
+            default=5.0,
+            help="With --distributed: seconds between two collections of "
+            "the results (default: 5)",
         )
 
     def handle(self, *args: Any, **options: Any) -> None:
@@ -57,324 +385,830 @@ class Command(OutMixin, BaseCommand):
         folder_dst: Path = Path(settings.MEDIA_ROOT, options["folder_dst"])
         max_images: int = options["max_images"]
         verbose: bool = options["verbose"] > 0
-        num_processes: int = options["num_processes"]
+        num_processes: int = max(1, options["num_processes"])
+        east_model: Path = Path(options["east_model"]).resolve()
+        warm_models: bool = options["warm_models"] > 0
+        force: bool = options["force"]
+        distributed: bool = options["distributed"]
+        chunk_size: int = max(1, options["chunk_size"])
+        max_tasks_per_child: int = options["max_tasks_per_child"]
+        progress_every: float = options["progress_every"]
+        params: Dict[str, Any] = {
+            "ocr_mode": options["ocr_mode"],
+            "east_model": str(east_model),
+            "east_mode": options["east_mode"],
+            "east_tile": options["east_tile"],
+            "east_batch": max(1, options["east_batch"]),
+            "detector": options["detector"],
+            "profile_level": options["profile_level"],
+            "merge_padding": tuple(options["merge_padding"]),
+            "detect_scale": options["detect_scale"],
+            "denoise_strength": options["denoise_strength"],
+            "threshold_block": options["threshold_block"],
+            "min_variance": options["min_variance"],
+            "min_edge_density": options["min_edge_density"],
+            "psm": options["psm"],
+            "consensus": options["consensus"] > 0,
+            "triage": options["triage"],
+            "dedupe": options["dedupe"] > 0,
+            "preprocess_cache": options["preprocess_cache"] > 0,
+            "annotate": options["annotate"],
+            "write_queue": max(1, options["write_queue"]),
+        }
 
         if not folder_src.exists() or not folder_src.is_dir():
             raise CommandError(
                 f"Source folder '{folder_src}' does not exist or is not a directory."
             )
 
+        if not east_model.is_file():
+            raise CommandError(f"EAST model file '{east_model}' not found.")
+
+        if params["threshold_block"] < 3 or params["threshold_block"] % 2 == 0:
+            raise CommandError("--threshold-block must be an odd number >= 3.")
+
         folder_dst.mkdir(parents=True, exist_ok=True)
 
-        image_files: List[Path] = list(folder_src.glob("*.jpg")) + list(
-            folder_src.glob("*.png")
+        manifest = RunManifest(
+            folder_dst,
+            {k: v for k, v in params.items() if k not in self.RUNTIME_PARAMS},
+            self.PIPELINE_VERSION,
+        )
+        font_store = FontStore(folder_dst)
+        layout = CoreLayout(
+            options["schedule"], num_processes, options["threads_per_process"]
         )
-        total_images: int = len(image_files)
+        discovery = PageDiscovery(
+            folder_src, options["extensions"], options["sniff"] > 0
+        )
+        # the folder tree is walked while the first pages are analyzed:
+        # pages are filtered and counted as the pool asks for them
+        skipped: int = 0
+        submitted: int = 0
+
+        def pages() -> Iterator[Tuple[str, Path]]:
+            nonlocal skipped
+            for key, image_path, _ in discovery:
+                if not force and manifest.is_done(
+                    key,
+                    image_path,
+                    self.output_paths(folder_dst, output_name(key), params["annotate"]),
+                ):
+                    skipped += 1
+                    continue
+                yield key, image_path
 
+        to_analyze: Iterator[Tuple[str, Path]] = pages()
         if max_images > 0:
-            image_files = image_files[:max_images]
+            to_analyze = itertools.islice(to_analyze, max_images)
 
         self.out_success(
-            f"Processing {len(image_files)} out of {total_images} images found."
+            f"Discovering pages in '{folder_src}' and its sub-folders "
+            f"({', '.join(sorted(discovery.extensions))})."
+        )
+        if distributed:
+            self.out_success("Queuing the pages for the workers (ocr_worker).")
+        else:
+            self.out_success(layout.describe())
+        self.out_success(
+            f"Detector: {params['detector']} (scale 1/{params['detect_scale']})."
         )
-        self.out_success(f"Using {num_processes} processes.")
+        self.out_success(f"OCR mode: {params['ocr_mode']}.")
 
-        with mp.Pool(processes=num_processes) as pool:
-            results = pool.starmap(
-                self.process_image,
-                [(image_path, folder_dst, verbose) for image_path in image_files],
+        failures_file: Path = folder_dst / self.FAILURES_FILE_NAME
+        failures_file.unlink(missing_ok=True)
+        # latest (= cumulated) models stats of each worker:
+        workers: Dict[int, Dict[str, Any]] = {}
+        profiles: List[Dict[str, Any]] = []
+        successful: int = 0
+        failed: int = 0
+        write_failed: int = 0
+        started: float = time.monotonic()
+        last_progress: float = started
+
+        def tasks() -> Iterator[Tuple[Path, Path, bool, Dict[str, Any], str]]:
+            nonlocal submitted
+            for key, image_path in to_analyze:
+                submitted += 1
+                yield image_path, folder_dst, verbose, params, key
+
+        # local pool: the manifest only records the pages whose outputs are
+        # on the disk, reported by the background writers of the workers
+        # after the page itself (or before, then kept in ``written``):
+        analyzed: Dict[str, Path] = {}
+        written: Set[str] = set()
+
+        def record(page: str, image_path: Path) -> None:
+            manifest.record(
+                page,
+                image_path,
+                self.output_paths(folder_dst, output_name(page), params["annotate"]),
             )
 
-        successful = sum(1 for result in results if result)
-        self.out_success(
-            f"Processing completed. Successfully processed {successful} out of {len(image_files)} images."
-        )
+        def report_write(key: str, failure: Optional[Dict[str, str]]) -> None:
+            nonlocal write_failed
+            if failure is not None:
+                write_failed += 1
+                self.record_failure(failures_file, failure)
+            elif key in analyzed:
+                record(key, analyzed.pop(key))
+            else:
+                written.add(key)
 
-    @staticmethod
-    def process_image(image_path: Path, folder_dst: Path, verbose: bool) -> bool:
-        try:
-            image: np.ndarray = cv2.imread(str(image_path))
-            gray: np.ndarray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        def collect(result: Dict[str, Any]) -> None:
+            nonlocal successful, failed, write_failed, last_progress
+            if "models" in result:
+                workers[result["models"]["pid"]] = result["models"]
+            # writes failed in an ocr_worker (its page is failed too):
+            for failure in result.get("write_failures", []):
+                write_failed += 1
+                self.record_failure(failures_file, failure)
+            image_path = Path(result["image"])
+            if result["success"]:
+                successful += 1
+                if "profile" in result:
+                    profiles.append(result["profile"])
+                page = result["page"]
+                font_store.append(
+                    page, result["fonts"]["regions"], result["fonts"]["features"]
+                )
+                if distributed or page in written:
+                    # ocr_worker completes a job once its outputs are written
+                    written.discard(page)
+                    record(page, image_path)
+                else:
+                    analyzed[page] = image_path
+            else:
+                failed += 1
+                self.record_failure(failures_file, result)
+            now = time.monotonic()
+            if progress_every > 0 and now - last_progress >= progress_every:
+                last_progress = now
+                # total known only once the whole tree is walked:
+                self.out_progress(
+                    successful + failed,
+                    submitted if discovery.finished else None,
+                    started,
+                    unit="pages",
+                )
 
-            # Apply denoising and contrast enhancement
-            gray = cv2.fastNlMeansDenoising(gray, None, 10, 7, 21)
-            gray = cv2.equalizeHist(gray)
+        if distributed:
+            self.run_distributed(
+                tasks(),
+                folder_dst,
+                params,
+                options["max_attempts"],
+                options["poll"],
+                collect,
+            )
+        else:
+            # running headers and footers read by any worker of the run:
+            manager = mp.Manager() if params["dedupe"] else None
+            region_cache = manager.dict() if manager is not None else None
+            # writes done by the workers, including the last ones, done when
+            # they exit; moved by a thread so the pipe never fills up:
+            write_reports: mp.Queue = mp.Queue()
+            reports: queue.Queue = queue.Queue()
 
-            text_regions: List[Tuple[int, int, int, int]] = Command.detect_text_regions(
-                gray, image
+            def read_reports() -> None:
+                for report in iter(write_reports.get, None):
+                    reports.put(report)
+
+            reader = threading.Thread(target=read_reports, daemon=True)
+            reader.start()
+
+            def collect_reports() -> None:
+                while True:
+                    try:
+                        report_write(*reports.get_nowait())
+                    except queue.Empty:
+                        return
+
+            with mp.Pool(
+                processes=num_processes,
+                initializer=init_worker,
+                initargs=(
+                    str(east_model),
+                    warm_models,
+                    layout,
+                    region_cache,
+                    write_reports,
+                ),
+                maxtasksperchild=max_tasks_per_child or None,
+            ) as pool:
+                # imap_unordered: handle each page as soon as it's done
+                # (progress, manifest so an interrupted run resumes from
+                # there, failures):
+                for result in pool.imap_unordered(
+                    self.process_image_star, tasks(), chunksize=chunk_size
+                ):
+                    collect(result)
+                    collect_reports()
+                # not terminate(): workers must finish their pending writes
+                pool.close()
+                pool.join()
+            # all the workers are gone, their reports sent:
+            write_reports.put(None)
+            reader.join()
+            collect_reports()
+            if manager is not None:
+                manager.shutdown()
+        manifest.compact()
+        # regions of pages analyzed again are kept until compaction:
+        if font_store.dead_rows > font_store.live_rows // 4:
+            font_store.compact()
+
+        self.out_success(
+            [
+                f"Found {discovery.pages} page(s), {skipped} already analyzed "
+                f"(use --force to analyze them again).",
+                f"Processing completed. Successfully processed {successful} "
+                f"out of {submitted} pages.",
+            ]
+        )
+        if discovery.rejected:
+            self.out_error(
+                f"{discovery.rejected} file(s) ignored: not JPEG, PNG or TIFF "
+                f"despite their extension."
             )
-            results: List[Dict[str, Any]] = []
+        if failed:
+            self.out_error(f"{failed} image(s) failed, see '{failures_file}'.")
+        if write_failed:
+            self.out_error(
+                f"Outputs of {write_failed} image(s) couldn't be written, "
+                f"see '{failures_file}'."
+            )
+        self.out_model_timings(workers)
+        if profiles:
+            report = summarize(profiles)
+            if params["triage"] != "off":
+                report["triage"] = triage_summary(profiles)
+            if "cache_lookups" in report["counts"]:
+                lookups = report["counts"]["cache_lookups"]["total"]
+                hits = report["counts"].get("cache_hits", {"total": 0})["total"]
+                report["dedupe"] = {
+                    "lookups": int(lookups),
+                    "hits": int(hits),
+                    "hit_rate": hits / lookups if lookups else 0.0,
+                }
+            if "preprocess_lookups" in report["counts"]:
+                lookups = report["counts"]["preprocess_lookups"]["total"]
+                hits = report["counts"].get("preprocess_hits", {"total": 0})["total"]
+                report["preprocess_cache"] = {
+                    "lookups": int(lookups),
+                    "hits": int(hits),
+                    "hit_rate": hits / lookups if lookups else 0.0,
+                }
+            if not distributed:
+                report["schedule"] = layout.as_dict()
+            self.out_profile(report, folder_dst / self.PROFILE_FILE_NAME)
+
+    def run_distributed(
+        self,
+        tasks: Iterator[Tuple[Path, Path, bool, Dict[str, Any], str]],
+        folder_dst: Path,
+        params: Dict[str, Any],
+        max_attempts: int,
+        poll: float,
+        collect: Callable[[Dict[str, Any]], None],
+    ) -> None:
+        """
+        Queue the pages for the ``ocr_worker`` of the nodes, then ``collect()``
+        the results of the pages as the workers finish them, until no page of
+        ``folder_dst`` is pending or running. Results left by an interrupted
+        run are collected by the next one.
+        """
+        queued = enqueue(
+            ((page, image_path) for image_path, _, _, _, page in tasks),
+            folder_dst,
+            params,
+            max(1, max_attempts),
+        )
+        self.out_success(f"{queued} page(s) queued.")
+        jobs = OcrJob.objects.filter(folder_dst=str(folder_dst))
+        while True:
+            OcrJob.fail_expired()
+            finished = list(
+                jobs.filter(
+                    collected=False,
+                    status__in=[OcrJob.Status.DONE, OcrJob.Status.FAILED],
+                ).order_by("id")[:ENQUEUE_BATCH_SIZE]
+            )
+            for job in finished:
+                collect(job_result(job))
+            if finished:
+                # results are dropped once in the manifest and the font store:
+                jobs.filter(pk__in=[job.pk for job in finished]).update(
+                    collected=True, regions=None, features=None, result=None
+                )
+                continue
+            if not jobs.filter(
+                status__in=[OcrJob.Status.PENDING, OcrJob.Status.RUNNING]
+            ).exists():
+                return
+            time.sleep(poll)
 
-            annotated_image = image.copy()
+    @staticmethod
+    def record_failure(failures_file: Path, result: Dict[str, Any]) -> None:
+        """Append the failure of a page (one JSON per line)."""
+        with open(failures_file, "a", encoding="utf-8") as f:
+            failure = {
+                key: result[key]
+                for key in ("image", "page", "error", "traceback")
+                if key in result
+            }
+            f.write(json.dumps(failure, ensure_ascii=False) + "\n")
 
-            for i, (x, y, w, h) in enumerate(text_regions):
-                region: np.ndarray = gray[y : y + h, x : x + w]
+    def out_model_timings(self, workers: Dict[int, Dict[str, Any]]) -> None:
+        """Summarize models load time (per worker) vs. inference time."""
+        load_times: Dict[str, float] = {}
+        inference_times: Dict[str, float] = {}
+        inference_calls: Dict[str, int] = {}
+        for stats in workers.values():
+            for name, seconds in stats["load_times"].items():
+                load_times[name] = load_times.get(name, 0.0) + seconds
+            for name, seconds in stats["inference_times"].items():
+                inference_times[name] = inference_times.get(name, 0.0) + seconds
+            for name, calls in stats["inference_calls"].items():
+                inference_calls[name] = inference_calls.get(name, 0) + calls
+        if not workers:
+            return
+        summary = [f"Models ({len(workers)} worker(s)):"]
+        for name in sorted(set(load_times) | set(inference_times)):
+            calls = inference_calls.get(name, 0)
+            summary.append(
+                f"- {name}: load {load_times.get(name, 0.0):.2f}s, "
+                f"inference {inference_times.get(name, 0.0):.2f}s "
+                f"({calls} call(s))"
+            )
+        self.out(summary)
 
-                # Apply adaptive thresholding to the region before OCR
-                region = cv2.adaptiveThreshold(
-                    region,
-                    255,
-                    cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                    cv2.THRESH_BINARY,
-                    11,
-                    2,
+    def out_profile(self, report: Dict[str, Any], report_file: Path) -> None:
+        """Table of the time spent per stage, full report saved as JSON."""
+        with open(report_file, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        lines = [
+            f"Stages ({report['pages']} page(s), wall time per page in ms):",
+            f"{'stage':<12}{'share':>7}{'mean':>9}{'p50':>9}{'p90':>9}"
+            f"{'p99':>9}{'cpu/wall':>10}",
+        ]
+        for name, stage in report["stages"].items():
+            wall = stage["wall"]
+            lines.append(
+                f"{name:<12}{stage['share']:>7.1%}{wall['mean'] * 1000:>9.1f}"
+                f"{wall['p50'] * 1000:>9.1f}{wall['p90'] * 1000:>9.1f}"
+                f"{wall['p99'] * 1000:>9.1f}"
+                f"{stage['cpu']['total'] / max(wall['total'], 1e-9):>10.2f}"
+            )
+        lines.append("Regions per page:")
+        for name, count in report["counts"].items():
+            lines.append(
+                f"- {name}: mean {count['mean']:.1f}, p50 {count['p50']:.0f}, "
+                f"max {count['max']:.0f}"
+            )
+        if "triage" in report:
+            triage = report["triage"]
+            lines.append("Triage:")
+            for name, page_class in triage["classes"].items():
+                lines.append(
+                    f"- {name}: {page_class['pages']} page(s), "
+                    f"{page_class['route']}, mean {page_class['mean'] * 1000:.1f} ms"
                 )
+            if triage["saved"] is not None:
+                lines.append(f"Estimated time saved: {triage['saved']:.1f}s.")
+        if "dedupe" in report:
+            dedupe = report["dedupe"]
+            lines.append(
+                f"Running headers/footers: {dedupe['hits']} of "
+                f"{dedupe['lookups']} region(s) reused ({dedupe['hit_rate']:.1%})."
+            )
+        if "preprocess_cache" in report:
+            cached = report["preprocess_cache"]
+            lines.append(
+                f"Preprocessed pages: {cached['hits']} of {cached['lookups']} "
+                f"read from the cache ({cached['hit_rate']:.1%})."
+            )
+        lines.append(f"Full report: '{report_file}'.")
+        self.out(lines)
 
-                text: str = pytesseract.image_to_string(region, config="--psm 6")
+    @staticmethod
+    def process_image_star(args: Tuple[Any, ...]):
+        return Command.process_image(*args)
 
-                # Process only regions with detected text
-                if text.strip():
-                    font_features: np.ndarray = Command.extract_font_features(region)
+    @staticmethod
+    def process_image(
+        image_path: Path,
+        folder_dst: Path,
+        verbose: bool,
+        params: Dict[str, Any],
+        page: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Analyze one page: ``page`` is its key (see ``app.ocr.discovery``),
+        which tells the frame of a multi-page TIFF and the name of the
+        outputs; by default the page is the image itself.
+        """
+        page = page or image_path.name
+        frame: Optional[int] = split_page_key(page)[1]
+        profiler.reset()
+        try:
+            with profiler.stage("read"):
+                image: np.ndarray = read_image(image_path, color=True, frame=frame)
+                gray: np.ndarray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            triage: Optional[Dict[str, str]] = None
+            route: str = "full"
+            if params["triage"] != "off":
+                with profiler.stage("triage"):
+                    page_class: str = classify_page(page_statistics(gray))
+                route = TRIAGE_ROUTES[params["triage"]][page_class]
+                triage = {"class": page_class, "route": route}
+            scale: int = params["detect_scale"]
+            if route == "sparse":
+                # a few lines: detected on a reduced page, only them denoised
+                scale = max(scale, SPARSE_DETECT_SCALE)
 
-                    results.append(
-                        {
-                            "region_id": i,
-                            "text": text.strip(),
-                            "font_features": font_features.tolist(),
-                            "position": (x, y, w, h),
-                        }
+            text_regions: List[Tuple[int, int, int, int]] = []
+            region_images: List[np.ndarray] = []
+            enhanced: Optional[np.ndarray] = None
+            if route != "skip":
+                with profiler.stage("read"):
+                    # Detect on a (possibly) reduced page, decoded reduced
+                    # directly:
+                    detect_gray: np.ndarray = (
+                        gray
+                        if scale == 1
+                        else read_image(image_path, scale, frame=frame)
+                    )
+                if params["detector"] == "profile":
+                    # binarized projection profiles don't need the denoising:
+                    with profiler.stage("layout"):
+                        text_regions = detect_profile_regions(
+                            detect_gray, params["profile_level"]
+                        )
+                else:
+                    # Apply denoising and contrast enhancement
+                    with profiler.stage("denoise"):
+                        enhanced = Command.enhance_page(
+                            detect_gray, image_path, frame, scale, folder_dst, params
+                        )
+                    pad_x, pad_y = params["merge_padding"]
+                    text_regions = Command.detect_text_regions(
+                        enhanced,
+                        detect_gray,
+                        {**params, "merge_padding": (pad_x // scale, pad_y // scale)},
                     )
 
-                    # Draw a rectangle on the annotated image
-                    cv2.rectangle(
-                        annotated_image, (x, y), (x + w, y + h), (0, 255, 0), 2
+                if enhanced is not None and scale == 1:
+                    region_images = [
+                        enhanced[y : y + h, x : x + w] for x, y, w, h in text_regions
+                    ]
+                else:
+                    # ... then denoise and OCR only the regions, at full
+                    # resolution (the profile detector never denoises the
+                    # page):
+                    if scale != 1:
+                        text_regions = scale_regions(
+                            text_regions, detect_gray.shape, gray.shape
+                        )
+                    with profiler.stage("denoise"):
+                        region_images = enhance_regions(
+                            gray, text_regions, params["denoise_strength"]
+                        )
+                    enhanced = None
+            profiler.count("regions", len(text_regions))
+            results: List[Dict[str, Any]] = []
+
+            # Apply adaptive thresholding to the regions before OCR
+            with profiler.stage("binarize"):
+                regions: List[np.ndarray] = [
+                    binarize(region, params["threshold_block"])
+                    for region in region_images
+                ]
+            # running headers and footers already read on previous pages:
+            texts: List[str] = [""] * len(regions)
+            cached: Dict[int, str] = {}
+            fingerprints: Dict[int, np.ndarray] = {}
+            cache: Optional[RegionCache] = (
+                get_region_cache() if params["dedupe"] else None
+            )
+            if cache is not None:
+                with profiler.stage("dedupe"):
+                    for i in band_regions(text_regions, gray.shape[0]):
+                        x, y, w, h = text_regions[i]
+                        fingerprint = region_fingerprint(gray[y : y + h, x : x + w])
+                        if fingerprint is None:
+                            continue
+                        text = cache.lookup(fingerprint)
+                        if text is None:
+                            fingerprints[i] = fingerprint
+                        else:
+                            cached[i] = texts[i] = text
+                profiler.count("cache_lookups", len(fingerprints) + len(cached))
+                profiler.count("cache_hits", len(cached))
+            to_read: List[int] = [i for i in range(len(regions)) if i not in cached]
+            if to_read:
+                with profiler.stage("tesseract"):
+                    if params["consensus"]:
+                        read_texts: List[str] = consensus_ocr(
+                            [region_images[i] for i in to_read],
+                            tesseract_config(params["psm"]),
+                            params["threshold_block"],
+                            [regions[i] for i in to_read],
+                        )
+                    else:
+                        read_texts = Command.ocr_regions(
+                            [regions[i] for i in to_read],
+                            [text_regions[i] for i in to_read],
+                            enhanced,
+                            gray.shape,
+                            params,
+                        )
+                for i, text in zip(to_read, read_texts):
+                    texts[i] = text
+            if cache is not None:
+                with profiler.stage("dedupe"):
+                    cache.add(
+                        [
+                            (fingerprint, texts[i])
+                            for i, fingerprint in fingerprints.items()
+                        ]
                     )
 
-            Command.save_results(results, annotated_image, folder_dst, image_path.stem)
+            # Process only regions with detected text
+            with_text: List[int] = [i for i, text in enumerate(texts) if text.strip()]
+            profiler.count("with_text", len(with_text))
+            # HOG features of all these regions at once:
+            with profiler.stage("hog"):
+                font_features: np.ndarray = hog_features(
+                    font_patches([regions[i] for i in with_text])
+                )
+            for i in with_text:
+                x, y, w, h = text_regions[i]
+                results.append(
+                    {
+                        "region_id": i,
+                        "text": texts[i].strip(),
+                        "position": (x, y, w, h),
+                        "detect_scale": scale,
+                    }
+                )
+
+            with profiler.stage("save"):
+                annotated_image: Optional[np.ndarray] = Command.annotate(
+                    image, [text_regions[i] for i in with_text], params["annotate"]
+                )
+                # encoding and writing are done while the next page is
+                # analyzed (waits only if the writer is late):
+                writer = get_writer(params["write_queue"])
+                writer.submit(
+                    page,
+                    Command.save_results,
+                    results,
+                    annotated_image,
+                    folder_dst,
+                    output_name(page),
+                )
 
             if verbose:
-                print(f"  Analysis completed for {image_path.name}")
-            return True
+                print(f"  Analysis completed for {page}")
+            profile: Dict[str, Any] = profiler.snapshot()
+            if triage is not None:
+                profile["triage"] = triage
+            return {
+                "image": str(image_path),
+                "page": page,
+                "success": True,
+                # appended to the FontStore by the parent process, the only
+                # writer of its files:
+                "fonts": {
+                    "regions": [(i, text_regions[i]) for i in with_text],
+                    "features": font_features,
+                },
+                "models": registry.stats(),
+                "profile": profile,
+                "write_failures": writer.pop_failures(),
+            }
         except Exception as e:
             if verbose:
-                print(f"  Error processing {image_path.name}: {str(e)}")
-            return False
+                print(f"  Error processing {page}: {str(e)}")
+            return {
+                "image": str(image_path),
+                "page": page,
+                "success": False,
+                "error": str(e),
+                "traceback": traceback.format_exc(),
+                "models": registry.stats(),
+            }
+
+    @staticmethod
+    def enhance_page(
+        gray: np.ndarray,
+        image_path: Path,
+        frame: Optional[int],
+        scale: int,
+        folder_dst: Path,
+        params: Dict[str, Any],
+    ) -> np.ndarray:
+        """
+        ``enhance()`` of the page ``gray`` (reduced ``scale`` times), read
+        from the preprocessed pages of the previous runs with
+        --preprocess-cache; a page computed here is written by the
+        background writer.
+        """
+        strength: float = params["denoise_strength"]
+        if not params["preprocess_cache"]:
+            return enhance(gray, strength)
+        cache = PreprocessCache(folder_dst)
+        key = cache.key(image_path, frame, scale, strength)
+        profiler.count("preprocess_lookups", 1)
+        enhanced: Optional[np.ndarray] = cache.load(key)
+        if enhanced is not None and enhanced.shape == gray.shape:
+            profiler.count("preprocess_hits", 1)
+            return enhanced
+        enhanced = enhance(gray, strength)
+        # not an output of the page: no report, the manifest doesn't wait
+        get_writer(params["write_queue"]).submit(
+            str(image_path), cache.save, key, enhanced, report=False
+        )
+        return enhanced
+
+    @staticmethod
+    def ocr_regions(
+        regions: List[np.ndarray],
+        text_regions: List[Tuple[int, int, int, int]],
+        gray: Optional[np.ndarray],
+        page_shape: Tuple[int, ...],
+        params: Dict[str, Any],
+    ) -> List[str]:
+        """
+        Text of each (binarized) region, using ``params["ocr_mode"]``
+        Tesseract calls. In 'page' mode, when the enhanced page ``gray`` is
+        not available, the binarized regions are pasted at their place on a
+        white page.
+        """
+        config = tesseract_config(params["psm"])
+        if params["ocr_mode"] == "region":
+            return ocr_each(regions, config)
+        if params["ocr_mode"] == "page":
+            if gray is not None:
+                page = binarize(gray, params["threshold_block"])
+            else:
+                page = np.full(page_shape[:2], 255, dtype=np.uint8)
+                for (x, y, w, h), region in zip(text_regions, regions):
+                    page[y : y + h, x : x + w] = region
+            return ocr_page(page, text_regions, config)
+        return ocr_mosaic(regions, config)
 
     @staticmethod
     def detect_text_regions(
-        gray: np.ndarray, color_image: np.ndarray
+        gray: np.ndarray, color_image: np.ndarray, params: Dict[str, Any]
     ) -> List[Tuple[int, int, int, int]]:
         # Use a combination of methods for better detection
-        mser_regions = Command.detect_mser_regions(gray)
-        east_regions = Command.detect_east_regions(gray)
+        with profiler.stage("mser"):
+            mser_regions = Command.detect_mser_regions(gray)
+        with profiler.stage("east"):
+            east_regions = Command.detect_east_regions(gray, params)
+        profiler.count("mser_candidates", len(mser_regions))
+        profiler.count("east_candidates", len(east_regions))
 
         # Merge regions detected by both methods
         all_regions = mser_regions + east_regions
 
         # Filter and merge overlapping regions
-        text_regions = Command.filter_and_merge_regions(all_regions, gray, color_image)
+        text_regions = Command.filter_and_merge_regions(
+            all_regions,
+            gray,
+            color_image,
+            params["merge_padding"],
+            params["min_variance"],
+            params["min_edge_density"],
+        )
 
         return text_regions
 
     @staticmethod
     def detect_mser_regions(gray: np.ndarray) -> List[Tuple[int, int, int, int]]:
-        mser = cv2.MSER_create()
-        regions, _ = mser.detectRegions(gray)
+        mser = registry.get("mser")
+        with registry.timed("mser"):
+            regions, _ = mser.detectRegions(gray)
         return [cv2.boundingRect(region) for region in regions]
 
     @staticmethod
-    def detect_east_regions(image: np.ndarray) -> List[Tuple[int, int, int, int]]:
-        east_model_path = os.path.abspath("frozen_east_text_detection.pb")
-        if not os.path.exists(east_model_path):
-            raise FileNotFoundError(
-                f"EAST model file not found at location: {east_model_path}"
-            )
+    def detect_east_regions(
+        image: np.ndarray, params: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[int, int, int, int]]:
         try:
-            net = cv2.dnn.readNet(east_model_path)
+            registry.get("east")
         except Exception as e:
             print(f"Error loading model: {str(e)}")
             raise
-
-        height, width = image.shape[:2]
-        new_width = 320
-        new_height = 320
-
-        # Ensure the image is in BGR format
-        if len(image.shape) == 2:  # If the image is grayscale
-            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
-        elif image.shape[2] == 4:  # If the image has an alpha channel
-            image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
-        blob = cv2.dnn.blobFromImage(
-            image, 1.0, (new_width, new_height), (123.68, 116.78, 103.94), True, False
-        )
-        net.setInput(blob)
         try:
-            output_layers = ["feature_fusion/Conv_7/Sigmoid", "feature_fusion/concat_3"]
-            outputs = net.forward(output_layers)
-            scores, geometry = outputs
-        except Exception as e:
+            if params and params["east_mode"] == "tiled":
+                boxes, _, _ = detect_east_boxes_tiled(
+                    image, params["east_tile"], params["east_batch"]
+                )
+            else:
+                boxes, _, _ = detect_east_boxes(image)
+        except cv2.error as e:
             print(f"Error during inference: {str(e)}")
             return []
-
-        rectangles = []
-        confidences = []
-
-        for y in range(0, geometry.shape[2]):
-            scores_data = scores[0, 0, y]
-            x_data0 = geometry[0, 0, y]
-            x_data1 = geometry[0, 1, y]
-            x_data2 = geometry[0, 2, y]
-            x_data3 = geometry[0, 3, y]
-            angles_data = geometry[0, 4, y]
-
-            for x in range(0, geometry.shape[3]):
-                if scores_data[x] < 0.5:
-                    continue
-
-                (offset_x, offset_y) = (x * 4.0, y * 4.0)
-
-                angle = angles_data[x]
-                cos = np.cos(angle)
-                sin = np.sin(angle)
-
-                h = x_data0[x] + x_data2[x]
-                w = x_data1[x] + x_data3[x]
-
-                end_x = int(offset_x + (cos * x_data1[x]) + (sin * x_data2[x]))
-                end_y = int(offset_y - (sin * x_data1[x]) + (cos * x_data2[x]))
-                start_x = int(end_x - w)
-                start_y = int(end_y - h)
-
-                rectangles.append((start_x, start_y, end_x, end_y))
-                confidences.append(scores_data[x])
-
-        # Apply non-maximum suppression
-        from imutils.object_detection import non_max_suppression
-
-        boxes = non_max_suppression(
-            np.array(rectangles), probs=confidences, overlapThresh=0.5
-        )
-
-        # Adjust coordinates to the scale of the original image
-        result = []
-        for start_x, start_y, end_x, end_y in boxes:
-            start_x = int(start_x * (width / new_width))
-            start_y = int(start_y * (height / new_height))
-            end_x = int(end_x * (width / new_width))
-            end_y = int(end_y * (height / new_height))
-            result.append((start_x, start_y, end_x - start_x, end_y - start_y))
-        return result
+        return boxes_to_regions(boxes)
 
     @staticmethod
     def filter_and_merge_regions(
         regions: List[Tuple[int, int, int, int]],
         gray: np.ndarray,
         color_image: np.ndarray,
+        padding: Tuple[int, int] = (0, 0),
+        min_variance: float = MIN_VARIANCE,
+        min_edge_density: float = MIN_EDGE_DENSITY,
     ) -> List[Tuple[int, int, int, int]]:
-        filtered_regions = [
-            region
-            for region in regions
-            if Command.is_valid_text_region(gray, color_image, *region)
-        ]
-        return Command.merge_overlapping_regions(filtered_regions)
-
-    @staticmethod
-    def is_valid_text_region(
-        gray: np.ndarray, color_image: np.ndarray, x: int, y: int, w: int, h: int
-    ) -> bool:
-        # Improve filtering criteria
-        if w < 10 or h < 10 or w > gray.shape[1] * 0.8 or h > gray.shape[0] * 0.8:
-            return False
-
-        aspect_ratio = w / h
-        if aspect_ratio < 0.1 or aspect_ratio > 15:
-            return False
-
-        region = gray[y : y + h, x : x + w]
-
-        # Check text variance
-        if np.var(region) < 100:  # Adjust this threshold as needed
-            return False
-
-        # Check edge density
-        edges = cv2.Canny(region, 100, 200)
-        edge_density = np.sum(edges) / (w * h)
-        if edge_density < 0.1:  # Adjust this threshold as needed
-            return False
-
-        return True
+        # one edge map + integral images per page, then O(1) per region:
+        with profiler.stage("validation"):
+            filtered_regions = filter_regions(
+                gray, regions, min_variance, min_edge_density
+            )
+        profiler.count("validated", len(filtered_regions))
+        with profiler.stage("merge"):
+            return Command.merge_overlapping_regions(filtered_regions, padding)
 
     @staticmethod
     def merge_overlapping_regions(
-        regions: List[Tuple[int, int, int, int]]
+        regions: List[Tuple[int, int, int, int]],
+        padding: Tuple[int, int] = (0, 0),
     ) -> List[Tuple[int, int, int, int]]:
-        """Merge overlapping regions."""
-        if not regions:
-            return []
-
-        sorted_regions = sorted(regions, key=lambda r: r[0])
-
-        merged = []
-        for region in sorted_regions:
-            if not merged:
-                merged.append(region)
-            else:
-                last = merged[-1]
-                if Command.regions_overlap(last, region):
-                    merged[-1] = Command.combine_regions(last, region)
-                else:
-                    merged.append(region)
-
-        return merged
-
-    @staticmethod
-    def regions_overlap(
-        r1: Tuple[int, int, int, int], r2: Tuple[int, int, int, int]
-    ) -> bool:
-        """Check if two regions overlap."""
-        return not (
-            r1[0] + r1[2] < r2[0]
-            or r2[0] + r2[2] < r1[0]
-            or r1[1] + r1[3] < r2[1]
-            or r2[1] + r2[3] < r1[1]
-        )
-
-    @staticmethod
-    def combine_regions(
-        r1: Tuple[int, int, int, int], r2: Tuple[int, int, int, int]
-    ) -> Tuple[int, int, int, int]:
-        """Combine two overlapping regions."""
-        x = min(r1[0], r2[0])
-        y = min(r1[1], r2[1])
-        w = max(r1[0] + r1[2], r2[0] + r2[2]) - x
-        h = max(r1[1] + r1[3], r2[1] + r2[3]) - y
-        return (x, y, w, h)
+        """Merge all (transitively) overlapping regions, grown by padding."""
+        return merge_regions(regions, *padding)
 
     @staticmethod
     def extract_font_features(image: np.ndarray) -> np.ndarray:
         """Extract HOG features from the image to represent font characteristics."""
-        max_dimension = 100
-        h, w = image.shape
-        if h > w:
-            new_h, new_w = max_dimension, int(w * (max_dimension / h))
-        else:
-            new_h, new_w = int(h * (max_dimension / w)), max_dimension
-        resized = cv2.resize(image, (new_w, new_h))
+        return hog_features(font_patches([image]))[0]
 
-        padded = np.zeros((max_dimension, max_dimension), dtype=np.uint8)
-        padded[:new_h, :new_w] = resized
+    @staticmethod
+    def annotate(
+        image: np.ndarray,
+        boxes: List[Tuple[int, int, int, int]],
+        mode: str = "full",
+    ) -> Optional[np.ndarray]:
+        """
+        Copy of ``image`` with ``boxes`` drawn, reduced with 'thumbnail'
+        mode (before drawing: no full resolution copy), None with 'off'.
+        """
+        if mode == "off":
+            return None
+        ratio = 1.0
+        if mode == "thumbnail":
+            ratio = min(1.0, Command.ANNOTATE_THUMBNAIL_SIZE / max(image.shape[:2]))
+        if ratio < 1.0:
+            annotated = cv2.resize(
+                image, None, fx=ratio, fy=ratio, interpolation=cv2.INTER_AREA
+            )
+        else:
+            annotated = image.copy()
+        for x, y, w, h in boxes:
+            cv2.rectangle(
+                annotated,
+                (int(x * ratio), int(y * ratio)),
+                (int((x + w) * ratio), int((y + h) * ratio)),
+                (0, 255, 0),
+                2,
+            )
+        return annotated
 
-        features, _ = hog(
-            padded,
-            orientations=8,
-            pixels_per_cell=(16, 16),
-            cells_per_block=(1, 1),
-            visualize=True,
-        )
-        return features
+    @staticmethod
+    def output_paths(
+        folder_dst: Path, image_name: str, annotate: str = "full"
+    ) -> List[Path]:
+        """Files written by ``save_results()`` for the image ``image_name``."""
+        paths = [folder_dst / f"{image_name}_analysis.json"]
+        if annotate != "off":
+            paths.append(folder_dst / f"{image_name}_annotated.jpg")
+        return paths
 
     @staticmethod
     def save_results(
         results: List,
-        annotated_image: np.ndarray,
+        annotated_image: Optional[np.ndarray],
         folder_dst: Path,
         image_name: str,
     ):
-        """Save analysis results to a JSON file and the annotated image."""
-        result_file: Path = folder_dst / f"{image_name}_analysis.json"
-        with open(result_file, "w", encoding="utf-8") as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
-
-        image_file: Path = folder_dst / f"{image_name}_annotated.jpg"
-        cv2.imwrite(str(image_file), annotated_image)
-        print(f"{result_file=} <=> {image_file=}")
+        """
+        Save analysis results to a (compact) JSON file and the annotated
+        image. Each file is written under a temporary name then renamed: an
+        interrupted write leaves the previous file, never a partial one.
+        """
+        result_file = folder_dst / f"{image_name}_analysis.json"
+        partial = result_file.with_name(f"{result_file.name}.{os.getpid()}.tmp")
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(partial, result_file)
+
+        if annotated_image is not None:
+            image_file = folder_dst / f"{image_name}_annotated.jpg"
+            ok, data = cv2.imencode(".jpg", annotated_image)
+            if not ok:
+                raise ValueError(f"Can't encode the annotated image '{image_file}'.")
+            partial = image_file.with_name(f"{image_file.name}.{os.getpid()}.tmp")
+            partial.write_bytes(data.tobytes())
+            os.replace(partial, image_file)
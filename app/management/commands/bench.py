@@ -0,0 +1,568 @@
+import json
+import multiprocessing as mp
+import platform
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+from django.core.management.base import BaseCommand, CommandError
+
+from app.ocr.east import (
+    decode_predictions,
+    decode_predictions_loop,
+    non_max_suppression,
+    run_east,
+)
+from app.ocr.features import font_patches, hog_features, hog_features_skimage
+from app.ocr.merge import merge_regions, merge_regions_sorted_last
+from app.ocr.profiling import summarize
+from app.ocr.pyramid import DENOISE_STRENGTH
+from app.ocr.registry import (
+    DEFAULT_EAST_MODEL_PATH,
+    DETECTOR_MODELS,
+    init_worker,
+    registry,
+)
+from app.ocr.scheduler import SCHEDULES, CoreLayout, available_cpus
+from app.ocr.synthetic import render_book
+from app.ocr.tesseract import OCR_MODES, PSM, THRESHOLD_BLOCK
+from app.ocr.validation import MIN_EDGE_DENSITY, MIN_VARIANCE
+from app.ocr.writer import get_writer
+from core.models.file.image import ImageFile
+from .analyze_image import Command as AnalyzeImage
+from .convert_new_images_to_jpg import save_as_jpg
+from ..base.out_mixin import OutMixin
+
+
+def time_it(func: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Call ``func`` ``repeat`` times, return its timings (seconds)."""
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        "min": min(timings),
+        "mean": sum(timings) / len(timings),
+        "max": max(timings),
+    }
+
+
+class Command(OutMixin, BaseCommand):
+    help = (
+        "Benchmarks of the image pipeline: building blocks, stages and "
+        "throughput of analyze_image on synthetic pages, JPEG conversion and "
+        "thumbnails; results can be saved and compared to a previous run"
+    )
+
+    SUITES = [
+        "east-decode",
+        "merge",
+        "hog",
+        "pipeline",
+        "throughput",
+        "convert",
+        "thumbnail",
+    ]
+
+    def __init__(self, stdout=None, stderr=None, no_color=False, force_color=False):
+        super().__init__(stdout, stderr, no_color, force_color)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--suite",
+            type=str,
+            choices=self.SUITES,
+            action="append",
+            help="Suite to run (can be repeated, default: all suites)",
+        )
+        parser.add_argument(
+            "--image",
+            type=str,
+            action="append",
+            default=[],
+            help="Page image used to produce real EAST outputs (can be repeated)",
+        )
+        parser.add_argument(
+            "--east-model",
+            type=str,
+            default=DEFAULT_EAST_MODEL_PATH,
+            help=f"EAST model file (default: {DEFAULT_EAST_MODEL_PATH})",
+        )
+        parser.add_argument(
+            "--boxes",
+            type=int,
+            action="append",
+            default=[],
+            help="Number of synthetic boxes for the 'merge' suite (can be "
+            "repeated, default: 10000 and 50000)",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Random seed of the synthetic data (default: 0)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Number of timed calls for each measure (default: 20)",
+        )
+        parser.add_argument(
+            "--pages",
+            type=int,
+            default=8,
+            help="Number of synthetic pages rendered for the 'pipeline', "
+            "'throughput', 'convert' and 'thumbnail' suites (default: 8)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            action="append",
+            default=[],
+            help="Number of processes for the 'throughput' suite (can be "
+            "repeated, default: 1, half and all the CPUs available)",
+        )
+        parser.add_argument(
+            "--schedule",
+            type=str,
+            action="append",
+            choices=SCHEDULES,
+            default=[],
+            help="CPUs layout of the workers of the 'throughput' suite, see "
+            "analyze_image (can be repeated, default: all)",
+        )
+        parser.add_argument(
+            "--detector",
+            type=str,
+            choices=AnalyzeImage.DETECTORS,
+            default="mser-east",
+            help="Detector of analyze_image (default: mser-east)",
+        )
+        parser.add_argument(
+            "--ocr-mode",
+            type=str,
+            choices=OCR_MODES,
+            default="mosaic",
+            help="OCR mode of analyze_image (default: mosaic)",
+        )
+        parser.add_argument(
+            "--output",
+            type=str,
+            help="Save the results in this JSON file",
+        )
+        parser.add_argument(
+            "--compare",
+            type=str,
+            help="JSON file of a previous run (--output): flag the measures "
+            "worse than it by more than --threshold",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.1,
+            help="With --compare: relative change considered as a regression "
+            "(default: 0.1 = 10%%)",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        suites: List[str] = options["suite"] or self.SUITES
+        repeat: int = max(1, options["repeat"])
+        images: List[Path] = [Path(image).resolve() for image in options["image"]]
+        for image in images:
+            if not image.is_file():
+                raise CommandError(f"Image '{image}' not found.")
+        baseline: Optional[Path] = None
+        if options["compare"]:
+            baseline = Path(options["compare"]).resolve()
+            if not baseline.is_file():
+                raise CommandError(f"Baseline '{baseline}' not found.")
+        registry.configure(east_model_path=options["east_model"])
+        self.east_model: str = str(Path(options["east_model"]).resolve())
+        self.boxes: List[int] = options["boxes"] or [10000, 50000]
+        self.rng = np.random.default_rng(options["seed"])
+        self.seed: int = options["seed"]
+        self.page_count: int = max(1, options["pages"])
+        cpus = len(available_cpus())
+        self.workers: List[int] = options["workers"] or sorted({1, cpus // 2, cpus})
+        self.schedules: List[str] = options["schedule"] or SCHEDULES
+        self.workers = [workers for workers in self.workers if workers > 0]
+        self.params: Dict[str, Any] = {
+            "ocr_mode": options["ocr_mode"],
+            "east_model": self.east_model,
+            "east_mode": "resize",
+            "east_tile": 640,
+            "east_batch": 8,
+            "detector": options["detector"],
+            "profile_level": "lines",
+            "merge_padding": (0, 0),
+            "detect_scale": 1,
+            "denoise_strength": DENOISE_STRENGTH,
+            "threshold_block": THRESHOLD_BLOCK,
+            "min_variance": MIN_VARIANCE,
+            "min_edge_density": MIN_EDGE_DENSITY,
+            "psm": PSM,
+            "consensus": False,
+            "triage": "off",
+            "dedupe": False,
+            "preprocess_cache": False,
+            "annotate": "full",
+            "write_queue": 4,
+        }
+        # suite -> measure -> {"value", "unit", "better": "lower" or "higher"}
+        self.results: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.suite: str = ""
+        self.pages: Optional[List[Path]] = None
+
+        with tempfile.TemporaryDirectory(prefix="bench_") as work_dir:
+            self.work_dir: Path = Path(work_dir)
+            for suite in suites:
+                self.suite = suite
+                self.out_success(f"Suite '{suite}' ({repeat} calls per measure):")
+                getattr(self, f"bench_{suite.replace('-', '_')}")(images, repeat)
+
+        if options["output"]:
+            self.save(Path(options["output"]), options)
+        if baseline is not None:
+            regressions = self.compare(baseline, options["threshold"])
+            if regressions:
+                raise CommandError(
+                    f"{regressions} regression(s) above "
+                    f"{options['threshold']:.0%} vs. '{baseline}'."
+                )
+
+    def record(
+        self, name: str, value: float, unit: str = "ms", better: str = "lower"
+    ) -> None:
+        """Keep a measure of the current suite (saved by --output)."""
+        self.results.setdefault(self.suite, {})[name] = {
+            "value": value,
+            "unit": unit,
+            "better": better,
+        }
+
+    def save(self, output: Path, options: Dict[str, Any]) -> None:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "date": datetime.now().isoformat(timespec="seconds"),
+                    "machine": {
+                        "platform": platform.platform(),
+                        "python": platform.python_version(),
+                        "opencv": cv2.__version__,
+                        "numpy": np.__version__,
+                        "cpu_count": mp.cpu_count(),
+                        "cpus_available": len(available_cpus()),
+                    },
+                    "options": {
+                        key: options[key]
+                        for key in (
+                            "suite",
+                            "seed",
+                            "repeat",
+                            "pages",
+                            "workers",
+                            "schedule",
+                            "detector",
+                            "ocr_mode",
+                        )
+                    },
+                    "results": self.results,
+                },
+                f,
+                indent=2,
+            )
+        self.out_success(f"Results saved in '{output}'.")
+
+    def compare(self, baseline_file: Path, threshold: float) -> int:
+        """
+        Compare the measures to the ones of ``baseline_file``, return the
+        number of measures worse by more than ``threshold`` (relative).
+        """
+        with open(baseline_file, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        lines = [f"Compared to '{baseline_file}':"]
+        regressions = 0
+        for suite, measures in self.results.items():
+            for name, measure in measures.items():
+                previous = baseline.get(suite, {}).get(name)
+                if previous is None or not previous["value"]:
+                    continue
+                change = (measure["value"] - previous["value"]) / previous["value"]
+                worse = change if measure["better"] == "lower" else -change
+                flag = ""
+                if worse > threshold:
+                    regressions += 1
+                    flag = " <- REGRESSION"
+                lines.append(
+                    f"- {suite} / {name}: {previous['value']:.3f} -> "
+                    f"{measure['value']:.3f} {measure['unit']} "
+                    f"({change:+.1%}){flag}"
+                )
+        if regressions:
+            self.out_error(lines)
+        else:
+            self.out_success(lines)
+        return regressions
+
+    def synthetic_pages(self) -> List[Path]:
+        """Render the synthetic pages once, shared by all the suites."""
+        if self.pages is None:
+            self.pages = render_book(
+                self.work_dir / "pages", self.page_count, self.seed
+            )
+        return self.pages
+
+    def check_pipeline(self) -> None:
+        if self.params["detector"] != "profile" and not Path(self.east_model).is_file():
+            raise CommandError(
+                f"EAST model file '{self.east_model}' not found "
+                f"(or use --detector=profile)."
+            )
+
+    def synthetic_char_boxes(self, count: int) -> List[Tuple[int, int, int, int]]:
+        """
+        MSER-like boxes: characters on lines of a 600 dpi page, with nested
+        and jittered duplicates (like MSER returns several boxes per glyph).
+        """
+        glyphs = count * 2 // 3
+        per_line = 80
+        line = np.arange(glyphs) // per_line
+        column = np.arange(glyphs) % per_line
+        x = 200 + column * 55 + (line % 7) * 3
+        y = 300 + line * 90
+        w = self.rng.integers(18, 40, glyphs)
+        h = self.rng.integers(28, 45, glyphs)
+        glyph_boxes = np.stack([x, y, w, h], axis=1)
+        duplicates = glyph_boxes[self.rng.integers(0, glyphs, count - glyphs)]
+        duplicates = duplicates + self.rng.integers(-4, 5, (len(duplicates), 4))
+        boxes = np.concatenate([glyph_boxes, duplicates])
+        boxes[:, 2:] = np.maximum(boxes[:, 2:], 1)
+        self.rng.shuffle(boxes)
+        return [tuple(int(v) for v in box) for box in boxes]
+
+    def bench_merge(self, images: List[Path], repeat: int) -> None:
+        """Sort + compare with last merged vs. sweep line + components."""
+        for count in self.boxes:
+            regions = self.synthetic_char_boxes(count)
+            old = merge_regions_sorted_last(regions)
+            new = merge_regions(regions)
+            words = merge_regions(regions, 12, 0)
+            lines = merge_regions(regions, 30, 0)
+            old_timing = time_it(lambda: merge_regions_sorted_last(regions), repeat)
+            new_timing = time_it(lambda: merge_regions(regions), repeat)
+            pad_timing = time_it(lambda: merge_regions(regions, 12, 0), repeat)
+            self.record(f"{count} boxes", new_timing["mean"] * 1000)
+            self.record(f"{count} boxes, padding 12x0", pad_timing["mean"] * 1000)
+            self.out(
+                [
+                    f"{count} boxes:",
+                    f"- sorted/last: {old_timing['mean'] * 1000:.1f} ms "
+                    f"-> {len(old)} region(s) (misses non adjacent overlaps)",
+                    f"- sweep + components: {new_timing['mean'] * 1000:.1f} ms "
+                    f"-> {len(new)} region(s)",
+                    f"- sweep + components, padding 12x0: "
+                    f"{pad_timing['mean'] * 1000:.1f} ms -> {len(words)} "
+                    f"word(s) ({len(lines)} line(s) with padding 30x0)",
+                ]
+            )
+
+    def synthetic_text_regions(self, count: int) -> List[np.ndarray]:
+        """Binarized regions of printed words of various sizes and fonts."""
+        fonts = [
+            cv2.FONT_HERSHEY_SIMPLEX,
+            cv2.FONT_HERSHEY_DUPLEX,
+            cv2.FONT_HERSHEY_COMPLEX,
+            cv2.FONT_HERSHEY_TRIPLEX,
+        ]
+        regions = []
+        for i in range(count):
+            h = int(self.rng.integers(20, 90))
+            w = int(self.rng.integers(40, 500))
+            region = np.full((h, w), 255, dtype=np.uint8)
+            cv2.putText(
+                region,
+                f"Lorem {i}",
+                (2, h - 6),
+                fonts[i % len(fonts)],
+                h / 40,
+                0,
+                1 + i % 3,
+            )
+            regions.append(region)
+        return regions
+
+    def bench_hog(self, images: List[Path], repeat: int) -> None:
+        """skimage hog() region by region vs. batched float32 HOG."""
+        for count in (1, 100, 1000):
+            patches = font_patches(self.synthetic_text_regions(count))
+            batched = hog_features(patches)
+            reference = np.array([hog_features_skimage(patch) for patch in patches])
+            error = float(np.abs(batched - reference).max())
+            one_by_one = time_it(
+                lambda: [hog_features_skimage(patch) for patch in patches], repeat
+            )
+            batch = time_it(lambda: hog_features(patches), repeat)
+            self.record(f"{count} region(s)", batch["mean"] * 1000)
+            self.out(
+                [
+                    f"{count} region(s), {batched.shape[1]} features:",
+                    f"- skimage one by one: {one_by_one['mean'] * 1000:.2f} ms",
+                    f"- batched: {batch['mean'] * 1000:.2f} ms "
+                    f"(x{one_by_one['mean'] / batch['mean']:.1f}), "
+                    f"max difference {error:.2e}",
+                ]
+            )
+            if error > 1e-4:
+                self.out_error("Batched HOG doesn't match skimage!")
+
+    def bench_east_decode(self, images: List[Path], repeat: int) -> None:
+        """Loop decoder + imutils NMS vs. vectorized decoder + NMS."""
+        if not images:
+            raise CommandError("Suite 'east-decode' needs at least one --image.")
+        try:
+            from imutils.object_detection import non_max_suppression as imutils_nms
+        except ImportError:
+            imutils_nms = None
+
+        for image_path in images:
+            image: np.ndarray = cv2.imread(str(image_path))
+            if image is None:
+                raise CommandError(f"Can't read image '{image_path}'.")
+            scores, geometry = run_east(image)
+
+            loop_boxes, loop_conf, _ = decode_predictions_loop(scores, geometry)
+            vec_boxes, vec_conf, _ = decode_predictions(scores, geometry)
+            if not np.array_equal(loop_boxes, vec_boxes):
+                self.out_error(f"{image_path.name}: decoders disagree!")
+
+            loop = time_it(lambda: decode_predictions_loop(scores, geometry), repeat)
+            vec = time_it(lambda: decode_predictions(scores, geometry), repeat)
+            nms = time_it(lambda: non_max_suppression(vec_boxes, vec_conf), repeat)
+            self.record(f"{image_path.name} decode", vec["mean"] * 1000)
+            self.record(f"{image_path.name} nms", nms["mean"] * 1000)
+            lines = [
+                f"{image_path.name}: {len(vec_boxes)} candidate box(es)",
+                f"- decode loop: {loop['mean'] * 1000:.3f} ms",
+                f"- decode vectorized: {vec['mean'] * 1000:.3f} ms "
+                f"(x{loop['mean'] / vec['mean']:.1f})",
+                f"- nms vectorized: {nms['mean'] * 1000:.3f} ms",
+            ]
+            if imutils_nms is not None and len(loop_boxes):
+                ref = time_it(
+                    lambda: imutils_nms(loop_boxes, probs=loop_conf, overlapThresh=0.5),
+                    repeat,
+                )
+                lines.append(f"- nms imutils: {ref['mean'] * 1000:.3f} ms")
+            self.out(lines)
+
+    def bench_pipeline(self, images: List[Path], repeat: int) -> None:
+        """Time of each stage of analyze_image, pages analyzed one by one."""
+        self.check_pipeline()
+        pages = self.synthetic_pages()
+        init_worker(self.east_model, DETECTOR_MODELS[self.params["detector"]])
+        folder_dst = self.work_dir / "pipeline"
+        folder_dst.mkdir(exist_ok=True)
+        profiles = []
+        for page in pages:
+            result = AnalyzeImage.process_image(page, folder_dst, False, self.params)
+            if not result["success"]:
+                raise CommandError(f"{page.name}: {result['error']}")
+            profiles.append(result["profile"])
+        get_writer(self.params["write_queue"]).flush()
+        report = summarize(profiles)
+        lines = [f"{len(pages)} page(s), wall time per page:"]
+        for name, stage in report["stages"].items():
+            wall = stage["wall"]
+            self.record(f"{name} mean", wall["mean"] * 1000)
+            self.record(f"{name} p90", wall["p90"] * 1000)
+            lines.append(
+                f"- {name}: mean {wall['mean'] * 1000:.1f} ms, "
+                f"p90 {wall['p90'] * 1000:.1f} ms ({stage['share']:.1%})"
+            )
+        self.out(lines)
+
+    def bench_throughput(self, images: List[Path], repeat: int) -> None:
+        """
+        Pages per second of analyze_image (workers start-up included), for
+        each number of workers and CPUs layout (``--schedule``).
+        """
+        self.check_pipeline()
+        pages = self.synthetic_pages()
+        lines = [f"{len(pages)} page(s):"]
+        for workers in self.workers:
+            for schedule in self.schedules:
+                layout = CoreLayout(schedule, workers)
+                folder_dst = self.work_dir / f"throughput_{workers}_{schedule}"
+                folder_dst.mkdir(exist_ok=True)
+                tasks = [(page, folder_dst, False, self.params) for page in pages]
+                start = time.perf_counter()
+                with mp.Pool(
+                    processes=workers,
+                    initializer=init_worker,
+                    initargs=(
+                        self.east_model,
+                        DETECTOR_MODELS[self.params["detector"]],
+                        layout,
+                    ),
+                ) as pool:
+                    results = list(
+                        pool.imap_unordered(AnalyzeImage.process_image_star, tasks)
+                    )
+                    # includes the outputs still being written by the workers:
+                    pool.close()
+                    pool.join()
+                elapsed = time.perf_counter() - start
+                failed = [result for result in results if not result["success"]]
+                if failed:
+                    raise CommandError(f"{failed[0]['image']}: {failed[0]['error']}")
+                self.record(
+                    f"{workers} worker(s), {schedule}",
+                    len(pages) / elapsed,
+                    "pages/s",
+                    "higher",
+                )
+                lines.append(
+                    f"- {layout.describe()[:-1]}: {len(pages) / elapsed:.2f} "
+                    f"pages/s ({elapsed:.1f} s)"
+                )
+        self.out(lines)
+
+    def bench_convert(self, images: List[Path], repeat: int) -> None:
+        """JPEG save + MSE check of convert_new_images_to_jpg, per page."""
+        pages = self.synthetic_pages()
+        folder_dst = self.work_dir / "convert"
+        folder_dst.mkdir(exist_ok=True)
+        timings = []
+        for page in pages:
+            rgb_img = Image.open(page).convert("RGB")
+            img_src = cv2.imread(str(page))
+            name_dst = folder_dst / f"{page.stem}.jpg"
+            timings.append(
+                time_it(
+                    lambda: save_as_jpg(rgb_img, img_src, name_dst, 95, True), repeat
+                )
+            )
+        mean = sum(timing["mean"] for timing in timings) / len(timings)
+        self.record("page at quality 95", mean * 1000)
+        self.out(f"- page at quality 95: {mean * 1000:.1f} ms")
+
+    def bench_thumbnail(self, images: List[Path], repeat: int) -> None:
+        """ImageFile.generate_thumbnail() per page (no database access)."""
+        pages = self.synthetic_pages()
+        timings = []
+        for page in pages:
+            image_file = ImageFile(image_file=str(page), is_path_relative=False)
+            img = Image.open(page)
+            img.load()
+            timings.append(time_it(lambda: image_file.generate_thumbnail(img), repeat))
+        mean = sum(timing["mean"] for timing in timings) / len(timings)
+        self.record("page", mean * 1000)
+        self.out(f"- page: {mean * 1000:.1f} ms")
@@ -0,0 +1,167 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.ocr.font_clusters import FontClusters, live_batches
+from app.ocr.discovery import output_name
+from app.ocr.font_store import FontStore
+from ..base.out_mixin import OutMixin
+
+
+class Command(OutMixin, BaseCommand):
+    help = (
+        "Assign a font cluster to each text region analyzed (incremental "
+        "mini-batch k-means on the font features)"
+    )
+
+    def __init__(self, stdout=None, stderr=None, no_color=False, force_color=False):
+        super().__init__(stdout, stderr, no_color, force_color)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--folder-dst",
+            type=str,
+            default="analyzed_images",
+            help="Destination folder of analyze_image (relative to MEDIA_ROOT)",
+        )
+        parser.add_argument(
+            "--clusters",
+            type=int,
+            default=32,
+            help="Number of font clusters, used when the clusters are built "
+            "(default: 32)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=4096,
+            help="Regions per mini-batch (default: 4096)",
+        )
+        parser.add_argument(
+            "--epochs",
+            type=int,
+            default=3,
+            help="Passes over all the regions when the clusters are built "
+            "(default: 3)",
+        )
+        parser.add_argument(
+            "--refit",
+            action="store_true",
+            help="Build the clusters again from all the regions and assign "
+            "all the pages (default: only the new pages are assigned)",
+        )
+        parser.add_argument(
+            "--learn-new",
+            type=int,
+            default=1,
+            help="The regions of the new pages also update the clusters "
+            "(0=no, 1=yes), default: 1",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Random seed (default: 0)",
+        )
+        parser.add_argument(
+            "--progress-every",
+            type=float,
+            default=5.0,
+            help="Seconds between two progress lines (0 = no progress), default: 5",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        folder_dst: Path = Path(settings.MEDIA_ROOT, options["folder_dst"])
+        batch_size: int = max(1, options["batch_size"])
+        learn_new: bool = options["learn_new"] > 0
+        progress_every: float = options["progress_every"]
+
+        store = FontStore(folder_dst)
+        if not store.pages:
+            raise CommandError(f"No font features found in '{folder_dst}'.")
+
+        clusters = None if options["refit"] else FontClusters.load(folder_dst)
+        if clusters is None:
+            clusters = FontClusters(max(1, options["clusters"]), options["seed"])
+            self.out_success(
+                f"Building {clusters.k} clusters from {store.live_rows} "
+                f"regions ({options['epochs']} epoch(s))..."
+            )
+            for _ in range(max(1, options["epochs"])):
+                for batch in live_batches(store, batch_size, clusters.rng):
+                    clusters.partial_fit(batch)
+            learn_new = False  # all the regions were just learned
+
+        pending: List[str] = [
+            page
+            for page, entry in store.pages.items()
+            if clusters.assigned.get(page) != entry["id"]
+        ]
+        # forget the pages not in the store anymore:
+        clusters.assigned = {
+            page: entry_id
+            for page, entry_id in clusters.assigned.items()
+            if page in store.pages
+        }
+        self.out_success(
+            f"Assigning {len(pending)} page(s) to {clusters.k} clusters "
+            f"({len(store.pages) - len(pending)} already assigned)."
+        )
+
+        matrix = store.matrix()
+        sizes: np.ndarray = np.zeros(clusters.k, dtype=np.int64)
+        started: float = time.monotonic()
+        last_progress: float = started
+        try:
+            for done, page in enumerate(pending, 1):
+                entry = store.pages[page]
+                features = np.asarray(
+                    matrix[entry["start"] : entry["start"] + len(entry["regions"])]
+                )
+                if learn_new:
+                    labels = clusters.partial_fit(features)
+                else:
+                    labels = clusters.predict(features)
+                sizes += np.bincount(labels, minlength=clusters.k)
+                region_ids = [region[0] for region in entry["regions"]]
+                self.write_clusters(folder_dst, page, dict(zip(region_ids, labels)))
+                clusters.assigned[page] = entry["id"]
+                now = time.monotonic()
+                if progress_every > 0 and now - last_progress >= progress_every:
+                    last_progress = now
+                    self.out_progress(done, len(pending), started, unit="pages")
+        finally:
+            # pages assigned so far won't be assigned again on the next run
+            clusters.save(folder_dst)
+
+        if pending:
+            self.out_success(
+                ["Regions assigned per cluster:"]
+                + [
+                    f"- cluster {cluster}: {size}"
+                    for cluster, size in enumerate(sizes)
+                    if size
+                ]
+            )
+
+    @staticmethod
+    def write_clusters(folder_dst: Path, page: str, labels: Dict[int, int]) -> None:
+        """Add the ``font_cluster`` of each region to the analysis of ``page``."""
+        result_file = folder_dst / f"{output_name(page)}_analysis.json"
+        if not result_file.is_file():
+            return
+        with open(result_file, "r", encoding="utf-8") as f:
+            results = json.load(f)
+        for result in results:
+            if result["region_id"] in labels:
+                result["font_cluster"] = int(labels[result["region_id"]])
+        tmp = result_file.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, result_file)
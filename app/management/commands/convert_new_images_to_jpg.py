@@ -16,6 +16,23 @@ from django.utils.translation import gettext_lazy as _
 from core.models.file.image import ImageFile
 
 
+def save_as_jpg(rgb_img, img_src, name_dst, quality, progressive):
+    """
+    Save the PIL image ``rgb_img`` as JPEG and return the Mean Squared Error
+    between the JPEG read back and ``img_src`` (OpenCV image of the source).
+    """
+    rgb_img.save(str(name_dst), quality=quality, progressive=progressive)
+    img_dst = cv2.imread(str(name_dst))
+
+    # Compute 'Mean Squared Error': it's the sum of the squared
+    # difference between the two images.
+    # The lower the error, the more "similar" the two images are.
+    # NOTE: the two images must have the same dimension.
+    mse = numpy.sum((img_src.astype("float") -
+                     img_dst.astype("float")) ** 2)
+    return mse / float(img_src.shape[0] * img_src.shape[1])
+
+
 class Command(BaseCommand):
     help = "Searching image files in a directory that are *not* jpg and" \
            "convert them to jpg (maximum quality)"
@@ -245,17 +262,8 @@ class Command(BaseCommand):
             img_src = cv2.imread(filename_src)
 
             while True:
-                rgb_img.save(str(name_dst_full), quality=quality,
-                             progressive=progressive)
-                img_dst = cv2.imread(str(name_dst_full))
-
-                # Compute 'Mean Squared Error': it's the sum of the squared
-                # difference between the two images.
-                # The lower the error, the more "similar" the two images are.
-                # NOTE: the two images must have the same dimension.
-                mse = numpy.sum((img_src.astype("float") -
-                                 img_dst.astype("float")) ** 2)
-                mse /= float(img_src.shape[0] * img_src.shape[1])
+                mse = save_as_jpg(rgb_img, img_src, name_dst_full, quality,
+                                  progressive)
 
                 # # Compute  structural similarity:
                 # from skimage.metrics import structural_similarity
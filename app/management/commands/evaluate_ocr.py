@@ -0,0 +1,390 @@
+import itertools
+import json
+import multiprocessing as mp
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from app.ocr.discovery import output_name
+from app.ocr.metrics import error_counts, error_rates, pareto_front, reading_order
+from app.ocr.pyramid import DENOISE_STRENGTH, SCALES
+from app.ocr.registry import DEFAULT_EAST_MODEL_PATH, DETECTOR_MODELS, init_worker
+from app.ocr.scheduler import SCHEDULES, CoreLayout, available_cpus
+from app.ocr.synthetic import TRUTH_FILE_NAME, render_book
+from app.ocr.tesseract import OCR_MODES, PSM, THRESHOLD_BLOCK
+from app.ocr.validation import MIN_EDGE_DENSITY, MIN_VARIANCE
+from app.ocr.writer import get_writer
+from .analyze_image import Command as AnalyzeImage
+from ..base.out_mixin import OutMixin
+
+
+class Command(OutMixin, BaseCommand):
+    help = (
+        "Accuracy (CER, WER) and speed of analyze_image on pages of known "
+        "text, for each combination of a grid of parameters analyzed in "
+        "parallel; reports the best trade-offs between speed and accuracy"
+    )
+
+    REPORT_FILE_NAME: str = "evaluate_report.json"
+    # parameters of the grid: option (and params key) -> default values
+    GRID: Dict[str, List[Any]] = {
+        "denoise_strength": [DENOISE_STRENGTH],
+        "threshold_block": [THRESHOLD_BLOCK],
+        "min_variance": [MIN_VARIANCE],
+        "min_edge_density": [MIN_EDGE_DENSITY],
+        "psm": [PSM],
+        "consensus": [0],
+    }
+
+    def __init__(self, stdout=None, stderr=None, no_color=False, force_color=False):
+        super().__init__(stdout, stderr, no_color, force_color)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "folder_src",
+            type=str,
+            help=f"Folder of the pages and of their text ('{TRUTH_FILE_NAME}': "
+            '{page file name: {"lines": [{"text": ...}, ...]}} or {page file '
+            'name: "text"})',
+        )
+        parser.add_argument(
+            "--synthetic",
+            type=int,
+            default=0,
+            help="Render this number of synthetic pages (and their text) in "
+            "folder_src first (default: 0 = use the pages of folder_src)",
+        )
+        parser.add_argument(
+            "--denoise-strength",
+            type=float,
+            nargs="+",
+            default=self.GRID["denoise_strength"],
+            help="Values of --denoise-strength of analyze_image "
+            f"(default: {DENOISE_STRENGTH})",
+        )
+        parser.add_argument(
+            "--threshold-block",
+            type=int,
+            nargs="+",
+            default=self.GRID["threshold_block"],
+            help="Values of --threshold-block of analyze_image "
+            f"(default: {THRESHOLD_BLOCK})",
+        )
+        parser.add_argument(
+            "--min-variance",
+            type=float,
+            nargs="+",
+            default=self.GRID["min_variance"],
+            help=f"Values of --min-variance of analyze_image (default: {MIN_VARIANCE})",
+        )
+        parser.add_argument(
+            "--min-edge-density",
+            type=float,
+            nargs="+",
+            default=self.GRID["min_edge_density"],
+            help="Values of --min-edge-density of analyze_image "
+            f"(default: {MIN_EDGE_DENSITY})",
+        )
+        parser.add_argument(
+            "--psm",
+            type=int,
+            nargs="+",
+            default=self.GRID["psm"],
+            help=f"Values of --psm of analyze_image (default: {PSM})",
+        )
+        parser.add_argument(
+            "--consensus",
+            type=int,
+            nargs="+",
+            choices=[0, 1],
+            default=self.GRID["consensus"],
+            help="Values of --consensus of analyze_image (default: 0)",
+        )
+        parser.add_argument(
+            "--detector",
+            type=str,
+            choices=AnalyzeImage.DETECTORS,
+            default="mser-east",
+            help="Detector of analyze_image (default: mser-east)",
+        )
+        parser.add_argument(
+            "--ocr-mode",
+            type=str,
+            choices=OCR_MODES,
+            default="mosaic",
+            help="OCR mode of analyze_image (default: mosaic)",
+        )
+        parser.add_argument(
+            "--detect-scale",
+            type=int,
+            choices=SCALES,
+            default=1,
+            help="--detect-scale of analyze_image (default: 1)",
+        )
+        parser.add_argument(
+            "--east-model",
+            type=str,
+            default=DEFAULT_EAST_MODEL_PATH,
+            help=f"EAST model file (default: {DEFAULT_EAST_MODEL_PATH})",
+        )
+        parser.add_argument(
+            "--max-images",
+            type=int,
+            default=0,
+            help="Evaluate on this number of pages only (default: 0 = all)",
+        )
+        parser.add_argument(
+            "--num-processes",
+            type=int,
+            default=len(available_cpus()),
+            help="Number of processes to use (default: number of CPUs available)",
+        )
+        parser.add_argument(
+            "--schedule",
+            type=str,
+            choices=SCHEDULES,
+            default="off",
+            help="CPUs of the processes, see analyze_image (default: off)",
+        )
+        parser.add_argument(
+            "--output",
+            type=str,
+            help=f"Save the report in this JSON file (default: "
+            f"'{self.REPORT_FILE_NAME}' in folder_src)",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        folder_src: Path = Path(options["folder_src"]).resolve()
+        east_model: Path = Path(options["east_model"]).resolve()
+        num_processes: int = max(1, options["num_processes"])
+        if options["synthetic"] > 0:
+            render_book(folder_src, options["synthetic"])
+        truth_file: Path = folder_src / TRUTH_FILE_NAME
+        if not truth_file.is_file():
+            raise CommandError(
+                f"Text of the pages '{truth_file}' not found (or use --synthetic)."
+            )
+        if options["detector"] != "profile" and not east_model.is_file():
+            raise CommandError(
+                f"EAST model file '{east_model}' not found "
+                f"(or use --detector=profile)."
+            )
+        if any(block < 3 or block % 2 == 0 for block in options["threshold_block"]):
+            raise CommandError("--threshold-block values must be odd numbers >= 3.")
+
+        with open(truth_file, "r", encoding="utf-8") as f:
+            references: Dict[str, str] = {
+                name: self.reference_text(entry) for name, entry in json.load(f).items()
+            }
+        pages: List[Path] = [
+            folder_src / name
+            for name in sorted(references)
+            if (folder_src / name).is_file()
+        ]
+        if options["max_images"] > 0:
+            pages = pages[: options["max_images"]]
+        if not pages:
+            raise CommandError(f"None of the pages of '{truth_file}' found.")
+
+        base_params: Dict[str, Any] = {
+            "ocr_mode": options["ocr_mode"],
+            "east_model": str(east_model),
+            "east_mode": "resize",
+            "east_tile": 640,
+            "east_batch": 8,
+            "detector": options["detector"],
+            "profile_level": "lines",
+            "merge_padding": (0, 0),
+            "detect_scale": options["detect_scale"],
+            # every page analyzed, at its full cost:
+            "triage": "off",
+            "dedupe": False,
+            "preprocess_cache": False,
+            "annotate": "off",
+            "write_queue": 4,
+        }
+        grid: Dict[str, List[Any]] = {name: options[name] for name in self.GRID}
+        combinations: List[Dict[str, Any]] = [
+            dict(zip(grid, values)) for values in itertools.product(*grid.values())
+        ]
+        layout = CoreLayout(options["schedule"], num_processes)
+        self.out_success(
+            [
+                f"{len(pages)} page(s) x {len(combinations)} combination(s) of "
+                f"parameters.",
+                layout.describe(),
+            ]
+        )
+
+        counts: List[List[Dict[str, Any]]] = [[] for _ in combinations]
+        failures: List[Dict[str, Any]] = []
+        started: float = time.monotonic()
+        with tempfile.TemporaryDirectory(prefix="evaluate_") as work_dir:
+            tasks: List[Tuple[int, Path, Path, Dict[str, Any], str]] = []
+            for index, combination in enumerate(combinations):
+                folder_dst = Path(work_dir, str(index))
+                folder_dst.mkdir()
+                tasks += [
+                    (
+                        index,
+                        page,
+                        folder_dst,
+                        {**base_params, **combination},
+                        references[page.name],
+                    )
+                    for page in pages
+                ]
+            with mp.Pool(
+                processes=num_processes,
+                initializer=init_worker,
+                # the models of the detector only: no EAST file with 'profile'
+                initargs=(
+                    str(east_model),
+                    DETECTOR_MODELS[options["detector"]],
+                    layout,
+                ),
+            ) as pool:
+                for done, result in enumerate(
+                    pool.imap_unordered(self.evaluate_page_star, tasks), 1
+                ):
+                    if result["success"]:
+                        counts[result["index"]].append(result)
+                    else:
+                        failures.append(result)
+                    self.out_progress(done, len(tasks), started, unit="pages")
+                pool.close()
+                pool.join()
+
+        results: List[Dict[str, Any]] = []
+        for combination, page_counts in zip(combinations, counts):
+            if not page_counts:
+                continue
+            results.append(
+                {
+                    "params": combination,
+                    "pages": len(page_counts),
+                    **error_rates(page_counts),
+                    # time of a page in one process (not the throughput of
+                    # the pool, which depends on the other combinations):
+                    "seconds": float(np.mean([c["wall"] for c in page_counts])),
+                    "cpu": float(np.mean([c["cpu"] for c in page_counts])),
+                }
+            )
+        front: List[int] = pareto_front(results, ["cer", "seconds"])
+        report: Dict[str, Any] = {
+            "folder_src": str(folder_src),
+            "pages": len(pages),
+            "params": base_params,
+            "grid": grid,
+            "results": results,
+            "pareto": [results[i] for i in front],
+            "failures": failures,
+        }
+        output = (
+            Path(options["output"])
+            if options["output"]
+            else folder_src / self.REPORT_FILE_NAME
+        )
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+        self.out_results(results, front, grid)
+        if failures:
+            self.out_error(
+                f"{len(failures)} analysis(es) failed, first: "
+                f"{failures[0]['page']}: {failures[0]['error']}"
+            )
+        self.out(f"Full report: '{output}'.")
+
+    @staticmethod
+    def reference_text(entry: Any) -> str:
+        """Text of a page of the truth file (``render_book()`` format or text)."""
+        if isinstance(entry, str):
+            return entry
+        if "lines" in entry:
+            return "\n".join(line["text"] for line in entry["lines"])
+        return entry["text"]
+
+    def out_results(
+        self, results: List[Dict[str, Any]], front: List[int], grid: Dict[str, Any]
+    ) -> None:
+        """
+        Combinations from the most accurate, the best trade-offs (no other
+        combination is both faster and more accurate) marked with '*'.
+        """
+        # only the parameters that vary are worth printing:
+        varying = [name for name, values in grid.items() if len(values) > 1]
+        lines = ["CER, WER, seconds per page (one process), parameters:"]
+        for i in sorted(range(len(results)), key=lambda i: results[i]["cer"]):
+            result = results[i]
+            described = ", ".join(
+                f"{name}={result['params'][name]}" for name in varying
+            )
+            lines.append(
+                f"{'*' if i in front else ' '} {result['cer']:.2%}  "
+                f"{result['wer']:.2%}  {result['seconds']:.2f}s  {described}"
+            )
+        self.out(lines)
+        if results:
+            best = min(results, key=lambda result: (result["cer"], result["seconds"]))
+            self.out_success(
+                "Most accurate: analyze_image "
+                + " ".join(
+                    f"--{name.replace('_', '-')} {value}"
+                    for name, value in best["params"].items()
+                )
+            )
+
+    @staticmethod
+    def evaluate_page_star(args: Tuple[Any, ...]) -> Dict[str, Any]:
+        return Command.evaluate_page(*args)
+
+    @staticmethod
+    def evaluate_page(
+        index: int,
+        image_path: Path,
+        folder_dst: Path,
+        params: Dict[str, Any],
+        reference: str,
+    ) -> Dict[str, Any]:
+        """
+        Analyze a page with the combination ``index`` of parameters, compare
+        the text read (regions in reading order) to the ``reference``.
+        """
+        result = AnalyzeImage.process_image(image_path, folder_dst, False, params)
+        error = result.get("error")
+        if result["success"]:
+            # the text is in the outputs, written in the background:
+            writer = get_writer(params["write_queue"])
+            writer.flush()
+            write_failures = result["write_failures"] + writer.pop_failures()
+            if write_failures:
+                error = write_failures[0]["error"]
+        if error:
+            return {
+                "index": index,
+                "page": image_path.name,
+                "success": False,
+                "error": error,
+            }
+        output = AnalyzeImage.output_paths(
+            folder_dst, output_name(image_path.name), params["annotate"]
+        )[0]
+        with open(output, "r", encoding="utf-8") as f:
+            regions = json.load(f)
+        hypothesis = "\n".join(
+            regions[i]["text"]
+            for i in reading_order([region["position"] for region in regions])
+        )
+        page = result["profile"]["stages"]["page"]
+        return {
+            "index": index,
+            "page": image_path.name,
+            "success": True,
+            "wall": page["wall"],
+            "cpu": page["cpu"],
+            **error_counts(reference, hypothesis),
+        }
@@ -0,0 +1,98 @@
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.ocr.discovery import output_name
+from app.ocr.font_store import FontStore
+from ..base.out_mixin import OutMixin
+
+
+class Command(OutMixin, BaseCommand):
+    help = "Find the regions set in the same font as a given region"
+
+    def __init__(self, stdout=None, stderr=None, no_color=False, force_color=False):
+        super().__init__(stdout, stderr, no_color, force_color)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--folder-dst",
+            type=str,
+            default="analyzed_images",
+            help="Destination folder of analyze_image (relative to MEDIA_ROOT)",
+        )
+        parser.add_argument(
+            "--page",
+            type=str,
+            required=True,
+            help="Page of the region, relative to the source folder of "
+            "analyze_image (e.g. 'page_012.jpg')",
+        )
+        parser.add_argument(
+            "--region",
+            type=int,
+            required=True,
+            help="Id of the region in the page ('region_id' of its analysis)",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=20,
+            help="Number of regions to return (default: 20)",
+        )
+        parser.add_argument(
+            "--with-text",
+            action="store_true",
+            help="Show the text of the regions found (reads the analysis "
+            "files of their pages)",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        folder_dst: Path = Path(settings.MEDIA_ROOT, options["folder_dst"])
+        page: str = options["page"]
+        region_id: int = options["region"]
+
+        store = FontStore(folder_dst)
+        if not store.pages:
+            raise CommandError(f"No font features found in '{folder_dst}'.")
+        row = store.find(page, region_id)
+        if row is None:
+            raise CommandError(f"Region {region_id} of page '{page}' not found.")
+
+        found = store.nearest(store.vector(row), options["top"], exclude=row)
+        texts: Dict[str, Dict[int, str]] = {}
+        if options["with_text"]:
+            texts = self.load_texts(folder_dst, [page] + [f[0] for f in found])
+
+        lines: List[str] = [
+            f"Regions closest to region {region_id} of '{page}'"
+            f"{self.text_suffix(texts, page, region_id)}:"
+        ]
+        for found_page, found_id, (x, y, w, h), distance in found:
+            lines.append(
+                f"- {distance:.4f} '{found_page}' region {found_id} "
+                f"({x}, {y}, {w}, {h})"
+                f"{self.text_suffix(texts, found_page, found_id)}"
+            )
+        self.out_success(lines)
+
+    @staticmethod
+    def load_texts(folder_dst: Path, pages: List[str]) -> Dict[str, Dict[int, str]]:
+        """Texts of the regions of ``pages``, read from their analysis files."""
+        texts: Dict[str, Dict[int, str]] = {}
+        for page in dict.fromkeys(pages):
+            result_file = folder_dst / f"{output_name(page)}_analysis.json"
+            if not result_file.is_file():
+                continue
+            with open(result_file, "r", encoding="utf-8") as f:
+                texts[page] = {
+                    result["region_id"]: result["text"] for result in json.load(f)
+                }
+        return texts
+
+    @staticmethod
+    def text_suffix(texts: Dict[str, Dict[int, str]], page: str, region_id: int) -> str:
+        text = texts.get(page, {}).get(region_id)
+        return f": {text!r}" if text is not None else ""
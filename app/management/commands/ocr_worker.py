@@ -0,0 +1,212 @@
+import multiprocessing as mp
+import time
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+
+from app.models.ocr_job import OcrJob
+from app.ocr.job_queue import Heartbeat, job_payload, worker_name
+from app.ocr.registry import DEFAULT_EAST_MODEL_PATH, init_worker
+from app.ocr.scheduler import SCHEDULES, CoreLayout, available_cpus
+from app.ocr.writer import get_writer
+from .analyze_image import Command as AnalyzeImage
+from ..base.out_mixin import OutMixin
+
+
+class Command(OutMixin, BaseCommand):
+    help = (
+        "Analyze the pages queued by 'analyze_image --distributed': run it on "
+        "each node sharing the database and the storage of the pages"
+    )
+
+    def __init__(self, stdout=None, stderr=None, no_color=False, force_color=False):
+        super().__init__(stdout, stderr, no_color, force_color)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--num-processes",
+            type=int,
+            default=len(available_cpus()),
+            help="Number of processes claiming pages on this node "
+            "(default: number of CPUs available)",
+        )
+        parser.add_argument(
+            "--schedule",
+            type=str,
+            choices=SCHEDULES,
+            default="off",
+            help="CPUs of the processes, see analyze_image (default: off)",
+        )
+        parser.add_argument(
+            "--threads-per-process",
+            type=int,
+            default=0,
+            help="With --schedule=shared or pinned: OpenCV and Tesseract "
+            "threads of each process (default: 0 = CPUs / processes)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2,
+            help="Pages claimed at once by a process (default: 2)",
+        )
+        parser.add_argument(
+            "--lease",
+            type=float,
+            default=600.0,
+            help="Seconds a claim stays valid without heartbeat: the pages "
+            "of a node that died are analyzed by others after this delay "
+            "(default: 600)",
+        )
+        parser.add_argument(
+            "--heartbeat",
+            type=float,
+            default=0.0,
+            help="Seconds between two renewals of the lease while the pages "
+            "are analyzed (default: 0 = a quarter of --lease)",
+        )
+        parser.add_argument(
+            "--idle-wait",
+            type=float,
+            default=10.0,
+            help="Seconds to wait before asking again when the queue is "
+            "empty (default: 10)",
+        )
+        parser.add_argument(
+            "--exit-when-empty",
+            action="store_true",
+            help="Stop when there's nothing to claim, instead of waiting for "
+            "new pages",
+        )
+        parser.add_argument(
+            "--east-model",
+            type=str,
+            default=DEFAULT_EAST_MODEL_PATH,
+            help=f"EAST model file on this node (default: {DEFAULT_EAST_MODEL_PATH})",
+        )
+        parser.add_argument(
+            "--warm-models",
+            type=int,
+            default=1,
+            help="Load the models in each process before the first page "
+            "(0=no, lazy loading, 1=yes), default: 1",
+        )
+        parser.add_argument(
+            "--verbose",
+            type=int,
+            default=1,
+            help="Verbose mode (0=silent, 1=verbose), default is verbose",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        num_processes: int = max(1, options["num_processes"])
+        east_model: Path = Path(options["east_model"]).resolve()
+        lease: float = options["lease"]
+        heartbeat: float = options["heartbeat"] or lease / 4
+        if lease <= 0:
+            raise CommandError("--lease must be positive.")
+        if heartbeat >= lease:
+            raise CommandError("--heartbeat must be shorter than --lease.")
+        if not east_model.is_file():
+            raise CommandError(f"EAST model file '{east_model}' not found.")
+
+        work_args = (
+            max(1, options["batch_size"]),
+            lease,
+            heartbeat,
+            options["idle_wait"],
+            options["exit_when_empty"],
+            options["verbose"] > 0,
+        )
+        layout = CoreLayout(
+            options["schedule"], num_processes, options["threads_per_process"]
+        )
+        self.out_success(
+            [
+                f"Worker {worker_name()}: {work_args[0]} page(s) per claim, "
+                f"lease {lease:g}s (heartbeat every {heartbeat:g}s).",
+                layout.describe(),
+            ]
+        )
+        # forked processes must open their own database connections:
+        connections.close_all()
+        started: float = time.monotonic()
+        # running headers and footers (--dedupe), shared by the processes of
+        # this node:
+        with mp.Manager() as manager:
+            with mp.Pool(
+                processes=num_processes,
+                initializer=init_worker,
+                initargs=(
+                    str(east_model),
+                    options["warm_models"] > 0,
+                    layout,
+                    manager.dict(),
+                ),
+            ) as pool:
+                stats = pool.map(self.work_star, [work_args] * num_processes)
+                pool.close()
+                pool.join()
+
+        elapsed: float = time.monotonic() - started
+        done = sum(s["done"] for s in stats)
+        summary = [f"{done} page(s) analyzed in {elapsed:.1f}s:"]
+        for s in stats:
+            summary.append(
+                f"- {s['worker']}: {s['done']} done, {s['failed']} failed, "
+                f"{s['lost']} lost lease(s)"
+            )
+        self.out(summary)
+
+    @staticmethod
+    def work_star(args: Tuple[Any, ...]) -> Dict[str, Any]:
+        return Command.work(*args)
+
+    @staticmethod
+    def work(
+        batch_size: int,
+        lease: float,
+        heartbeat: float,
+        idle_wait: float,
+        exit_when_empty: bool,
+        verbose: bool,
+    ) -> Dict[str, Any]:
+        """
+        Loop of a process: claim a batch of pages, analyze them while a
+        heartbeat renews their lease, store their results in the queue (the
+        outputs themselves are written in the shared ``folder_dst``).
+        """
+        name = worker_name()
+        stats: Dict[str, Any] = {"worker": name, "done": 0, "failed": 0, "lost": 0}
+        while True:
+            close_old_connections()
+            OcrJob.fail_expired()
+            jobs = OcrJob.claim(name, batch_size, lease)
+            if not jobs:
+                if exit_when_empty:
+                    return stats
+                time.sleep(idle_wait)
+                continue
+            with Heartbeat(jobs[0].lease_token, lease, heartbeat):
+                for job in jobs:
+                    folder_dst = Path(job.folder_dst)
+                    folder_dst.mkdir(parents=True, exist_ok=True)
+                    result = AnalyzeImage.process_image(
+                        Path(job.source), folder_dst, verbose, job.params, job.page
+                    )
+                    # the page is done once its outputs are on the storage:
+                    writer = get_writer(job.params["write_queue"])
+                    writer.flush()
+                    write_failures = result.get("write_failures", [])
+                    write_failures += writer.pop_failures()
+                    if result["success"] and not write_failures:
+                        kept = job.complete(**job_payload(result))
+                        stats["done"] += kept
+                    else:
+                        error = result.get("error") or write_failures[0]["error"]
+                        kept = job.fail(error)
+                        stats["failed"] += kept
+                    # the lease expired and another worker claimed the page:
+                    stats["lost"] += not kept
@@ -0,0 +1,42 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_persontyped'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OcrJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=1000)),
+                ('page', models.CharField(max_length=1000)),
+                ('folder_dst', models.CharField(max_length=1000)),
+                ('params', models.JSONField(default=dict)),
+                ('status', models.IntegerField(choices=[(1, 'Pending'), (2, 'Running'), (3, 'Done'), (4, 'Failed')], default=1)),
+                ('attempts', models.IntegerField(default=0)),
+                ('max_attempts', models.IntegerField(default=3)),
+                ('worker', models.CharField(blank=True, default='', max_length=200)),
+                ('lease_token', models.CharField(blank=True, db_index=True, default='', max_length=32)),
+                ('lease_expires', models.DateTimeField(blank=True, default=None, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('regions', models.JSONField(blank=True, default=None, null=True)),
+                ('features', models.BinaryField(blank=True, default=None, null=True)),
+                ('result', models.JSONField(blank=True, default=None, null=True)),
+                ('collected', models.BooleanField(default=False)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_done', models.DateTimeField(blank=True, default=None, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='ocrjob',
+            index=models.Index(fields=['status', 'lease_expires'], name='app_ocrjob_status_8d421b_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='ocrjob',
+            constraint=models.UniqueConstraint(fields=('folder_dst', 'page'), name='ocr_job_unique_page'),
+        ),
+    ]
@@ -0,0 +1,139 @@
+import uuid
+from datetime import timedelta
+
+from django.db import connection, models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class OcrJob(models.Model):
+    """
+    A page to analyze, in the queue shared by the ``ocr_worker`` of all the
+    nodes (``analyze_image --distributed`` fills it and collects results).
+
+    A worker claims a batch of jobs with a lease: the jobs are its own until
+    ``lease_expires``, which it pushes back with heartbeats while it works.
+    Jobs of a worker that died are claimed again once their lease expired.
+    All the updates of a claimed job check its ``lease_token``, so a worker
+    whose lease was lost can't overwrite the work of the new owner.
+    """
+
+    class Status(models.IntegerChoices):
+        PENDING = 1, _('Pending')
+        RUNNING = 2, _('Running')
+        DONE = 3, _('Done')
+        FAILED = 4, _('Failed')
+
+    source = models.CharField(max_length=1000)
+    page = models.CharField(max_length=1000)
+    folder_dst = models.CharField(max_length=1000)
+    params = models.JSONField(default=dict)
+    status = models.IntegerField(default=Status.PENDING,
+                                 choices=Status.choices)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    worker = models.CharField(max_length=200, blank=True, default='')
+    lease_token = models.CharField(max_length=32, blank=True, default='',
+                                   db_index=True)
+    lease_expires = models.DateTimeField(default=None, null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    # results, until they're collected by analyze_image:
+    regions = models.JSONField(default=None, null=True, blank=True)
+    features = models.BinaryField(default=None, null=True, blank=True)
+    result = models.JSONField(default=None, null=True, blank=True)
+    collected = models.BooleanField(default=False)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_done = models.DateTimeField(default=None, null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['folder_dst', 'page'],
+                                    name='ocr_job_unique_page'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'lease_expires']),
+        ]
+
+    def __str__(self):
+        return f'{self.page} ({self.get_status_display()})'
+
+    @classmethod
+    def claimable(cls):
+        """Pending jobs, and running jobs whose worker lost its lease."""
+        return (Q(status=cls.Status.PENDING) |
+                Q(status=cls.Status.RUNNING,
+                  lease_expires__lt=timezone.now(),
+                  attempts__lt=F('max_attempts')))
+
+    @classmethod
+    def claim(cls, worker, batch_size, lease_seconds):
+        """
+        Atomically take at most ``batch_size`` jobs for ``worker``.
+
+        PostgreSQL (and any database supporting it): the candidate rows are
+        locked with ``SELECT ... FOR UPDATE SKIP LOCKED``, so concurrent
+        workers never wait for each other nor get the same rows.
+        SQLite has no row locks but serializes the writes: the candidates
+        are taken by one UPDATE statement (a sub-query picks them) and the
+        worker gets back the rows its token was written on. A SELECT then
+        UPDATE transaction would fail with "database is locked" when two
+        workers read at the same time.
+        """
+        token = uuid.uuid4().hex
+        candidates = cls.objects.filter(cls.claimable()).order_by('id')
+        claim = dict(
+            status=cls.Status.RUNNING,
+            worker=worker,
+            lease_token=token,
+            lease_expires=timezone.now() + timedelta(seconds=lease_seconds),
+            attempts=F('attempts') + 1,
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            with transaction.atomic():
+                locked = candidates.select_for_update(skip_locked=True)
+                ids = list(locked.values_list('id', flat=True)[:batch_size])
+                cls.objects.filter(id__in=ids).update(**claim)
+        else:
+            cls.objects.filter(
+                cls.claimable(), id__in=candidates.values('id')[:batch_size]
+            ).update(**claim)
+        return list(cls.objects.filter(lease_token=token).order_by('id'))
+
+    @classmethod
+    def renew(cls, token, lease_seconds):
+        """Heartbeat: extend the lease of the jobs still running."""
+        return cls.objects.filter(
+            lease_token=token, status=cls.Status.RUNNING
+        ).update(lease_expires=timezone.now() + timedelta(
+            seconds=lease_seconds))
+
+    @classmethod
+    def fail_expired(cls):
+        """Jobs whose workers died on each of their attempts: failed."""
+        return cls.objects.filter(
+            status=cls.Status.RUNNING,
+            lease_expires__lt=timezone.now(),
+            attempts__gte=F('max_attempts'),
+        ).update(status=cls.Status.FAILED,
+                 error='Lease expired on the last attempt.',
+                 date_done=timezone.now())
+
+    def complete(self, regions, features, result):
+        """Store the results; False if the lease was lost meanwhile."""
+        return OcrJob.objects.filter(
+            pk=self.pk, lease_token=self.lease_token,
+            status=self.Status.RUNNING,
+        ).update(status=self.Status.DONE, regions=regions,
+                 features=features, result=result, error='',
+                 collected=False, date_done=timezone.now()) == 1
+
+    def fail(self, error):
+        """Back to the queue, or failed after ``max_attempts`` attempts."""
+        status = (self.Status.PENDING if self.attempts < self.max_attempts
+                  else self.Status.FAILED)
+        return OcrJob.objects.filter(
+            pk=self.pk, lease_token=self.lease_token,
+            status=self.Status.RUNNING,
+        ).update(status=status, error=error, lease_expires=None,
+                 collected=False, date_done=timezone.now()) == 1
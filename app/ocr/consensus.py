@@ -0,0 +1,193 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from difflib import SequenceMatcher
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.ocr.profiling import profiler
+from app.ocr.tesseract import THRESHOLD_BLOCK, binarize, ocr_mosaic_words
+
+# text of a region and the Tesseract confidence (0-100) of each character:
+Reading = Tuple[str, List[float]]
+
+SAUVOLA_WINDOW: int = 25
+SAUVOLA_K: float = 0.2
+# dynamic range of the standard deviation of 8 bits images:
+SAUVOLA_R: float = 128.0
+# "adaptive-wide": neighbourhood this many times bigger (faint strokes)
+WIDE_BLOCK_FACTOR: int = 3
+# a region read with all its words at least this confident by the first
+# variant is not read again:
+CONFIDENT: float = 90.0
+
+
+def sauvola(gray: np.ndarray, window: int = SAUVOLA_WINDOW) -> np.ndarray:
+    """
+    Sauvola thresholding: local mean lowered where the local contrast is
+    low, so the foxing and stains of old paper stay white. Box filters on
+    float images: a few passes over the region whatever the window.
+    """
+    values = gray.astype(np.float32)
+    mean = cv2.boxFilter(values, -1, (window, window), borderType=cv2.BORDER_REFLECT)
+    sq_mean = cv2.boxFilter(
+        values * values, -1, (window, window), borderType=cv2.BORDER_REFLECT
+    )
+    std = np.sqrt(np.maximum(sq_mean - mean * mean, 0))
+    threshold = mean * (1 + SAUVOLA_K * (std / SAUVOLA_R - 1))
+    return np.where(values > threshold, 255, 0).astype(np.uint8)
+
+
+def otsu(gray: np.ndarray) -> np.ndarray:
+    """Global threshold of the region (faint but even text)."""
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return binary
+
+
+# binarizations of a region: (gray, --threshold-block) -> text black on white
+VARIANTS: Dict[str, Callable[[np.ndarray, int], np.ndarray]] = {
+    "adaptive": binarize,
+    "otsu": lambda gray, block: otsu(gray),
+    "sauvola": lambda gray, block: sauvola(gray),
+    "adaptive-wide": lambda gray, block: binarize(gray, block * WIDE_BLOCK_FACTOR),
+}
+# variants run together (one thread each); the next round is only run on
+# the regions the variants read so far don't agree on (the first one: on
+# the regions it isn't confident about)
+ROUNDS: List[List[str]] = [["adaptive"], ["otsu", "sauvola"], ["adaptive-wide"]]
+
+
+def words_to_reading(data: Dict[str, List], indices: List[int]) -> Reading:
+    """
+    Like ``words_to_text()``, with the confidence of each character (the
+    one of its word; spaces and newlines: the one of the previous word).
+    """
+    lines: Dict[Tuple[int, int, int], List[int]] = {}
+    for i in indices:
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append(i)
+    text: List[str] = []
+    confidences: List[float] = []
+    for line in lines.values():
+        for i in line:
+            word = data["text"][i]
+            confidence = max(0.0, float(data["conf"][i]))
+            if text:
+                text.append("\n" if i == line[0] else " ")
+                confidences.append(confidences[-1])
+            text.append(word)
+            confidences += [confidence] * len(word)
+    return "".join(text), confidences
+
+
+def align(
+    pivot: str, reading: Reading
+) -> Tuple[List[Tuple[str, float]], List[Tuple[str, float]]]:
+    """
+    Align ``reading`` on the ``pivot`` text: for each character of the
+    pivot, the character read instead ("" = deleted) and its confidence;
+    for each gap between them (len(pivot) + 1), the text inserted there.
+    Deletions and empty gaps have the mean confidence of the reading.
+    """
+    text, confidences = reading
+    default = float(np.mean(confidences)) if confidences else 0.0
+    chars: List[Tuple[str, float]] = [("", default)] * len(pivot)
+    gaps: List[Tuple[str, float]] = [("", default)] * (len(pivot) + 1)
+    matcher = SequenceMatcher(None, pivot, text, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag in ("equal", "replace"):
+            for k in range(min(i2 - i1, j2 - j1)):
+                chars[i1 + k] = (text[j1 + k], confidences[j1 + k])
+            # the rest of a longer replacement is inserted after it:
+            j1 += min(i2 - i1, j2 - j1)
+            i1 = i2
+        if j1 < j2:
+            gaps[i1] = (text[j1:j2], float(np.mean(confidences[j1:j2])))
+    return chars, gaps
+
+
+def vote(readings: List[Reading]) -> str:
+    """
+    Text of a region from the readings of several variants: each one is
+    aligned on the most confident reading, then each character (and each
+    insertion between two characters) gets the candidate of highest total
+    confidence; on a tie, the pivot wins.
+    """
+    pivot = max(
+        readings, key=lambda reading: np.mean(reading[1]) if reading[1] else -1.0
+    )[0]
+    chars: List[Dict[str, float]] = [defaultdict(float) for _ in pivot]
+    gaps: List[Dict[str, float]] = [defaultdict(float) for _ in range(len(pivot) + 1)]
+    for aligned_chars, aligned_gaps in [
+        align(pivot, reading)
+        for reading in sorted(readings, key=lambda reading: reading[0] != pivot)
+    ]:
+        for votes, (candidate, confidence) in zip(chars, aligned_chars):
+            votes[candidate] += max(confidence, 1.0)
+        for votes, (candidate, confidence) in zip(gaps, aligned_gaps):
+            votes[candidate] += max(confidence, 1.0)
+    text = [max(gaps[0], key=gaps[0].__getitem__)]
+    for char_votes, gap_votes in zip(chars, gaps[1:]):
+        text.append(max(char_votes, key=char_votes.__getitem__))
+        text.append(max(gap_votes, key=gap_votes.__getitem__))
+    return "".join(text)
+
+
+def agree(readings: List[Reading]) -> bool:
+    return len({" ".join(text.split()) for text, _ in readings}) == 1
+
+
+def consensus_ocr(
+    regions: List[np.ndarray],
+    config: str,
+    block: int = THRESHOLD_BLOCK,
+    binarized: Optional[List[np.ndarray]] = None,
+) -> List[str]:
+    """
+    Text of each (grayscale, enhanced) region read under the ``ROUNDS`` of
+    binarization ``VARIANTS``: the variants of a round run in parallel
+    threads (each one OCRs its mosaic of regions: the ``tesseract``
+    processes run at the same time), only on the regions still uncertain.
+    Regions that never reach an agreement get the ``vote()`` of all the
+    readings. ``binarized`` = the regions already binarized by the first
+    variant.
+
+    Usage:
+        texts = consensus_ocr(gray_regions, tesseract_config(psm), block)
+    """
+    readings: List[List[Reading]] = [[] for _ in regions]
+
+    def read(name: str, indices: List[int]) -> List[Reading]:
+        if name == ROUNDS[0][0] and binarized is not None:
+            images = [binarized[i] for i in indices]
+        else:
+            images = [VARIANTS[name](regions[i], block) for i in indices]
+        return [
+            words_to_reading(data, word_indices)
+            for data, word_indices in ocr_mosaic_words(images, config)
+        ]
+
+    pending: List[int] = list(range(len(regions)))
+    for number, names in enumerate(ROUNDS):
+        if not pending:
+            break
+        with ThreadPoolExecutor(max_workers=len(names)) as executor:
+            for variant_readings in executor.map(read, names, [pending] * len(names)):
+                for i, reading in zip(pending, variant_readings):
+                    readings[i].append(reading)
+        profiler.count("consensus_reads", len(pending) * len(names))
+        if number == 0:
+            pending = [
+                i
+                for i in pending
+                if not readings[i][0][1] or min(readings[i][0][1]) < CONFIDENT
+            ]
+        else:
+            pending = [i for i in pending if not agree(readings[i])]
+    profiler.count("consensus_votes", len(pending))
+    undecided = set(pending)
+    return [
+        vote(region_readings) if i in undecided else region_readings[0][0]
+        for i, region_readings in enumerate(readings)
+    ]
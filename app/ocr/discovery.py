@@ -0,0 +1,139 @@
+import os
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import cv2
+
+IMAGE_EXTENSIONS: List[str] = [".jpg", ".jpeg", ".png", ".tif", ".tiff"]
+# first bytes of the files of each format:
+SIGNATURES: List[Tuple[bytes, str]] = [
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+]
+# page key of the frames of a multi-page TIFF: "relative/path.tif#<frame>"
+FRAME_SEPARATOR = "#"
+
+
+def sniff(path: Path) -> Optional[str]:
+    """Format of the file according to its first bytes, None if unknown."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(8)
+    except OSError:
+        return None
+    for signature, image_format in SIGNATURES:
+        if head.startswith(signature):
+            return image_format
+    return None
+
+
+def walk_files(folder: Path) -> Iterator[Path]:
+    """
+    Files of ``folder`` and of all its sub-folders, yielded as the folders
+    are read (``os.scandir()``: no ``stat()`` call per file on most
+    systems). Sorted by name in each folder, hidden entries and symbolic
+    links to folders (possible loops) are ignored.
+    """
+    pending: List[Path] = [folder]
+    while pending:
+        current = pending.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+        sub_folders: List[Path] = []
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                sub_folders.append(Path(entry.path))
+            elif entry.is_file():
+                yield Path(entry.path)
+        # depth first, in name order:
+        pending.extend(reversed(sub_folders))
+
+
+def page_key(relative_path: str, frame: Optional[int] = None) -> str:
+    if frame is None:
+        return relative_path
+    return f"{relative_path}{FRAME_SEPARATOR}{frame}"
+
+
+def split_page_key(key: str) -> Tuple[str, Optional[int]]:
+    """Inverse of ``page_key()``: (relative path, frame or None)."""
+    relative_path, separator, frame = key.rpartition(FRAME_SEPARATOR)
+    if separator and frame.isdigit():
+        return relative_path, int(frame)
+    return key, None
+
+
+def output_name(key: str) -> str:
+    """
+    Base name of the output files of a page: its path relative to the source
+    folder without extension, folders joined by "__" (pages with the same
+    name in different folders don't overwrite each other), and the page
+    number for the frames of multi-page TIFFs.
+    """
+    relative_path, frame = split_page_key(key)
+    name = "__".join(Path(relative_path).with_suffix("").parts)
+    if frame is not None:
+        name += f"_p{frame + 1:04d}"
+    return name
+
+
+class PageDiscovery:
+    """
+    Lazy discovery of the pages to analyze in a folder tree: files are
+    filtered by extension (case insensitive), then by their first bytes, and
+    each frame of a multi-page TIFF is a page. Iterating yields
+    (page key, path, frame) as soon as each file is found, so the analysis
+    starts before the whole tree is walked.
+
+    Usage:
+        discovery = PageDiscovery(folder_src)
+        for key, path, frame in discovery:
+            ...
+        discovery.finished, discovery.pages, discovery.rejected
+    """
+
+    def __init__(
+        self,
+        folder: Path,
+        extensions: Iterable[str] = IMAGE_EXTENSIONS,
+        sniff_content: bool = True,
+    ):
+        self.folder: Path = folder
+        self.extensions = {
+            "." + extension.lower().lstrip(".") for extension in extensions
+        }
+        self.sniff_content: bool = sniff_content
+        self.pages: int = 0
+        # files with a right extension but not an image:
+        self.rejected: int = 0
+        self.finished: bool = False
+
+    def __iter__(self) -> Iterator[Tuple[str, Path, Optional[int]]]:
+        for path in walk_files(self.folder):
+            if path.suffix.lower() not in self.extensions:
+                continue
+            image_format = sniff(path) if self.sniff_content else None
+            if self.sniff_content and image_format is None:
+                self.rejected += 1
+                continue
+            relative_path = path.relative_to(self.folder).as_posix()
+            frames = 1
+            if image_format == "tiff" or (
+                image_format is None and path.suffix.lower() in (".tif", ".tiff")
+            ):
+                frames = cv2.imcount(str(path))
+            if frames > 1:
+                for frame in range(frames):
+                    self.pages += 1
+                    yield page_key(relative_path, frame), path, frame
+            else:
+                self.pages += 1
+                yield relative_path, path, None
+        self.finished = True
@@ -0,0 +1,270 @@
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+from app.ocr.registry import registry
+
+EAST_INPUT_SIZE: Tuple[int, int] = (320, 320)
+EAST_MEAN: Tuple[float, float, float] = (123.68, 116.78, 103.94)
+EAST_OUTPUT_LAYERS: List[str] = [
+    "feature_fusion/Conv_7/Sigmoid",
+    "feature_fusion/concat_3",
+]
+# each cell of the score/geometry maps covers 4x4 pixels of the input blob:
+EAST_CELL_SIZE: float = 4.0
+EAST_MODES: List[str] = ["resize", "tiled"]
+EAST_TILE_SIZES: List[int] = [320, 640]
+# part of a tile shared with its neighbours, so text cut by a tile border is
+# seen whole by the next tile:
+EAST_TILE_OVERLAP: float = 0.25
+
+
+def to_bgr(image: np.ndarray) -> np.ndarray:
+    """EAST expects 3 channels: convert grayscale/BGRA images to BGR."""
+    if len(image.shape) == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    if image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+    return image
+
+
+def run_east(
+    image: np.ndarray, size: Tuple[int, int] = EAST_INPUT_SIZE
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Run the (worker-resident) EAST network, return (scores, geometry)."""
+    net = registry.get("east")
+    blob = cv2.dnn.blobFromImage(to_bgr(image), 1.0, size, EAST_MEAN, True, False)
+    net.setInput(blob)
+    with registry.timed("east"):
+        scores, geometry = net.forward(EAST_OUTPUT_LAYERS)
+    return scores, geometry
+
+
+def decode_predictions(
+    scores: np.ndarray, geometry: np.ndarray, min_confidence: float = 0.5
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Decode the EAST score/geometry maps in one vectorized pass.
+
+    The score map is masked once, then all boxes are computed as arrays.
+    Coordinates are computed in float32 and truncated exactly like
+    ``decode_predictions_loop()`` (float32 maps, same order of the
+    operations) so both give the same boxes.
+
+    Returns:
+        (boxes, confidences, angles): boxes is a (N, 4) float32 array of
+        (start_x, start_y, end_x, end_y) in blob coordinates, confidences
+        and angles (radians) are (N,) float32 arrays.
+    """
+    ys, xs = np.nonzero(scores[0, 0] >= min_confidence)
+    d_top, d_right, d_bottom, d_left, angles = (
+        geometry[0, :, ys, xs].astype(np.float32).T
+    )
+    cos = np.cos(angles)
+    sin = np.sin(angles)
+    # float32, not int64 (which would compute the boxes in float64):
+    offset_x = xs.astype(np.float32) * EAST_CELL_SIZE
+    offset_y = ys.astype(np.float32) * EAST_CELL_SIZE
+    h = d_top + d_bottom
+    w = d_right + d_left
+    end_x = np.trunc(offset_x + cos * d_right + sin * d_bottom)
+    end_y = np.trunc(offset_y - sin * d_right + cos * d_bottom)
+    start_x = np.trunc(end_x - w)
+    start_y = np.trunc(end_y - h)
+    boxes = np.stack([start_x, start_y, end_x, end_y], axis=1).astype(np.float32)
+    return boxes, scores[0, 0, ys, xs].astype(np.float32), angles.astype(np.float32)
+
+
+def decode_predictions_loop(
+    scores: np.ndarray, geometry: np.ndarray, min_confidence: float = 0.5
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Cell by cell reference decoder (kept for benchmarks and checks)."""
+    rectangles = []
+    confidences = []
+    angles = []
+    for y in range(0, geometry.shape[2]):
+        scores_data = scores[0, 0, y]
+        x_data0 = geometry[0, 0, y]
+        x_data1 = geometry[0, 1, y]
+        x_data2 = geometry[0, 2, y]
+        x_data3 = geometry[0, 3, y]
+        angles_data = geometry[0, 4, y]
+
+        for x in range(0, geometry.shape[3]):
+            if scores_data[x] < min_confidence:
+                continue
+
+            (offset_x, offset_y) = (x * EAST_CELL_SIZE, y * EAST_CELL_SIZE)
+
+            angle = angles_data[x]
+            cos = np.cos(angle)
+            sin = np.sin(angle)
+
+            h = x_data0[x] + x_data2[x]
+            w = x_data1[x] + x_data3[x]
+
+            end_x = int(offset_x + (cos * x_data1[x]) + (sin * x_data2[x]))
+            end_y = int(offset_y - (sin * x_data1[x]) + (cos * x_data2[x]))
+            start_x = int(end_x - w)
+            start_y = int(end_y - h)
+
+            rectangles.append((start_x, start_y, end_x, end_y))
+            confidences.append(scores_data[x])
+            angles.append(angle)
+    return (
+        np.array(rectangles, dtype=np.float32).reshape(-1, 4),
+        np.array(confidences, dtype=np.float32),
+        np.array(angles, dtype=np.float32),
+    )
+
+
+def non_max_suppression(
+    boxes: np.ndarray, probs: np.ndarray, overlap_thresh: float = 0.5
+) -> np.ndarray:
+    """
+    Greedy non-maximum suppression, vectorized over the remaining boxes.
+
+    Same overlap rule as ``imutils.object_detection.non_max_suppression``
+    (intersection over the area of the *other* box), but it returns the
+    indices of the kept boxes, so callers can keep any per-box data
+    (angle, confidence...) along with them.
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.intp)
+    x1, y1, x2, y2 = boxes.astype(np.float32).T
+    area = (x2 - x1 + 1) * (y2 - y1 + 1)
+    # highest probabilities last, like imutils:
+    order = np.argsort(probs)
+    alive = np.ones(len(order), dtype=bool)
+    pick = []
+    for last in range(len(order) - 1, -1, -1):
+        if not alive[last]:
+            continue
+        i = order[last]
+        pick.append(i)
+        others = order[:last][alive[:last]]
+        if not len(others):
+            break
+        w = np.maximum(
+            0, np.minimum(x2[i], x2[others]) - np.maximum(x1[i], x1[others]) + 1
+        )
+        h = np.maximum(
+            0, np.minimum(y2[i], y2[others]) - np.maximum(y1[i], y1[others]) + 1
+        )
+        suppressed = (w * h) / area[others] > overlap_thresh
+        alive[np.flatnonzero(alive[:last])[suppressed]] = False
+    return np.array(pick, dtype=np.intp)
+
+
+def detect_east_boxes(
+    image: np.ndarray,
+    min_confidence: float = 0.5,
+    overlap_thresh: float = 0.5,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Detect text with EAST, return kept (boxes, confidences, angles).
+
+    Boxes are (start_x, start_y, end_x, end_y) float32 in the coordinates of
+    ``image``.
+    """
+    height, width = image.shape[:2]
+    scores, geometry = run_east(image)
+    boxes, confidences, angles = decode_predictions(
+        scores, geometry, min_confidence
+    )
+    keep = non_max_suppression(boxes, confidences, overlap_thresh)
+    boxes = boxes[keep]
+    # adjust coordinates to the scale of the original image:
+    boxes[:, [0, 2]] *= width / EAST_INPUT_SIZE[0]
+    boxes[:, [1, 3]] *= height / EAST_INPUT_SIZE[1]
+    return boxes, confidences[keep], angles[keep]
+
+
+def tile_origins(length: int, tile: int, step: int) -> List[int]:
+    """Starts of the tiles covering ``[0, length)``, the last one ends at it."""
+    if length <= tile:
+        return [0]
+    origins = list(range(0, length - tile, step))
+    origins.append(length - tile)
+    return origins
+
+
+def detect_east_boxes_tiled(
+    image: np.ndarray,
+    tile_size: int = 640,
+    batch_size: int = 8,
+    min_confidence: float = 0.5,
+    overlap_thresh: float = 0.5,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Detect text with EAST at native resolution: the page is cut into
+    overlapping ``tile_size`` tiles, sent to the network ``batch_size`` at a
+    time (``cv2.dnn.blobFromImages``), detections are moved to page
+    coordinates and NMS is done once on the whole page.
+
+    ``batch_size`` trades memory (one blob = batch_size x 3 x tile x tile
+    float32) for throughput.
+
+    Returns:
+        same as ``detect_east_boxes()``
+    """
+    image = to_bgr(image)
+    height, width = image.shape[:2]
+    if height < tile_size or width < tile_size:
+        # small page: pad it (white) up to one tile
+        image = cv2.copyMakeBorder(
+            image,
+            0,
+            max(0, tile_size - height),
+            0,
+            max(0, tile_size - width),
+            cv2.BORDER_CONSTANT,
+            value=(255, 255, 255),
+        )
+    step = max(32, int(tile_size * (1 - EAST_TILE_OVERLAP)))
+    origins = [
+        (x, y)
+        for y in tile_origins(image.shape[0], tile_size, step)
+        for x in tile_origins(image.shape[1], tile_size, step)
+    ]
+    net = registry.get("east")
+    all_boxes: List[np.ndarray] = []
+    all_confidences: List[np.ndarray] = []
+    all_angles: List[np.ndarray] = []
+    for start in range(0, len(origins), batch_size):
+        batch = origins[start : start + batch_size]
+        tiles = [image[y : y + tile_size, x : x + tile_size] for x, y in batch]
+        blob = cv2.dnn.blobFromImages(
+            tiles, 1.0, (tile_size, tile_size), EAST_MEAN, True, False
+        )
+        net.setInput(blob)
+        with registry.timed("east"):
+            scores, geometry = net.forward(EAST_OUTPUT_LAYERS)
+        for i, (x, y) in enumerate(batch):
+            boxes, confidences, angles = decode_predictions(
+                scores[i : i + 1], geometry[i : i + 1], min_confidence
+            )
+            boxes[:, [0, 2]] += x
+            boxes[:, [1, 3]] += y
+            all_boxes.append(boxes)
+            all_confidences.append(confidences)
+            all_angles.append(angles)
+
+    boxes = np.concatenate(all_boxes)
+    confidences = np.concatenate(all_confidences)
+    angles = np.concatenate(all_angles)
+    keep = non_max_suppression(boxes, confidences, overlap_thresh)
+    boxes = boxes[keep]
+    # boxes found in the padding or crossing the page border:
+    boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, width)
+    boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, height)
+    return boxes, confidences[keep], angles[keep]
+
+
+def boxes_to_regions(boxes: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    """(start_x, start_y, end_x, end_y) array -> list of (x, y, w, h)."""
+    boxes = boxes.astype(np.int64)
+    return [
+        (int(x1), int(y1), int(x2 - x1), int(y2 - y1)) for x1, y1, x2, y2 in boxes
+    ]
@@ -0,0 +1,123 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import cv2
+import numpy as np
+import pytesseract
+from PIL import Image
+from django.conf import settings
+
+try:
+    # in-process Tesseract API: language data is loaded once per handle
+    # (optional, requirements_ocr.txt)
+    import tesserocr
+except ImportError:  # fallback: pytesseract = one tesseract process per call
+    tesserocr = None
+
+
+class TesseractEngine:
+    """A long-lived Tesseract handle, language data loaded once."""
+
+    def __init__(self, lang: str):
+        self.lang = lang
+        self.api = tesserocr.PyTessBaseAPI(lang=lang) if tesserocr else None
+
+    def image_to_string(self, image: np.ndarray) -> str:
+        """Recognize a BGR (or grayscale) OpenCV image."""
+        if self.api is None:
+            return pytesseract.image_to_string(image, lang=self.lang)
+        if len(image.shape) == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        self.api.SetImage(Image.fromarray(image))
+        try:
+            return self.api.GetUTF8Text()
+        finally:
+            self.api.Clear()
+
+    def close(self) -> None:
+        if self.api is not None:
+            self.api.End()
+            self.api = None
+
+
+class TesseractPool:
+    """
+    Thread-safe pool of at most ``size`` ``TesseractEngine``, created on
+    demand and kept for the whole life of the process.
+
+    Usage:
+        with get_pool().borrow() as engine:
+            text = engine.image_to_string(img)
+    """
+
+    def __init__(self, size: int, lang: str):
+        self.size = size
+        self.lang = lang
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self, timeout: Optional[float]) -> TesseractEngine:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if create:
+            try:
+                return TesseractEngine(self.lang)
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        # all engines are busy: wait for one (raises queue.Empty on timeout)
+        return self._idle.get(timeout=timeout)
+
+    @contextmanager
+    def borrow(self, timeout: Optional[float] = None) -> Iterator[TesseractEngine]:
+        engine = self._acquire(timeout)
+        try:
+            yield engine
+        finally:
+            self._idle.put(engine)
+
+    def warm(self) -> None:
+        """Create all the engines now instead of on first requests."""
+        engines = [self._acquire(None) for _ in range(self.size)]
+        for engine in engines:
+            self._idle.put(engine)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._created = 0
+
+
+_pool: Optional[TesseractPool] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> TesseractPool:
+    """
+    Pool of the current process, built from the settings on first use (and
+    rebuilt after a fork: handles can't be shared between processes).
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = TesseractPool(
+                settings.TESSERACT_POOL_SIZE, settings.TESSERACT_LANG
+            )
+            _pool_pid = os.getpid()
+        return _pool
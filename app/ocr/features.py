@@ -0,0 +1,104 @@
+from typing import List
+
+import cv2
+import numpy as np
+
+# regions are resized (keeping their ratio) then padded to a square patch:
+FONT_PATCH_SIZE = 100
+HOG_ORIENTATIONS = 8
+HOG_CELL_SIZE = 16
+HOG_EPS = 1e-5
+HOG_CELLS = FONT_PATCH_SIZE // HOG_CELL_SIZE
+HOG_FEATURES = HOG_CELLS * HOG_CELLS * HOG_ORIENTATIONS
+
+
+def font_patch(image: np.ndarray) -> np.ndarray:
+    """Resize the region so its biggest side is FONT_PATCH_SIZE, then pad it."""
+    h, w = image.shape
+    if h > w:
+        new_h, new_w = FONT_PATCH_SIZE, max(1, int(w * (FONT_PATCH_SIZE / h)))
+    else:
+        new_h, new_w = max(1, int(h * (FONT_PATCH_SIZE / w))), FONT_PATCH_SIZE
+    resized = cv2.resize(image, (new_w, new_h))
+
+    padded = np.zeros((FONT_PATCH_SIZE, FONT_PATCH_SIZE), dtype=np.uint8)
+    padded[:new_h, :new_w] = resized
+    return padded
+
+
+def font_patches(images: List[np.ndarray]) -> np.ndarray:
+    """Stack the patches of ``images``: (N, FONT_PATCH_SIZE, FONT_PATCH_SIZE)."""
+    patches = np.zeros((len(images), FONT_PATCH_SIZE, FONT_PATCH_SIZE), np.uint8)
+    for i, image in enumerate(images):
+        patches[i] = font_patch(image)
+    return patches
+
+
+def hog_features(patches: np.ndarray) -> np.ndarray:
+    """
+    HOG descriptors of a batch of patches, no visualization.
+
+    Same descriptor as ``skimage.feature.hog(patch, orientations=8,
+    pixels_per_cell=(16, 16), cells_per_block=(1, 1))`` (central gradients,
+    unsigned orientations, mean magnitude per cell, L2-Hys normalization)
+    computed for all the patches at once in float32.
+
+    Args:
+        patches: (N, FONT_PATCH_SIZE, FONT_PATCH_SIZE) uint8 array
+
+    Returns:
+        (N, HOG_FEATURES) float32 array
+    """
+    images = patches.astype(np.float32)
+    g_row = np.zeros_like(images)
+    g_col = np.zeros_like(images)
+    g_row[:, 1:-1, :] = images[:, 2:, :] - images[:, :-2, :]
+    g_col[:, :, 1:-1] = images[:, :, 2:] - images[:, :, :-2]
+    # only whole cells are used:
+    size = HOG_CELLS * HOG_CELL_SIZE
+    g_row = g_row[:, :size, :size]
+    g_col = g_col[:, :size, :size]
+    magnitude = np.hypot(g_col, g_row)
+    # float64 here: on binarized regions many gradients are exactly on a bin
+    # boundary (45, 135 degrees) and float32 rounding changes their bin
+    orientation = np.rad2deg(np.arctan2(g_row, g_col, dtype=np.float64)) % 180
+    bins = np.minimum(
+        (orientation // (180 / HOG_ORIENTATIONS)).astype(np.int64),
+        HOG_ORIENTATIONS - 1,
+    )
+
+    # one bincount for all patches: bin index = (patch, cell row, cell col, bin)
+    n = len(patches)
+    cells = np.arange(size) // HOG_CELL_SIZE
+    index = (
+        np.arange(n)[:, None, None] * HOG_CELLS * HOG_CELLS
+        + cells[None, :, None] * HOG_CELLS
+        + cells[None, None, :]
+    ) * HOG_ORIENTATIONS + bins
+    histograms = (
+        np.bincount(
+            index.ravel(), weights=magnitude.ravel(), minlength=n * HOG_FEATURES
+        )
+        .reshape(n, HOG_CELLS, HOG_CELLS, HOG_ORIENTATIONS)
+        .astype(np.float32)
+    )
+    histograms /= HOG_CELL_SIZE * HOG_CELL_SIZE
+
+    # L2-Hys, one cell per block:
+    norms = np.sqrt(np.sum(histograms**2, axis=-1, keepdims=True) + HOG_EPS**2)
+    histograms = np.minimum(histograms / norms, 0.2)
+    norms = np.sqrt(np.sum(histograms**2, axis=-1, keepdims=True) + HOG_EPS**2)
+    histograms /= norms
+    return histograms.reshape(n, HOG_FEATURES).astype(np.float32, copy=False)
+
+
+def hog_features_skimage(patch: np.ndarray) -> np.ndarray:
+    """Reference descriptor of one patch (used by benchmarks and checks)."""
+    from skimage.feature import hog
+
+    return hog(
+        patch,
+        orientations=HOG_ORIENTATIONS,
+        pixels_per_cell=(HOG_CELL_SIZE, HOG_CELL_SIZE),
+        cells_per_block=(1, 1),
+    )
@@ -0,0 +1,145 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+
+from app.ocr.font_store import FontStore
+
+
+class FontClusters:
+    """
+    Mini-batch k-means of the font features (Sculley, "Web-scale k-means
+    clustering"): centroids are updated batch by batch, each one moving
+    towards the mean of the points assigned to it with a learning rate of
+    1 / (number of points it has seen so far). Only one batch of features is
+    in memory at a time, and new points can be assigned (and optionally
+    learned) without clustering everything again.
+
+    The model is saved in the destination folder: centroids and counts in
+    ``MODEL_FILE_NAME``, and in ``STATE_FILE_NAME`` the pages whose regions
+    were assigned, with the id of the page in the ``FontStore`` at that time
+    (a page analyzed again gets a new id, so it's assigned again; the
+    compaction of the store keeps the ids).
+
+    Usage:
+        clusters = FontClusters.load(folder_dst) or FontClusters(32)
+        clusters.partial_fit(batch)
+        labels = clusters.predict(features)
+        clusters.save(folder_dst)
+    """
+
+    MODEL_FILE_NAME = "font_clusters.npz"
+    STATE_FILE_NAME = "font_clusters.json"
+
+    def __init__(self, k: int, seed: int = 0):
+        self.k: int = k
+        self.seed: int = seed
+        self.rng = np.random.default_rng(seed)
+        self.centroids: Optional[np.ndarray] = None
+        self.counts: Optional[np.ndarray] = None
+        # page -> its id in the FontStore when its regions were assigned
+        self.assigned: Dict[str, int] = {}
+
+    @classmethod
+    def load(cls, folder: Path) -> Optional["FontClusters"]:
+        model_path = folder / cls.MODEL_FILE_NAME
+        state_path = folder / cls.STATE_FILE_NAME
+        if not model_path.is_file() or not state_path.is_file():
+            return None
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        clusters = cls(state["k"], state["seed"])
+        clusters.assigned = state["assigned"]
+        with np.load(model_path) as model:
+            clusters.centroids = model["centroids"]
+            clusters.counts = model["counts"]
+        return clusters
+
+    def save(self, folder: Path) -> None:
+        """Write the model then the state, each one atomically."""
+        model_tmp = folder / f"{self.MODEL_FILE_NAME}.tmp"
+        with open(model_tmp, "wb") as f:
+            np.savez(f, centroids=self.centroids, counts=self.counts)
+        os.replace(model_tmp, folder / self.MODEL_FILE_NAME)
+        state_tmp = folder / f"{self.STATE_FILE_NAME}.tmp"
+        with open(state_tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {"k": self.k, "seed": self.seed, "assigned": self.assigned},
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(state_tmp, folder / self.STATE_FILE_NAME)
+
+    @property
+    def fitted(self) -> bool:
+        return self.centroids is not None
+
+    def distances(self, points: np.ndarray) -> np.ndarray:
+        """Squared euclidean distances (N, k) of the points to the centroids."""
+        return np.maximum(
+            np.einsum("ij,ij->i", points, points)[:, None]
+            - 2 * (points @ self.centroids.T)
+            + np.einsum("ij,ij->i", self.centroids, self.centroids)[None, :],
+            0,
+        )
+
+    def init_centroids(self, points: np.ndarray) -> None:
+        """k-means++ seeding on the first batch."""
+        k = min(self.k, len(points))
+        centroids = np.empty((k, points.shape[1]), dtype=np.float32)
+        centroids[0] = points[self.rng.integers(len(points))]
+        closest = np.sum((points - centroids[0]) ** 2, axis=1)
+        for i in range(1, k):
+            total = closest.sum()
+            if total > 0:
+                choice = self.rng.choice(len(points), p=closest / total)
+            else:  # fewer distinct points than clusters
+                choice = self.rng.integers(len(points))
+            centroids[i] = points[choice]
+            closest = np.minimum(closest, np.sum((points - centroids[i]) ** 2, axis=1))
+        self.k = k
+        self.centroids = centroids
+        self.counts = np.zeros(k, dtype=np.int64)
+
+    def partial_fit(self, points: np.ndarray) -> np.ndarray:
+        """Learn one batch of points, return their labels."""
+        points = np.asarray(points, dtype=np.float32)
+        if not len(points):
+            return np.zeros(0, dtype=np.int32)
+        if not self.fitted:
+            self.init_centroids(points)
+        labels = self.predict(points)
+        batch_counts = np.bincount(labels, minlength=self.k)
+        sums = np.zeros_like(self.centroids)
+        np.add.at(sums, labels, points)
+        seen = batch_counts > 0
+        self.counts += batch_counts
+        # per-center learning rate = points of the batch / all points seen:
+        self.centroids[seen] += (
+            sums[seen] - batch_counts[seen, None] * self.centroids[seen]
+        ) / self.counts[seen, None]
+        return labels
+
+    def predict(self, points: np.ndarray) -> np.ndarray:
+        points = np.asarray(points, dtype=np.float32)
+        if not len(points):
+            return np.zeros(0, dtype=np.int32)
+        return np.argmin(self.distances(points), axis=1).astype(np.int32)
+
+
+def live_batches(
+    store: FontStore, batch_size: int, rng: Optional[np.random.Generator] = None
+) -> Iterator[np.ndarray]:
+    """
+    The live rows of ``store``, ``batch_size`` at a time (shuffled when
+    ``rng`` is given, k-means batches should be random samples).
+    """
+    rows, _ = store.live()
+    if rng is not None:
+        rows = rng.permutation(rows)
+    matrix = store.matrix()
+    for start in range(0, len(rows), batch_size):
+        # sorted rows: sequential reads of the memory-mapped file
+        yield np.asarray(matrix[np.sort(rows[start : start + batch_size])])
@@ -0,0 +1,288 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.ocr.features import HOG_FEATURES
+
+Region = Tuple[int, int, int, int]
+
+
+class FontStore:
+    """
+    Font features of all the analyzed regions of a destination folder.
+
+    Features are rows of one raw float32 matrix (``DATA_FILE_NAME``) read
+    through ``np.memmap``: nothing is parsed and only the pages touched are
+    loaded. A sidecar JSONL index (``INDEX_FILE_NAME``) has one line per page
+    analyzed: its id (a serial number, kept by ``compact()``: it tells the
+    features of a page from the ones of a previous analysis), its first row
+    in the matrix and its regions (id and box). Both
+    files are append-only; when a page is analyzed again the last line of
+    the page wins and its previous rows are "dead" until ``compact()``.
+
+    Both files start with the generation of the store, increased by each
+    ``compact()``: the first row of the matrix is a header (``HEADER_MAGIC``
+    and the generation), the first line of the index is
+    ``{"generation": ...}``. An index never describes the rows of another
+    generation.
+
+    Usage:
+        store = FontStore(folder_dst)
+        store.append(page, [(region_id, (x, y, w, h)), ...], features)
+        row = store.find(page, region_id)
+        for page, region_id, box, distance in store.nearest(store.vector(row)):
+            ...
+    """
+
+    DATA_FILE_NAME = "font_features.f32"
+    INDEX_FILE_NAME = "font_features_index.jsonl"
+    # rows compared at once by nearest(), bounds its memory:
+    SEARCH_CHUNK_ROWS = 65536
+    # start of the header row of the matrix, followed by the generation
+    # (uint64 little-endian):
+    HEADER_MAGIC = b"FONTF32\0"
+
+    def __init__(self, folder: Path, dim: int = HOG_FEATURES):
+        self.data_path: Path = folder / self.DATA_FILE_NAME
+        self.index_path: Path = folder / self.INDEX_FILE_NAME
+        self.dim: int = dim
+        self.row_bytes: int = dim * np.dtype(np.float32).itemsize
+        self.generation: int = 0
+        # id of the next page appended:
+        self.next_id: int = 0
+        self.pages: Dict[str, Dict[str, Any]] = self.load()
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Entries of the index whose rows are complete. A ``compact()``
+        interrupted between its two renames is finished here: its index is
+        still in the temporary file.
+        """
+        pages: Dict[str, Dict[str, Any]] = {}
+        generation = self.data_generation()
+        if generation is None:
+            return pages
+        self.generation = generation
+        index_tmp = self.index_path.with_suffix(".tmp")
+        if (
+            self.index_generation(self.index_path) != generation
+            and self.index_generation(index_tmp) == generation
+        ):
+            os.replace(index_tmp, self.index_path)
+        if not self.index_path.is_file():
+            return pages
+        if self.index_generation(self.index_path) != generation:
+            raise ValueError(
+                f"'{self.index_path}' and '{self.data_path}' are from different "
+                f"compactions: delete both and analyze the pages again (--force)."
+            )
+        rows = self.rows_count()
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # last line of an interrupted run
+                if "page" not in entry:
+                    continue  # header
+                self.next_id = max(self.next_id, entry["id"] + 1)
+                if entry["start"] + len(entry["regions"]) <= rows:
+                    pages[entry["page"]] = entry
+        return pages
+
+    def header(self, generation: int) -> bytes:
+        """First row of the matrix."""
+        header = self.HEADER_MAGIC + generation.to_bytes(8, "little")
+        return header.ljust(self.row_bytes, b"\0")
+
+    def data_generation(self) -> Optional[int]:
+        """Generation of the matrix, None without a (complete) header."""
+        if not self.data_path.is_file():
+            return None
+        with open(self.data_path, "rb") as f:
+            header = f.read(len(self.HEADER_MAGIC) + 8)
+        if len(header) < len(self.HEADER_MAGIC) + 8:
+            return None
+        if not header.startswith(self.HEADER_MAGIC):
+            raise ValueError(f"'{self.data_path}' is not a font features file.")
+        return int.from_bytes(header[len(self.HEADER_MAGIC) :], "little")
+
+    @staticmethod
+    def index_generation(path: Path) -> Optional[int]:
+        """Generation in the first line of an index, None if unreadable."""
+        if not path.is_file():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            try:
+                return json.loads(f.readline()).get("generation")
+            except (json.JSONDecodeError, AttributeError):
+                return None
+
+    def rows_count(self) -> int:
+        """Complete rows of the matrix (a partly written row is ignored)."""
+        if not self.data_path.is_file():
+            return 0
+        return max(0, self.data_path.stat().st_size // self.row_bytes - 1)
+
+    @property
+    def live_rows(self) -> int:
+        return sum(len(entry["regions"]) for entry in self.pages.values())
+
+    @property
+    def dead_rows(self) -> int:
+        return self.rows_count() - self.live_rows
+
+    def append(
+        self, page: str, regions: List[Tuple[int, Region]], features: np.ndarray
+    ) -> None:
+        """
+        Add (or replace) the features of the regions of ``page``: rows are
+        written first, then the index line that makes them visible.
+        """
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        if features.shape != (len(regions), self.dim):
+            raise ValueError(
+                f"Expected {len(regions)} x {self.dim} features, "
+                f"got {features.shape}"
+            )
+        self.data_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.data_generation() is None:
+            # new store (or the matrix was lost): both files start over
+            self.data_path.write_bytes(self.header(self.generation))
+            self.index_path.unlink(missing_ok=True)
+            self.pages = {}
+        if not self.index_path.is_file():
+            with open(self.index_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"generation": self.generation}) + "\n")
+        start = self.rows_count()
+        with open(self.data_path, "ab") as f:
+            # drop the partial row an interrupted run may have left:
+            f.truncate((start + 1) * self.row_bytes)
+            f.write(features.tobytes())
+            f.flush()
+        entry = {
+            "page": page,
+            "id": self.next_id,
+            "start": start,
+            "regions": [
+                [int(region_id), *(int(v) for v in box)] for region_id, box in regions
+            ],
+        }
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+        self.next_id += 1
+        self.pages[page] = entry
+
+    def matrix(self) -> np.ndarray:
+        """All the rows (live or dead), memory-mapped read-only."""
+        rows = self.rows_count()
+        if not rows:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.memmap(
+            self.data_path,
+            dtype=np.float32,
+            mode="r",
+            offset=self.row_bytes,
+            shape=(rows, self.dim),
+        )
+
+    def live(self) -> Tuple[np.ndarray, List[Tuple[str, int, Region]]]:
+        """Rows numbers of the live regions and their (page, region id, box)."""
+        rows: List[int] = []
+        regions: List[Tuple[str, int, Region]] = []
+        for page, entry in self.pages.items():
+            for offset, (region_id, *box) in enumerate(entry["regions"]):
+                rows.append(entry["start"] + offset)
+                regions.append((page, region_id, tuple(box)))
+        return np.array(rows, dtype=np.int64), regions
+
+    def find(self, page: str, region_id: int) -> Optional[int]:
+        """Row of the region ``region_id`` of ``page``, None if unknown."""
+        entry = self.pages.get(page)
+        if entry is None:
+            return None
+        for offset, (known_id, *_) in enumerate(entry["regions"]):
+            if known_id == region_id:
+                return entry["start"] + offset
+        return None
+
+    def vector(self, row: int) -> np.ndarray:
+        return np.array(self.matrix()[row])
+
+    def nearest(
+        self, query: np.ndarray, k: int = 10, exclude: Optional[int] = None
+    ) -> List[Tuple[str, int, Region, float]]:
+        """
+        The ``k`` live regions whose features are the closest (euclidean
+        distance) to ``query``, as (page, region id, box, distance), closest
+        first. ``exclude`` = a row to ignore (the query region itself).
+
+        The matrix is scanned by chunks of ``SEARCH_CHUNK_ROWS`` rows, with
+        ``|a - q|^2 = |a|^2 - 2 a.q + |q|^2`` (one matrix-vector product per
+        chunk).
+        """
+        rows, regions = self.live()
+        if exclude is not None:
+            keep = rows != exclude
+            rows = rows[keep]
+            regions = [region for region, kept in zip(regions, keep) if kept]
+        if not len(rows) or k <= 0:
+            return []
+        query = np.asarray(query, dtype=np.float32).reshape(self.dim)
+        matrix = self.matrix()
+        # rows are sorted so chunks read the file sequentially:
+        order = np.argsort(rows, kind="stable")
+        rows = rows[order]
+        distances = np.empty(len(rows), dtype=np.float32)
+        q_norm = float(query @ query)
+        for start in range(0, len(rows), self.SEARCH_CHUNK_ROWS):
+            chunk_rows = rows[start : start + self.SEARCH_CHUNK_ROWS]
+            chunk = np.asarray(matrix[chunk_rows])
+            distances[start : start + len(chunk_rows)] = (
+                np.einsum("ij,ij->i", chunk, chunk) - 2 * (chunk @ query) + q_norm
+            )
+        k = min(k, len(rows))
+        best = np.argpartition(distances, k - 1)[:k]
+        best = best[np.argsort(distances[best], kind="stable")]
+        result = []
+        for i in best:
+            page, region_id, box = regions[order[i]]
+            result.append(
+                (page, region_id, box, float(np.sqrt(max(distances[i], 0.0))))
+            )
+        return result
+
+    def compact(self) -> None:
+        """
+        Rewrite both files with only the live rows, as the next generation:
+        the matrix is renamed first, then the index (an interruption between
+        the two is finished by ``load()``).
+        """
+        matrix = self.matrix()
+        generation = self.generation + 1
+        data_tmp = self.data_path.with_suffix(".tmp")
+        index_tmp = self.index_path.with_suffix(".tmp")
+        pages: Dict[str, Dict[str, Any]] = {}
+        start = 0
+        with open(data_tmp, "wb") as data, open(index_tmp, "w", encoding="utf-8") as f:
+            data.write(self.header(generation))
+            f.write(json.dumps({"generation": generation}) + "\n")
+            for page, entry in self.pages.items():
+                count = len(entry["regions"])
+                data.write(
+                    np.ascontiguousarray(
+                        matrix[entry["start"] : entry["start"] + count]
+                    ).tobytes()
+                )
+                pages[page] = {**entry, "start": start}
+                f.write(json.dumps(pages[page], ensure_ascii=False) + "\n")
+                start += count
+        del matrix
+        os.replace(data_tmp, self.data_path)
+        os.replace(index_tmp, self.index_path)
+        self.generation = generation
+        self.pages = pages
@@ -0,0 +1,165 @@
+import os
+import socket
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.db import close_old_connections, connection
+
+from app.models.ocr_job import OcrJob
+from app.ocr.features import HOG_FEATURES
+
+ENQUEUE_BATCH_SIZE: int = 500
+
+
+def worker_name() -> str:
+    """Name of the current process in the queue: "<host>:<pid>"."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue(
+    pages: Iterable[Tuple[str, Path]],
+    folder_dst: Path,
+    params: Dict[str, Any],
+    max_attempts: int,
+) -> int:
+    """
+    Add the pages (key, path) to the queue of ``folder_dst``. A page already
+    in the queue and finished (done or failed) is queued again with the new
+    parameters once its results are collected; a page pending, running or
+    not collected yet is left as it is. The source paths must be readable at
+    the same place by all the workers (shared storage).
+    """
+    queued = 0
+    batch: List[Tuple[str, Path]] = []
+
+    def flush() -> None:
+        keys = [key for key, _ in batch]
+        sources = {key: str(path) for key, path in batch}
+        existing = OcrJob.objects.filter(folder_dst=str(folder_dst), page__in=keys)
+        for job in existing.filter(
+            status__in=[OcrJob.Status.DONE, OcrJob.Status.FAILED], collected=True
+        ):
+            OcrJob.objects.filter(pk=job.pk).update(
+                source=sources[job.page],
+                params=params,
+                status=OcrJob.Status.PENDING,
+                attempts=0,
+                max_attempts=max_attempts,
+                error="",
+                regions=None,
+                features=None,
+                result=None,
+                collected=False,
+                date_done=None,
+            )
+        known = set(existing.values_list("page", flat=True))
+        OcrJob.objects.bulk_create(
+            [
+                OcrJob(
+                    source=sources[key],
+                    page=key,
+                    folder_dst=str(folder_dst),
+                    params=params,
+                    max_attempts=max_attempts,
+                )
+                for key in keys
+                if key not in known
+            ],
+            # enqueued meanwhile by another coordinator:
+            ignore_conflicts=True,
+        )
+        batch.clear()
+
+    for key, path in pages:
+        batch.append((key, path))
+        queued += 1
+        if len(batch) >= ENQUEUE_BATCH_SIZE:
+            flush()
+    if batch:
+        flush()
+    return queued
+
+
+def job_payload(result: Dict[str, Any]) -> Dict[str, Any]:
+    """``OcrJob.complete()`` arguments from a ``process_image()`` result."""
+    return {
+        "regions": [
+            [int(region_id), [int(v) for v in box]]
+            for region_id, box in result["fonts"]["regions"]
+        ],
+        "features": np.ascontiguousarray(
+            result["fonts"]["features"], dtype=np.float32
+        ).tobytes(),
+        "result": {"models": result["models"], "profile": result["profile"]},
+    }
+
+
+def job_result(job: OcrJob) -> Dict[str, Any]:
+    """
+    Inverse of ``job_payload()``: the ``process_image()`` result of a
+    finished job, as the pool of ``analyze_image`` returns it. Workers are
+    identified by their ``worker_name()`` instead of their pid.
+    """
+    result: Dict[str, Any] = {"image": job.source, "page": job.page}
+    if job.status != OcrJob.Status.DONE:
+        result.update({"success": False, "error": job.error})
+        return result
+    regions = [(region_id, tuple(box)) for region_id, box in job.regions or []]
+    features = np.frombuffer(bytes(job.features or b""), dtype=np.float32)
+    stats = job.result or {}
+    result.update(
+        {
+            "success": True,
+            "fonts": {
+                "regions": regions,
+                "features": features.reshape(len(regions), HOG_FEATURES),
+            },
+        }
+    )
+    if "models" in stats:
+        result["models"] = {**stats["models"], "pid": job.worker}
+    if "profile" in stats:
+        result["profile"] = {**stats["profile"], "pid": job.worker}
+    return result
+
+
+class Heartbeat:
+    """
+    Thread renewing the lease of the jobs of a claim while they're processed,
+    so a long page doesn't lose its lease while its worker is alive.
+
+    Usage:
+        with Heartbeat(token, lease_seconds, every_seconds):
+            ... process the jobs of the claim ...
+    """
+
+    def __init__(self, token: str, lease_seconds: float, every_seconds: float):
+        self.token: str = token
+        self.lease_seconds: float = lease_seconds
+        self.every_seconds: float = every_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        try:
+            while not self._stop.wait(self.every_seconds):
+                close_old_connections()
+                # jobs already finished (or lost) aren't renewed:
+                OcrJob.renew(self.token, self.lease_seconds)
+        finally:
+            # each thread has its own database connection:
+            connection.close()
+
+    def __enter__(self) -> "Heartbeat":
+        self._thread = threading.Thread(
+            target=self._run, name="ocr-heartbeat", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
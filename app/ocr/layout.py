@@ -0,0 +1,159 @@
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+Region = Tuple[int, int, int, int]
+
+# skew angles tried by estimate_skew() (degrees):
+SKEW_MAX_ANGLE = 5.0
+SKEW_STEP = 0.25
+# ink pixels used by estimate_skew() (random subset on big pages):
+SKEW_MAX_POINTS = 100000
+# below this skew (degrees) the page is analyzed as is:
+SKEW_MIN_CORRECTION = 0.2
+LAYOUT_LEVELS = ["lines", "paragraphs", "blocks"]
+
+
+def binarize_ink(gray: np.ndarray) -> np.ndarray:
+    """Otsu binarization: 1 = ink, 0 = paper."""
+    _, ink = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    return ink
+
+
+def runs(mask: np.ndarray, max_gap: int = 0, min_length: int = 1) -> np.ndarray:
+    """
+    (start, end) of the runs of True of a 1D mask; runs separated by at most
+    ``max_gap`` False are joined, runs shorter than ``min_length`` dropped.
+    """
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if len(starts) and max_gap > 0:
+        keep = np.concatenate(([True], starts[1:] - ends[:-1] > max_gap))
+        starts = starts[keep]
+        ends = ends[np.concatenate((keep[1:], [True]))]
+    keep = ends - starts >= min_length
+    return np.stack([starts[keep], ends[keep]], axis=1)
+
+
+def estimate_skew(ink: np.ndarray, rng_seed: int = 0) -> float:
+    """
+    Skew of the text lines: the rotation (degrees, counter-clockwise like
+    ``cv2.getRotationMatrix2D()``) whose horizontal projection profile of
+    the ink pixels is the sharpest.
+    """
+    ys, xs = np.nonzero(ink)
+    if len(ys) < 2:
+        return 0.0
+    if len(ys) > SKEW_MAX_POINTS:
+        pick = np.random.default_rng(rng_seed).choice(len(ys), SKEW_MAX_POINTS, False)
+        ys, xs = ys[pick], xs[pick]
+    angles = np.arange(-SKEW_MAX_ANGLE, SKEW_MAX_ANGLE + SKEW_STEP / 2, SKEW_STEP)
+    scores = np.empty(len(angles))
+    for i, radians in enumerate(np.deg2rad(angles)):
+        # row of every ink pixel once the page is rotated by this angle:
+        rows = np.rint(ys * np.cos(radians) - xs * np.sin(radians)).astype(np.int64)
+        profile = np.bincount(rows - rows.min())
+        scores[i] = np.sum(np.diff(profile).astype(np.float64) ** 2)
+    return float(angles[np.argmax(scores)])
+
+
+def analyze_layout(
+    gray: np.ndarray,
+    column_gap: float = 2.0,
+    word_gap: float = 1.5,
+    paragraph_gap: float = 1.5,
+) -> Dict[str, object]:
+    """
+    Find blocks (columns), lines and paragraphs of a page with projection
+    profiles of its binarized (and deskewed) version.
+
+    Gaps are relative to the median line height: ``column_gap`` separates
+    columns, ``word_gap`` is the largest blank kept inside a line and
+    ``paragraph_gap`` the largest blank between lines of a paragraph.
+
+    Returns:
+        dict with "skew" (degrees) and "blocks", "lines", "paragraphs"
+        lists of (x, y, w, h) regions in ``gray`` coordinates.
+    """
+    height, width = gray.shape[:2]
+    ink = binarize_ink(gray)
+    # the skew is estimated on a 1/4 page, that's precise enough:
+    small = cv2.resize(
+        ink, (max(1, width // 4), max(1, height // 4)), interpolation=cv2.INTER_NEAREST
+    )
+    skew = estimate_skew(small)
+    rotation = None
+    if abs(skew) >= SKEW_MIN_CORRECTION:
+        center = (width / 2, height / 2)
+        rotation = cv2.getRotationMatrix2D(center, skew, 1.0)
+        ink = cv2.warpAffine(ink, rotation, (width, height), flags=cv2.INTER_NEAREST)
+
+    min_ink = max(1, int(width * 0.002))
+    # first estimate of the line height on the whole page:
+    page_lines = runs(ink.sum(axis=1) >= min_ink, min_length=3)
+    if not len(page_lines):
+        return {"skew": skew, "blocks": [], "lines": [], "paragraphs": []}
+    line_height = float(np.median(page_lines[:, 1] - page_lines[:, 0]))
+
+    blocks: List[Region] = []
+    lines: List[Region] = []
+    paragraphs: List[Region] = []
+    column_mask = ink.sum(axis=0) >= max(1, int(height * 0.002))
+    for x1, x2 in runs(column_mask, max_gap=int(column_gap * line_height)):
+        column = ink[:, x1:x2]
+        line_rows = runs(column.sum(axis=1) >= min_ink, min_length=3)
+        if not len(line_rows):
+            continue
+        column_lines = []
+        for y1, y2 in line_rows:
+            columns = runs(
+                column[y1:y2].sum(axis=0) > 0, max_gap=int(word_gap * line_height)
+            )
+            for lx1, lx2 in columns:
+                column_lines.append(
+                    (int(x1 + lx1), int(y1), int(lx2 - lx1), int(y2 - y1))
+                )
+        lines.extend(column_lines)
+        boxes = np.array(column_lines)
+        blocks.append(bounding_box(boxes))
+        # paragraphs = consecutive lines separated by small blanks:
+        tops = boxes[:, 1]
+        bottoms = boxes[:, 1] + boxes[:, 3]
+        breaks = np.flatnonzero(tops[1:] - bottoms[:-1] > paragraph_gap * line_height)
+        for part in np.split(boxes, breaks + 1):
+            paragraphs.append(bounding_box(part))
+
+    if rotation is not None:
+        inverse = cv2.invertAffineTransform(rotation)
+        blocks, lines, paragraphs = (
+            [transform_region(region, inverse, width, height) for region in regions]
+            for regions in (blocks, lines, paragraphs)
+        )
+    return {"skew": skew, "blocks": blocks, "lines": lines, "paragraphs": paragraphs}
+
+
+def bounding_box(boxes: np.ndarray) -> Region:
+    x1 = boxes[:, 0].min()
+    y1 = boxes[:, 1].min()
+    x2 = (boxes[:, 0] + boxes[:, 2]).max()
+    y2 = (boxes[:, 1] + boxes[:, 3]).max()
+    return int(x1), int(y1), int(x2 - x1), int(y2 - y1)
+
+
+def transform_region(
+    region: Region, matrix: np.ndarray, width: int, height: int
+) -> Region:
+    """Axis-aligned bounding box of ``region`` moved by the affine ``matrix``."""
+    x, y, w, h = region
+    corners = np.array([[x, y, 1], [x + w, y, 1], [x, y + h, 1], [x + w, y + h, 1]])
+    moved = corners @ matrix.T
+    x1, y1 = np.clip(moved.min(axis=0), 0, (width, height))
+    x2, y2 = np.clip(moved.max(axis=0), 0, (width, height))
+    return int(x1), int(y1), int(x2 - x1), int(y2 - y1)
+
+
+def detect_profile_regions(gray: np.ndarray, level: str = "lines") -> List[Region]:
+    """Text regions of a page at ``level``: blocks, lines or paragraphs."""
+    return analyze_layout(gray)[level]
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    """blake2b of the content of the file, read by chunks."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def params_digest(params: Dict[str, Any]) -> str:
+    """Stable short hash of the pipeline parameters."""
+    raw = json.dumps(params, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=10).hexdigest()
+
+
+class RunManifest:
+    """
+    Journal of the pages already analyzed in a destination folder.
+
+    For each source file it keeps its content hash, the hash of the pipeline
+    parameters, the pipeline version and the outputs written. A page is
+    skipped when all of them are unchanged and its outputs still exist.
+
+    The journal is append-only (one JSON line per analyzed page, flushed
+    immediately) so an interrupted run resumes where it stopped; the last
+    line of a given source wins. ``compact()`` rewrites it with one line per
+    source.
+
+    Usage:
+        manifest = RunManifest(folder_dst, params, version=2)
+        if not manifest.is_done(key, path, outputs):
+            ...  # analyze
+            manifest.record(key, path, outputs)
+    """
+
+    FILE_NAME = "analyze_manifest.jsonl"
+
+    def __init__(self, folder_dst: Path, params: Dict[str, Any], version: int):
+        self.path: Path = folder_dst / self.FILE_NAME
+        self.params: Dict[str, Any] = params
+        self.params_key: str = params_digest(params)
+        self.version: int = version
+        self.entries: Dict[str, Dict[str, Any]] = self.load()
+        # hashes computed by is_done(), reused by record():
+        self._digests: Dict[str, Tuple[int, int, str]] = {}
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        entries: Dict[str, Dict[str, Any]] = {}
+        if not self.path.is_file():
+            return entries
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # last line of an interrupted run
+                if "source" in entry:
+                    entries[entry["source"]] = entry
+        return entries
+
+    def digest(self, key: str, path: Path) -> str:
+        """
+        Content hash of ``path``; not recomputed when size and modification
+        time are the same as the ones recorded.
+        """
+        stat = path.stat()
+        # by path: all the frames of a multi-page file share its hash
+        known: Optional[Tuple[int, int, str]] = self._digests.get(str(path))
+        if known is None:
+            entry = self.entries.get(key)
+            if entry is not None:
+                known = (entry["size"], entry["mtime_ns"], entry["hash"])
+        if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns):
+            digest = known[2]
+        else:
+            digest = file_digest(path)
+        self._digests[str(path)] = (stat.st_size, stat.st_mtime_ns, digest)
+        return digest
+
+    def is_done(self, key: str, path: Path, outputs: List[Path]) -> bool:
+        entry = self.entries.get(key)
+        if entry is None:
+            return False
+        return (
+            entry["version"] == self.version
+            and entry["params"] == self.params_key
+            and all(output.is_file() for output in outputs)
+            and entry["hash"] == self.digest(key, path)
+        )
+
+    def record(self, key: str, path: Path, outputs: List[Path]) -> None:
+        """Append (and flush) the entry of a page successfully analyzed."""
+        digest = self.digest(key, path)
+        size, mtime_ns, _ = self._digests[str(path)]
+        entry = {
+            "source": key,
+            "hash": digest,
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "params": self.params_key,
+            "version": self.version,
+            "outputs": [output.name for output in outputs],
+        }
+        self.entries[key] = entry
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+
+    def compact(self) -> None:
+        """Rewrite the journal atomically with one line per source."""
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(
+                json.dumps(
+                    {
+                        "params_key": self.params_key,
+                        "params": self.params,
+                        "version": self.version,
+                    },
+                    default=str,
+                )
+                + "\n"
+            )
+            for entry in self.entries.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path)
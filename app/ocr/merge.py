@@ -0,0 +1,138 @@
+from typing import List, Tuple
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+Region = Tuple[int, int, int, int]
+
+# candidate pairs of boxes tested at once by merge_components() (memory):
+CANDIDATES_CHUNK = 1 << 20
+
+
+def merge_components(
+    boxes: np.ndarray, pad_x: int = 0, pad_y: int = 0
+) -> np.ndarray:
+    """
+    One pass: bounding boxes of the connected components of the overlap graph.
+
+    Sweep line: boxes are sorted by left side, so the only boxes that can
+    overlap box ``i`` are the following ones starting before its right side
+    (found by binary search). These candidate pairs are generated as arrays
+    (``CANDIDATES_CHUNK`` at most at a time) and their vertical overlap is
+    tested all at once; overlapping pairs are then labelled as connected
+    components. Two boxes overlap when they (even just) touch once grown by
+    ``pad_x`` / ``pad_y`` on each side.
+
+    Cost: O(N log N + C), C = pairs of boxes whose x intervals overlap: about
+    N times the boxes on a vertical line of the page (a few dozen), N^2 / 2
+    in the worst case (all the boxes above each other).
+
+    Args:
+        boxes: (N, 4) int array of (x, y, w, h)
+
+    Returns:
+        (M, 4) int array of (x, y, w, h), M <= N
+    """
+    x1 = boxes[:, 0] - pad_x
+    y1 = boxes[:, 1] - pad_y
+    x2 = boxes[:, 0] + boxes[:, 2] + pad_x
+    y2 = boxes[:, 1] + boxes[:, 3] + pad_y
+    order = np.argsort(x1, kind="stable")
+    x1, y1, x2, y2 = x1[order], y1[order], x2[order], y2[order]
+    # candidates of box i: the counts[i] next ones (starting before its right
+    # side), the first one at firsts[i] among all the candidates
+    counts = np.searchsorted(x1, x2, side="right") - np.arange(1, len(boxes) + 1)
+    counts = np.maximum(counts, 0)
+    firsts = np.cumsum(counts) - counts
+
+    sources: List[np.ndarray] = []
+    targets: List[np.ndarray] = []
+    # consecutive boxes with about CANDIDATES_CHUNK candidates at a time:
+    bounds = np.unique(
+        np.searchsorted(firsts, np.arange(0, counts.sum(), CANDIDATES_CHUNK))
+    )
+    for lo, hi in zip(bounds, [*bounds[1:], len(boxes)]):
+        i = np.repeat(np.arange(lo, hi), counts[lo:hi])
+        # rank of each pair among the candidates of its box i, + i + 1:
+        j = np.arange(len(i)) - (firsts[i] - firsts[lo]) + i + 1
+        overlap = (y1[j] <= y2[i]) & (y2[j] >= y1[i])
+        sources.append(i[overlap])
+        targets.append(j[overlap])
+    if not any(len(pairs) for pairs in sources):
+        return boxes
+    sources = np.concatenate(sources)
+    targets = np.concatenate(targets)
+    # union-find of the overlapping pairs (done in C by scipy):
+    count, labels = connected_components(
+        coo_matrix(
+            (np.ones(len(sources), dtype=np.int8), (sources, targets)),
+            shape=(len(boxes), len(boxes)),
+        ),
+        directed=False,
+    )
+    sorted_boxes = boxes[order]
+    left = np.full(count, np.iinfo(np.int64).max)
+    top = np.full(count, np.iinfo(np.int64).max)
+    right = np.full(count, np.iinfo(np.int64).min)
+    bottom = np.full(count, np.iinfo(np.int64).min)
+    np.minimum.at(left, labels, sorted_boxes[:, 0])
+    np.minimum.at(top, labels, sorted_boxes[:, 1])
+    np.maximum.at(right, labels, sorted_boxes[:, 0] + sorted_boxes[:, 2])
+    np.maximum.at(bottom, labels, sorted_boxes[:, 1] + sorted_boxes[:, 3])
+    return np.stack([left, top, right - left, bottom - top], axis=1)
+
+
+def merge_regions(
+    regions: List[Region], pad_x: int = 0, pad_y: int = 0
+) -> List[Region]:
+    """
+    Merge all the transitively overlapping (x, y, w, h) regions.
+
+    A merged box can overlap boxes none of its parts overlapped: passes are
+    repeated until nothing changes, usually 2 or 3 (N at worst, each pass
+    that changes something merges at least two boxes). The passes after the
+    first one work on the merged boxes, far fewer: the first one is most of
+    the cost (see ``merge_components()``).
+    ``pad_x``/``pad_y`` group characters into words (``pad_x``) and words
+    into lines (``pad_y``) without changing the size of the result.
+
+    Returns:
+        merged regions, sorted by x
+    """
+    if not regions:
+        return []
+    boxes = np.asarray(regions, dtype=np.int64).reshape(-1, 4)
+    while True:
+        merged = merge_components(boxes, pad_x, pad_y)
+        if len(merged) == len(boxes):
+            break
+        boxes = merged
+    boxes = boxes[np.lexsort((boxes[:, 1], boxes[:, 0]))]
+    return [tuple(int(v) for v in box) for box in boxes]
+
+
+def merge_regions_sorted_last(regions: List[Region]) -> List[Region]:
+    """
+    Previous algorithm (kept for benchmarks): sort by x then merge each
+    region only with the last merged one. Misses overlaps of regions that
+    are not adjacent in x order.
+    """
+    merged: List[Region] = []
+    for r in sorted(regions, key=lambda r: r[0]):
+        if merged:
+            last = merged[-1]
+            if not (
+                last[0] + last[2] < r[0]
+                or r[0] + r[2] < last[0]
+                or last[1] + last[3] < r[1]
+                or r[1] + r[3] < last[1]
+            ):
+                x = min(last[0], r[0])
+                y = min(last[1], r[1])
+                w = max(last[0] + last[2], r[0] + r[2]) - x
+                h = max(last[1] + last[3], r[1] + r[3]) - y
+                merged[-1] = (x, y, w, h)
+                continue
+        merged.append(r)
+    return merged
@@ -0,0 +1,122 @@
+from typing import Any, Dict, Hashable, List, Sequence, Tuple
+
+import numpy as np
+
+Region = Tuple[int, int, int, int]
+
+
+def edit_distance(a: Sequence[Hashable], b: Sequence[Hashable]) -> int:
+    """
+    Levenshtein distance between two sequences (characters of strings,
+    words...), bit-parallel algorithm of Myers (Hyyrö's formulation): the
+    columns of the dynamic programming matrix are bit vectors of the length
+    of the shortest sequence (Python integers), one step per element of the
+    longest one, so a page (thousands of characters) costs thousands of
+    integer operations instead of millions of cells.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    m = len(b)
+    if not m:
+        return len(a)
+    # positions of each element of b, as bits:
+    peq: Dict[Hashable, int] = {}
+    for i, element in enumerate(b):
+        peq[element] = peq.get(element, 0) | (1 << i)
+    mask = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv, mv, score = mask, 0, m
+    for element in a:
+        eq = peq.get(element, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & mask) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+    return score
+
+
+def normalize_text(text: str) -> str:
+    """Words separated by single spaces: layout isn't evaluated."""
+    return " ".join(text.split())
+
+
+def error_counts(reference: str, hypothesis: str) -> Dict[str, int]:
+    """
+    Character and word edit distances between two texts (normalized), and
+    the lengths of the reference: summed over pages, they give the CER and
+    WER of a set of pages (``error_rates()``).
+    """
+    reference, hypothesis = normalize_text(reference), normalize_text(hypothesis)
+    reference_words, hypothesis_words = reference.split(), hypothesis.split()
+    # words -> integers: fewer hash computations of long strings
+    vocabulary: Dict[str, int] = {}
+    reference_ids = [vocabulary.setdefault(w, len(vocabulary)) for w in reference_words]
+    hypothesis_ids = [
+        vocabulary.setdefault(w, len(vocabulary)) for w in hypothesis_words
+    ]
+    return {
+        "char_errors": edit_distance(reference, hypothesis),
+        "chars": len(reference),
+        "word_errors": edit_distance(reference_ids, hypothesis_ids),
+        "words": len(reference_words),
+    }
+
+
+def error_rates(counts: List[Dict[str, int]]) -> Dict[str, float]:
+    """CER and WER of pages from their ``error_counts()``."""
+    chars = sum(c["chars"] for c in counts)
+    words = sum(c["words"] for c in counts)
+    return {
+        "cer": sum(c["char_errors"] for c in counts) / max(chars, 1),
+        "wer": sum(c["word_errors"] for c in counts) / max(words, 1),
+    }
+
+
+def reading_order(regions: List[Region]) -> List[int]:
+    """
+    Indexes of the (x, y, w, h) regions in reading order: grouped in lines
+    (a region whose vertical center is within half the median height of the
+    current line joins it), lines from top to bottom, regions of a line from
+    left to right.
+    """
+    if not regions:
+        return []
+    boxes = np.asarray(regions, dtype=np.float64).reshape(-1, 4)
+    centers = boxes[:, 1] + boxes[:, 3] / 2
+    tolerance = float(np.median(boxes[:, 3])) / 2
+    lines: List[List[int]] = []
+    line_center = 0.0
+    for i in np.argsort(centers, kind="stable").tolist():
+        if lines and centers[i] - line_center <= tolerance:
+            lines[-1].append(i)
+            line_center = float(np.mean(centers[lines[-1]]))
+        else:
+            lines.append([i])
+            line_center = float(centers[i])
+    return [i for line in lines for i in sorted(line, key=lambda j: boxes[j, 0])]
+
+
+def pareto_front(points: List[Dict[str, Any]], keys: Sequence[str]) -> List[int]:
+    """
+    Indexes of the points not dominated by another one: no other point is
+    as low on all ``keys`` and lower on one of them.
+    """
+    front = []
+    for i, point in enumerate(points):
+        dominated = any(
+            all(other[k] <= point[k] for k in keys)
+            and any(other[k] < point[k] for k in keys)
+            for j, other in enumerate(points)
+            if j != i
+        )
+        if not dominated:
+            front.append(i)
+    return front
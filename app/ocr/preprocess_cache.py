@@ -0,0 +1,98 @@
+import os
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.ocr.manifest import file_digest, params_digest
+from app.ocr.pyramid import DENOISE_SEARCH, DENOISE_TEMPLATE
+
+# increase it each time enhance() changes its output without a change of
+# the parameters below: the cached pages are computed again
+PREPROCESS_VERSION: int = 1
+FOLDER_NAME: str = "preprocessed"
+# PNG compression: the pages are big and noisy, the fastest level compresses
+# almost as much as the default one, several times faster
+PNG_COMPRESSION: int = 1
+
+# content hashes of the sources of this process, by path: (size, mtime, hash)
+_digests: Dict[str, Tuple[int, int, str]] = {}
+
+
+def source_digest(path: Path) -> str:
+    """
+    ``file_digest()`` of ``path``, computed once per process while its size
+    and modification time don't change (the frames of a multi-page file are
+    analyzed one after the other).
+    """
+    stat = path.stat()
+    known = _digests.get(str(path))
+    if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns):
+        return known[2]
+    digest = file_digest(path)
+    _digests[str(path)] = (stat.st_size, stat.st_mtime_ns, digest)
+    return digest
+
+
+class PreprocessCache:
+    """
+    Enhanced (denoised, equalized) pages kept in ``folder_dst/preprocessed``
+    between runs, as PNG files.
+
+    ``enhance()`` of a full page is the most expensive step before the
+    detection, and doesn't depend on the detection parameters: a run that
+    only changes them (EAST mode, validation, merge padding...) reads the
+    pages from the cache. The key of a page is the hash of its source file,
+    its frame, the scale it was enhanced at and the parameters of
+    ``enhance()``; a changed source or parameter gives another file, never
+    a stale page.
+
+    Files are written under a temporary name then renamed, so a reader
+    (another worker, an interrupted run) never sees a partial page.
+
+    Usage:
+        cache = PreprocessCache(folder_dst)
+        key = cache.key(image_path, frame, scale, strength)
+        enhanced = cache.load(key)
+        if enhanced is None:
+            enhanced = enhance(gray, strength)
+            cache.save(key, enhanced)
+    """
+
+    def __init__(self, folder_dst: Path):
+        self.folder: Path = folder_dst / FOLDER_NAME
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(image_path: Path, frame: Optional[int], scale: int, strength: float) -> str:
+        return params_digest(
+            {
+                "source": source_digest(image_path),
+                "frame": frame,
+                "scale": scale,
+                "denoise": (float(strength), DENOISE_TEMPLATE, DENOISE_SEARCH),
+                "version": PREPROCESS_VERSION,
+            }
+        )
+
+    def path(self, key: str) -> Path:
+        return self.folder / f"{key}.png"
+
+    def load(self, key: str) -> Optional[np.ndarray]:
+        """The cached page, None when it isn't in the cache (or unreadable)."""
+        path = self.path(key)
+        if not path.is_file():
+            return None
+        return cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+
+    def save(self, key: str, enhanced: np.ndarray) -> None:
+        ok, data = cv2.imencode(
+            ".png", enhanced, [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION]
+        )
+        if not ok:
+            raise ValueError(f"Can't encode the preprocessed page '{key}'.")
+        path = self.path(key)
+        partial = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        partial.write_bytes(data.tobytes())
+        os.replace(partial, path)
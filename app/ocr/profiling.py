@@ -0,0 +1,131 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+PERCENTILES: List[int] = [50, 90, 99]
+
+
+def cpu_time() -> float:
+    """
+    CPU time of this process (all its threads) and of its terminated
+    children: pytesseract runs Tesseract in a child process.
+    """
+    children = os.times()
+    return time.process_time() + children.children_user + children.children_system
+
+
+class StageProfiler:
+    """
+    Per-process timer of the stages of the page being analyzed.
+
+    ``reset()`` at the start of a page, then each stage is timed (wall and
+    CPU time, accumulated when a stage runs several times) and region counts
+    are recorded; ``snapshot()`` returns them, with the whole time since
+    ``reset()`` as the "page" stage, as a picklable dict sent back to the
+    parent process with the results of the page.
+
+    Usage:
+        profiler.reset()
+        with profiler.stage("mser"):
+            regions = detect(gray)
+        profiler.count("candidates", len(regions))
+        page_profile = profiler.snapshot()
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counts: Dict[str, int] = {}
+        self.started: Tuple[float, float] = (time.perf_counter(), cpu_time())
+
+    def reset(self) -> None:
+        self.stages = {}
+        self.counts = {}
+        self.started = (time.perf_counter(), cpu_time())
+
+    @contextmanager
+    def stage(self, name: str):
+        wall = time.perf_counter()
+        cpu = cpu_time()
+        try:
+            yield
+        finally:
+            stage = self.stages.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+            stage["wall"] += time.perf_counter() - wall
+            stage["cpu"] += cpu_time() - cpu
+
+    def count(self, name: str, value: int) -> None:
+        self.counts[name] = self.counts.get(name, 0) + int(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        wall, cpu = self.started
+        page = {"wall": time.perf_counter() - wall, "cpu": cpu_time() - cpu}
+        return {
+            "pid": os.getpid(),
+            "stages": {
+                "page": page,
+                **{name: dict(times) for name, times in self.stages.items()},
+            },
+            "counts": dict(self.counts),
+        }
+
+
+profiler = StageProfiler()
+
+
+def distribution(values: List[float]) -> Dict[str, float]:
+    """Total, mean, percentiles and max of per-page values."""
+    array = np.asarray(values, dtype=np.float64)
+    summary = {"total": float(array.sum()), "mean": float(array.mean())}
+    for percentile, value in zip(PERCENTILES, np.percentile(array, PERCENTILES)):
+        summary[f"p{percentile}"] = float(value)
+    summary["max"] = float(array.max())
+    return summary
+
+
+def summarize(profiles: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Aggregate the ``snapshot()`` of all the pages of a run: distribution of
+    each stage (over the pages it ran on) and of each count, totals per
+    worker. ``share`` = part of the wall time of all the pages spent in the
+    stage.
+    """
+    stage_walls: Dict[str, List[float]] = {}
+    stage_cpus: Dict[str, List[float]] = {}
+    counts: Dict[str, List[int]] = {}
+    workers: Dict[str, Dict[str, float]] = {}
+    for profile in profiles:
+        for name, times in profile["stages"].items():
+            stage_walls.setdefault(name, []).append(times["wall"])
+            stage_cpus.setdefault(name, []).append(times["cpu"])
+        for name, value in profile["counts"].items():
+            counts.setdefault(name, []).append(value)
+        page = profile["stages"].get("page", {"wall": 0.0, "cpu": 0.0})
+        worker = workers.setdefault(
+            str(profile["pid"]), {"pages": 0, "wall": 0.0, "cpu": 0.0}
+        )
+        worker["pages"] += 1
+        worker["wall"] += page["wall"]
+        worker["cpu"] += page["cpu"]
+
+    total_wall = sum(stage_walls.get("page", [])) or 1.0
+    stages = {
+        name: {
+            "pages": len(walls),
+            "share": sum(walls) / total_wall,
+            "wall": distribution(walls),
+            "cpu": distribution(stage_cpus[name]),
+        }
+        for name, walls in stage_walls.items()
+    }
+    return {
+        "pages": len(profiles),
+        "percentiles": PERCENTILES,
+        "stages": dict(
+            sorted(stages.items(), key=lambda item: -item[1]["wall"]["total"])
+        ),
+        "counts": {name: distribution(values) for name, values in counts.items()},
+        "workers": workers,
+    }
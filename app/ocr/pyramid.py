@@ -0,0 +1,115 @@
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+Region = Tuple[int, int, int, int]
+
+SCALES = [1, 2, 4, 8]
+# the decoder itself reduces the image (JPEG: DCT scaling = fast):
+READ_GRAYSCALE = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+READ_COLOR = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+# pixels around a region taken into account when it's denoised alone:
+ENHANCE_MARGIN = 10
+# cv2.fastNlMeansDenoising() of enhance(): strength, template and search
+# windows (part of the key of the cached pages, see app.ocr.preprocess_cache)
+DENOISE_STRENGTH = 10
+DENOISE_TEMPLATE = 7
+DENOISE_SEARCH = 21
+
+
+def read_image(
+    image_path: Path, scale: int = 1, color: bool = False, frame: Optional[int] = None
+) -> np.ndarray:
+    """
+    Decode ``image_path`` (or only its page ``frame`` for a multi-page
+    image) reduced ``scale`` times.
+    """
+    if frame is not None:
+        return read_frame(image_path, frame, scale, color)
+    flags = (READ_COLOR if color else READ_GRAYSCALE)[scale]
+    image = cv2.imread(str(image_path), flags)
+    if image is None:
+        raise ValueError(f"Can't read image '{image_path}'.")
+    return image
+
+
+def read_frame(
+    image_path: Path, frame: int, scale: int = 1, color: bool = False
+) -> np.ndarray:
+    """
+    Decode only the page ``frame`` of a multi-page image; reduced decoding
+    isn't available for them, the page is resized (same size as
+    ``cv2.IMREAD_REDUCED_*``).
+    """
+    flags = cv2.IMREAD_COLOR if color else cv2.IMREAD_GRAYSCALE
+    ok, images = cv2.imreadmulti(str(image_path), frame, 1, flags=flags)
+    if not ok or not images:
+        raise ValueError(f"Can't read page {frame + 1} of image '{image_path}'.")
+    image = images[0]
+    if scale > 1:
+        height, width = image.shape[:2]
+        image = cv2.resize(
+            image,
+            (-(-width // scale), -(-height // scale)),
+            interpolation=cv2.INTER_AREA,
+        )
+    return image
+
+
+def enhance(gray: np.ndarray, strength: float = DENOISE_STRENGTH) -> np.ndarray:
+    """Denoising (filter ``strength``) and contrast enhancement."""
+    gray = cv2.fastNlMeansDenoising(
+        gray, None, strength, DENOISE_TEMPLATE, DENOISE_SEARCH
+    )
+    return cv2.equalizeHist(gray)
+
+
+def enhance_regions(
+    gray: np.ndarray, regions: List[Region], strength: float = DENOISE_STRENGTH
+) -> List[np.ndarray]:
+    """
+    ``enhance()`` only the regions of the page; each region is denoised with
+    a margin around it so its borders are denoised like inside the page.
+    """
+    height, width = gray.shape[:2]
+    result = []
+    for x, y, w, h in regions:
+        x1, y1 = max(0, x - ENHANCE_MARGIN), max(0, y - ENHANCE_MARGIN)
+        x2 = min(width, x + w + ENHANCE_MARGIN)
+        y2 = min(height, y + h + ENHANCE_MARGIN)
+        enhanced = enhance(gray[y1:y2, x1:x2], strength)
+        result.append(enhanced[y - y1 : y - y1 + h, x - x1 : x - x1 + w])
+    return result
+
+
+def scale_regions(
+    regions: List[Region], source_shape: Tuple[int, ...], target_shape: Tuple[int, ...]
+) -> List[Region]:
+    """
+    Regions found on an image of ``source_shape`` -> regions of the same
+    page of ``target_shape`` (clipped to it). Factors are computed from the
+    real shapes: reduced decoding rounds sizes up.
+    """
+    if not regions:
+        return []
+    fy = target_shape[0] / source_shape[0]
+    fx = target_shape[1] / source_shape[1]
+    boxes = np.asarray(regions, dtype=np.float64).reshape(-1, 4)
+    x1 = np.clip(np.floor(boxes[:, 0] * fx), 0, target_shape[1])
+    y1 = np.clip(np.floor(boxes[:, 1] * fy), 0, target_shape[0])
+    x2 = np.clip(np.ceil((boxes[:, 0] + boxes[:, 2]) * fx), 0, target_shape[1])
+    y2 = np.clip(np.ceil((boxes[:, 1] + boxes[:, 3]) * fy), 0, target_shape[0])
+    scaled = np.stack([x1, y1, x2 - x1, y2 - y1], axis=1).astype(np.int64)
+    return [tuple(int(v) for v in box) for box in scaled if box[2] > 0 and box[3] > 0]
@@ -0,0 +1,149 @@
+from typing import Dict, List, MutableMapping, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# regions entirely in this part of the page, from the top or the bottom,
+# are candidates (running headers, footers, folios):
+HEADER_BAND: float = 0.12
+# ... and at most one line high (part of the page height): a paragraph
+# reaching into the band is never a candidate
+MAX_LINE_HEIGHT: float = 0.025
+# below this height of ink (pixels), two glyphs differ by a pixel or two:
+# a changed digit can't be told from the noise, the region is always read
+MIN_INK_HEIGHT: int = 20
+# two fingerprints are compared at all the shifts up to this many pixels:
+MAX_SHIFT: int = 2
+# fingerprints are grouped by width, this many pixels per bucket:
+BUCKET_WIDTH: int = 8
+# most recent fingerprints kept per bucket:
+BUCKET_SIZE: int = 32
+
+# (height, width, packed bits of the ink, text)
+Entry = Tuple[int, int, bytes, str]
+
+# shared by the workers of a run (``mp.Manager().dict()``): bucket -> list of
+# entries; None = no deduplication in this process
+_table: Optional[MutableMapping[int, List[Entry]]] = None
+
+
+def set_region_cache(table: Optional[MutableMapping[int, List[Entry]]]) -> None:
+    """Called by the ``mp.Pool`` initializer with the table of the run."""
+    global _table
+    _table = table
+
+
+def get_region_cache() -> Optional["RegionCache"]:
+    return RegionCache(_table) if _table is not None else None
+
+
+def band_regions(
+    text_regions: List[Tuple[int, int, int, int]], page_height: int
+) -> List[int]:
+    """
+    Indexes of the regions that lie entirely in the header or footer band
+    of the page and are at most a line high.
+    """
+    top = page_height * HEADER_BAND
+    bottom = page_height * (1 - HEADER_BAND)
+    max_height = page_height * MAX_LINE_HEIGHT
+    return [
+        i
+        for i, (_, y, _, h) in enumerate(text_regions)
+        if h <= max_height and (y + h <= top or y >= bottom)
+    ]
+
+
+def region_fingerprint(gray: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Ink of a region of the grayscale page at full resolution (Otsu
+    threshold, 1 = ink), cropped to the ink. None for a region without ink
+    or with ink smaller than MIN_INK_HEIGHT.
+    """
+    if not gray.size:
+        return None
+    _, ink = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    points = cv2.findNonZero(ink)
+    if points is None:
+        return None
+    x, y, w, h = cv2.boundingRect(points)
+    if h < MIN_INK_HEIGHT:
+        return None
+    return ink[y : y + h, x : x + w]
+
+
+def fingerprints_match(a: np.ndarray, b: np.ndarray) -> bool:
+    """
+    Same text: at some shift of up to MAX_SHIFT pixels, the two inks differ
+    only by lines one pixel thin (the edges of the strokes, moved by the
+    noise and the sampling), erased by a 2 x 2 opening; a stroke present in
+    only one of them leaves a thicker difference.
+    """
+    if abs(a.shape[0] - b.shape[0]) > MAX_SHIFT:
+        return False
+    if abs(a.shape[1] - b.shape[1]) > MAX_SHIFT:
+        return False
+    height = max(a.shape[0], b.shape[0]) + 2 * MAX_SHIFT
+    width = max(a.shape[1], b.shape[1]) + 2 * MAX_SHIFT
+    padded_a = np.zeros((height, width), dtype=np.uint8)
+    padded_a[MAX_SHIFT : MAX_SHIFT + a.shape[0], MAX_SHIFT : MAX_SHIFT + a.shape[1]] = a
+    kernel = np.ones((2, 2), dtype=np.uint8)
+    for dy in range(2 * MAX_SHIFT + 1):
+        for dx in range(2 * MAX_SHIFT + 1):
+            padded_b = np.zeros((height, width), dtype=np.uint8)
+            padded_b[dy : dy + b.shape[0], dx : dx + b.shape[1]] = b
+            difference = cv2.morphologyEx(padded_a ^ padded_b, cv2.MORPH_OPEN, kernel)
+            if not difference.any():
+                return True
+    return False
+
+
+class RegionCache:
+    """
+    Text of the header and footer regions already read during the run.
+
+    Fingerprints are compared at full resolution, so the same folio
+    scanned on two pages rarely differs by more than the edges of its
+    strokes, while another digit always does: a false match would give a
+    page the text of another one, a miss only costs an OCR. They're grouped
+    in buckets by width: a lookup fetches the buckets of similar widths from
+    the shared table and compares the fingerprints in the worker. Concurrent
+    additions to the same bucket may lose one of them: a later miss, never a
+    wrong text.
+
+    Usage:
+        cache = get_region_cache()
+        text = cache.lookup(fingerprint)
+        ...
+        cache.add([(fingerprint, text), ...])
+    """
+
+    def __init__(self, table: MutableMapping[int, List[Entry]]):
+        self.table = table
+
+    def lookup(self, fingerprint: np.ndarray) -> Optional[str]:
+        bucket = fingerprint.shape[1] // BUCKET_WIDTH
+        for key in (bucket, bucket - 1, bucket + 1):
+            for height, width, data, text in self.table.get(key, []):
+                candidate = np.unpackbits(
+                    np.frombuffer(data, dtype=np.uint8), count=height * width
+                ).reshape(height, width)
+                if fingerprints_match(fingerprint, candidate):
+                    return text
+        return None
+
+    def add(self, entries: List[Tuple[np.ndarray, str]]) -> None:
+        """Add the regions of a page, one update of the shared table."""
+        buckets: Dict[int, List[Entry]] = {}
+        for fingerprint, text in entries:
+            key = fingerprint.shape[1] // BUCKET_WIDTH
+            if key not in buckets:
+                buckets[key] = list(self.table.get(key, []))
+            height, width = fingerprint.shape
+            buckets[key].append(
+                (height, width, np.packbits(fingerprint, axis=None).tobytes(), text)
+            )
+        if buckets:
+            self.table.update(
+                {key: bucket[-BUCKET_SIZE:] for key, bucket in buckets.items()}
+            )
@@ -0,0 +1,160 @@
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    MutableMapping,
+    Optional,
+    Union,
+)
+
+import cv2
+import pytesseract
+
+from app.ocr.region_cache import Entry, set_region_cache
+from app.ocr.scheduler import CoreLayout
+from app.ocr.writer import set_write_reports
+
+DEFAULT_EAST_MODEL_PATH = "frozen_east_text_detection.pb"
+
+
+class ModelRegistry:
+    """
+    Per-process registry of the heavy objects used by the OCR pipeline.
+
+    Each object (EAST network, MSER detector, Tesseract engine...) is built
+    by its loader the first time it's asked for, then kept for the whole life
+    of the process. ``mp.Pool`` workers call ``init_worker()`` once, so the
+    loading cost is paid once per worker instead of once per page.
+
+    Load time and inference time are accumulated separately, so a run can
+    tell how much was spent building models vs. using them.
+
+    Usage:
+        registry.configure(east_model_path="/models/east.pb")
+        registry.warm()
+        net = registry.get("east")
+        with registry.timed("east"):
+            outputs = net.forward(layers)
+    """
+
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._models: Dict[str, Any] = {}
+        self.east_model_path: str = os.path.abspath(DEFAULT_EAST_MODEL_PATH)
+        self.load_times: Dict[str, float] = {}
+        self.inference_times: Dict[str, float] = defaultdict(float)
+        self.inference_calls: Dict[str, int] = defaultdict(int)
+
+    def register(self, name: str, loader: Callable[[], Any]) -> None:
+        """Register (or replace) the loader of a model."""
+        self._loaders[name] = loader
+        self._models.pop(name, None)
+
+    def configure(self, east_model_path: Optional[str] = None) -> None:
+        """Change the models settings; already loaded models are dropped."""
+        if east_model_path:
+            self.east_model_path = os.path.abspath(east_model_path)
+            self._models.pop("east", None)
+
+    def get(self, name: str) -> Any:
+        """Return the model ``name``, loading it on first use."""
+        try:
+            return self._models[name]
+        except KeyError:
+            pass
+        try:
+            loader = self._loaders[name]
+        except KeyError:
+            raise KeyError(f"No loader registered for model '{name}'.")
+        start = time.perf_counter()
+        model = loader()
+        self.load_times[name] = (
+            self.load_times.get(name, 0.0) + time.perf_counter() - start
+        )
+        self._models[name] = model
+        return model
+
+    def warm(self, names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """Load all (or only ``names``) models now, return their load times."""
+        for name in names if names is not None else list(self._loaders):
+            self.get(name)
+        return dict(self.load_times)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    @contextmanager
+    def timed(self, name: str):
+        """Accumulate the time spent in the block as inference of ``name``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.inference_times[name] += time.perf_counter() - start
+            self.inference_calls[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of the timings of this process (picklable)."""
+        return {
+            "pid": os.getpid(),
+            "load_times": dict(self.load_times),
+            "inference_times": dict(self.inference_times),
+            "inference_calls": dict(self.inference_calls),
+        }
+
+
+def load_east() -> Any:
+    if not os.path.exists(registry.east_model_path):
+        raise FileNotFoundError(
+            f"EAST model file not found at location: {registry.east_model_path}"
+        )
+    return cv2.dnn.readNet(registry.east_model_path)
+
+
+def load_tesseract() -> str:
+    # pytesseract forks a process per call: nothing to keep in memory, but
+    # checking the binary once per worker fails fast if it's missing and
+    # brings the executable into the OS cache before the first page:
+    return str(pytesseract.get_tesseract_version())
+
+
+registry = ModelRegistry()
+registry.register("east", load_east)
+registry.register("mser", cv2.MSER_create)
+registry.register("tesseract", load_tesseract)
+
+# models used by each text regions detector (see analyze_image --detector):
+DETECTOR_MODELS: Dict[str, List[str]] = {
+    "mser-east": ["mser", "east", "tesseract"],
+    "profile": ["tesseract"],
+}
+
+
+def init_worker(
+    east_model_path: Optional[str] = None,
+    warm: Union[bool, List[str]] = True,
+    layout: Optional[CoreLayout] = None,
+    region_cache: Optional[MutableMapping[int, List[Entry]]] = None,
+    write_reports: Optional[Any] = None,
+) -> None:
+    """
+    ``mp.Pool`` initializer: apply the CPUs ``layout`` of the pool (threads,
+    pinning), share the ``region_cache`` of the run (running headers and
+    footers) and the ``write_reports`` queue of the outputs written,
+    configure the registry and warm it: all the models (True) or the ones
+    named (``DETECTOR_MODELS`` of the detector of the run), so a model the
+    run doesn't use (EAST with the profile detector) needs no file.
+    """
+    if layout is not None:
+        layout.apply()
+    set_region_cache(region_cache)
+    set_write_reports(write_reports)
+    registry.configure(east_model_path=east_model_path)
+    if warm:
+        registry.warm(None if warm is True else warm)
@@ -0,0 +1,122 @@
+import multiprocessing as mp
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+
+# "off" = libraries defaults (each worker runs as many OpenCV and OpenMP
+# threads as there are CPUs), "shared" = the CPUs are shared between the
+# workers, "pinned" = same and each worker is bound to its own CPUs (Linux)
+SCHEDULES: List[str] = ["off", "shared", "pinned"]
+
+
+def available_cpus() -> List[int]:
+    """CPUs this process may run on (cgroups / ``taskset`` are honored)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def cpu_core(cpu: int) -> Tuple[int, int]:
+    """(socket, physical core) of a CPU, from Linux sysfs (else the CPU)."""
+    topology = Path(f"/sys/devices/system/cpu/cpu{cpu}/topology")
+    try:
+        return (
+            int((topology / "physical_package_id").read_text()),
+            int((topology / "core_id").read_text()),
+        )
+    except (OSError, ValueError):
+        return 0, cpu
+
+
+class CoreLayout:
+    """
+    Budget of the CPUs between the processes of a ``mp.Pool`` and the
+    threads each of them runs inside OpenCV (``cv2.setNumThreads()``, also
+    used by the EAST network) and Tesseract (``OMP_THREAD_LIMIT``, inherited
+    by the ``tesseract`` processes pytesseract starts).
+
+    Without it, each of the N workers runs N OpenCV threads and N OpenMP
+    threads: N² threads fighting for N CPUs.
+
+    With "pinned", the CPUs are ordered by physical core, so the
+    hyper-threads of a core go to the same worker, and worker i is bound to
+    the i-th group of CPUs. Workers get their group in start order: a worker
+    replacing another one (``maxtasksperchild``) may share the CPUs of a
+    living worker.
+
+    Usage:
+        layout = CoreLayout("pinned", processes=8)
+        with mp.Pool(8, initializer=init_worker,
+                     initargs=(east_model, True, layout)):
+            ...
+        self.out(layout.describe())
+    """
+
+    def __init__(
+        self,
+        schedule: str,
+        processes: int,
+        threads: int = 0,
+        cpus: Optional[List[int]] = None,
+    ):
+        self.schedule: str = schedule
+        self.cpus: List[int] = sorted(cpus or available_cpus(), key=cpu_core)
+        self.cores: int = len({cpu_core(cpu) for cpu in self.cpus})
+        self.processes: int = max(1, processes)
+        # 0 = the CPUs left to each process:
+        self.threads: int = threads or max(1, len(self.cpus) // self.processes)
+        self.cpu_sets: List[List[int]] = []
+        if schedule == "pinned" and hasattr(os, "sched_setaffinity"):
+            # more processes x threads than CPUs: groups wrap around
+            self.cpu_sets = [
+                [
+                    self.cpus[(slot * self.threads + i) % len(self.cpus)]
+                    for i in range(self.threads)
+                ]
+                for slot in range(self.processes)
+            ]
+        # next group of CPUs, shared by the workers:
+        self._next_slot = mp.Value("i", 0)
+
+    def apply(self) -> None:
+        """In a worker, before any OpenCV or Tesseract call."""
+        if self.schedule == "off":
+            return
+        os.environ["OMP_THREAD_LIMIT"] = str(self.threads)
+        cv2.setNumThreads(self.threads)
+        if self.cpu_sets:
+            with self._next_slot.get_lock():
+                slot = self._next_slot.value
+                self._next_slot.value += 1
+            os.sched_setaffinity(0, self.cpu_sets[slot % len(self.cpu_sets)])
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "schedule": self.schedule,
+            "cpus": len(self.cpus),
+            "cores": self.cores,
+            "processes": self.processes,
+            "threads": self.threads if self.schedule != "off" else None,
+            "cpu_sets": self.cpu_sets,
+        }
+
+    def describe(self) -> str:
+        if self.schedule == "off":
+            return (
+                f"Schedule 'off': {self.processes} process(es), libraries "
+                f"threads unbounded, on {len(self.cpus)} CPU(s)."
+            )
+        text = (
+            f"Schedule '{self.schedule}': {self.processes} process(es) x "
+            f"{self.threads} OpenCV/Tesseract thread(s) on {len(self.cpus)} "
+            f"CPU(s) ({self.cores} core(s))"
+        )
+        if self.cpu_sets:
+            text += ", pinned to " + " | ".join(
+                ",".join(str(cpu) for cpu in cpu_set) for cpu_set in self.cpu_sets
+            )
+        elif self.schedule == "pinned":
+            text += ", not pinned (not supported on this system)"
+        return text + "."
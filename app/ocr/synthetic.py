@@ -0,0 +1,153 @@
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# fonts available without any font file:
+SYNTHETIC_FONTS: Dict[str, int] = {
+    "simplex": cv2.FONT_HERSHEY_SIMPLEX,
+    "duplex": cv2.FONT_HERSHEY_DUPLEX,
+    "complex": cv2.FONT_HERSHEY_COMPLEX,
+    "triplex": cv2.FONT_HERSHEY_TRIPLEX,
+}
+# A4 at 150 and 300 dpi:
+SYNTHETIC_SIZES: List[Tuple[int, int]] = [(1240, 1754), (2480, 3508)]
+SYNTHETIC_WORDS: List[str] = (
+    "the of and to in that was his he it with is for as had you not be her "
+    "on at by which have or from this him but all she they were my are me "
+    "one their so an said them we who would been will no when there if more "
+    "out up into do any your what has man could other than our some very "
+    "time upon about may its only now like little then can should made did "
+    "us such great before must two these see know over much down after first"
+).split()
+TRUTH_FILE_NAME = "truth.json"
+
+
+def render_page(
+    rng: np.random.Generator,
+    size: Tuple[int, int] = SYNTHETIC_SIZES[0],
+    font: str = "simplex",
+    font_scale: float = 1.0,
+    noise: float = 0.0,
+    skew: float = 0.0,
+) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+    """
+    Render a grayscale book page of random words with known text.
+
+    Args:
+        rng: random generator (same seed = same page)
+        size: (width, height) of the page
+        font: key of ``SYNTHETIC_FONTS``
+        font_scale: ``cv2.putText()`` scale, 1.0 = ~22 pixels high letters
+        noise: standard deviation of the gaussian noise added (0 = none)
+        skew: rotation of the page in degrees (counter-clockwise)
+
+    Returns:
+        (page, lines): ``lines`` = list of {"text", "box"} where box is the
+        (x, y, w, h) of the line on the page (after skew).
+    """
+    width, height = size
+    face = SYNTHETIC_FONTS[font]
+    thickness = max(1, int(round(font_scale * 2)))
+    page = np.full((height, width), 255, dtype=np.uint8)
+    margin = width // 10
+    (_, text_height), baseline = cv2.getTextSize("Ag", face, font_scale, thickness)
+    line_height = int((text_height + baseline) * 1.8)
+    space = cv2.getTextSize(" ", face, font_scale, thickness)[0][0]
+
+    lines: List[Dict[str, Any]] = []
+    y = margin + text_height
+    while y + baseline < height - margin:
+        words: List[str] = []
+        x = margin
+        while True:
+            word = str(rng.choice(SYNTHETIC_WORDS))
+            word_width = cv2.getTextSize(word, face, font_scale, thickness)[0][0]
+            if x + word_width > width - margin:
+                break
+            words.append(word)
+            x += word_width + space
+        text = " ".join(words)
+        cv2.putText(page, text, (margin, y), face, font_scale, 0, thickness)
+        lines.append(
+            {
+                "text": text,
+                "box": (
+                    margin,
+                    y - text_height,
+                    x - space - margin,
+                    text_height + baseline,
+                ),
+            }
+        )
+        y += line_height
+        # paragraphs:
+        if rng.random() < 0.15:
+            y += line_height
+
+    if skew:
+        center = (width / 2, height / 2)
+        rotation = cv2.getRotationMatrix2D(center, skew, 1.0)
+        page = cv2.warpAffine(
+            page, rotation, (width, height), flags=cv2.INTER_LINEAR, borderValue=255
+        )
+        for line in lines:
+            x, y, w, h = line["box"]
+            corners = np.array(
+                [[x, y, 1], [x + w, y, 1], [x, y + h, 1], [x + w, y + h, 1]],
+                dtype=np.float64,
+            )
+            moved = corners @ rotation.T
+            x1, y1 = np.floor(moved.min(axis=0)).astype(int)
+            x2, y2 = np.ceil(moved.max(axis=0)).astype(int)
+            line["box"] = (int(x1), int(y1), int(x2 - x1), int(y2 - y1))
+
+    if noise > 0:
+        noisy = page.astype(np.float32) + rng.normal(0, noise, page.shape)
+        page = np.clip(noisy, 0, 255).astype(np.uint8)
+    return page, lines
+
+
+def render_book(
+    folder: Path,
+    pages: int,
+    seed: int = 0,
+    sizes: Sequence[Tuple[int, int]] = (SYNTHETIC_SIZES[0],),
+    fonts: Sequence[str] = tuple(SYNTHETIC_FONTS),
+    noises: Sequence[float] = (0.0, 12.0),
+    skews: Sequence[float] = (0.0, 1.5),
+) -> List[Path]:
+    """
+    Write ``pages`` PNG pages in ``folder``, cycling through all the
+    combinations of sizes, fonts, noises and skews, and their text in
+    ``TRUTH_FILE_NAME`` ({page name: {"size", "font", ..., "lines"}}).
+    """
+    rng = np.random.default_rng(seed)
+    folder.mkdir(parents=True, exist_ok=True)
+    variants = [
+        (size, font, noise, skew)
+        for size in sizes
+        for font in fonts
+        for noise in noises
+        for skew in skews
+    ]
+    paths: List[Path] = []
+    truth: Dict[str, Dict[str, Any]] = {}
+    for i in range(pages):
+        size, font, noise, skew = variants[i % len(variants)]
+        page, lines = render_page(rng, size, font, size[0] / 1240, noise, skew)
+        path = folder / f"page_{i:04d}.png"
+        cv2.imwrite(str(path), page)
+        paths.append(path)
+        truth[path.name] = {
+            "size": size,
+            "font": font,
+            "noise": noise,
+            "skew": skew,
+            "lines": lines,
+        }
+    with open(folder / TRUTH_FILE_NAME, "w", encoding="utf-8") as f:
+        json.dump(truth, f, ensure_ascii=False)
+    return paths
@@ -0,0 +1,145 @@
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+import pytesseract
+
+from app.ocr.registry import registry
+
+# Tesseract page segmentation mode: 6 = a single uniform block of text
+PSM = 6
+TESSERACT_CONFIG = f"--psm {PSM}"
+OCR_MODES = ["region", "mosaic", "page"]
+# white pixels around and between regions pasted in a mosaic:
+MOSAIC_MARGIN = 20
+# keep mosaics well below Tesseract's maximum image height (32767):
+MOSAIC_MAX_HEIGHT = 16000
+
+# neighbourhood (pixels, odd) and offset of the adaptive threshold:
+THRESHOLD_BLOCK = 11
+THRESHOLD_C = 2
+
+Region = Tuple[int, int, int, int]
+
+
+def tesseract_config(psm: int = PSM) -> str:
+    return f"--psm {psm}"
+
+
+def binarize(gray: np.ndarray, block: int = THRESHOLD_BLOCK) -> np.ndarray:
+    """Adaptive thresholding applied before OCR (text black on white)."""
+    return cv2.adaptiveThreshold(
+        gray,
+        255,
+        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY,
+        block,
+        THRESHOLD_C,
+    )
+
+
+def words_to_text(data: Dict[str, List], indices: List[int]) -> str:
+    """
+    Rebuild the text of some words of an ``image_to_data()`` result: words of
+    the same line are joined by a space, lines by a newline.
+    """
+    lines: Dict[Tuple[int, int, int], List[str]] = {}
+    for i in indices:
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append(data["text"][i])
+    return "\n".join(" ".join(words) for words in lines.values())
+
+
+def image_to_words(image: np.ndarray, config: str) -> Dict[str, List]:
+    """One Tesseract call, only the (non-empty) words are kept."""
+    with registry.timed("tesseract"):
+        data = pytesseract.image_to_data(
+            image, config=config, output_type=pytesseract.Output.DICT
+        )
+    keep = [i for i, text in enumerate(data["text"]) if text.strip()]
+    return {key: [values[i] for i in keep] for key, values in data.items()}
+
+
+def ocr_each(regions: List[np.ndarray], config: str = TESSERACT_CONFIG) -> List[str]:
+    """One Tesseract call per region."""
+    texts = []
+    for region in regions:
+        with registry.timed("tesseract"):
+            texts.append(pytesseract.image_to_string(region, config=config))
+    return texts
+
+
+def ocr_mosaic(
+    regions: List[np.ndarray], config: str = TESSERACT_CONFIG
+) -> List[str]:
+    """
+    Paste the binarized regions one below the other on white mosaics, OCR
+    each mosaic once then give each word back to the region it lies in.
+    """
+    return [
+        words_to_text(data, indices)
+        for data, indices in ocr_mosaic_words(regions, config)
+    ]
+
+
+def ocr_mosaic_words(
+    regions: List[np.ndarray], config: str = TESSERACT_CONFIG
+) -> List[Tuple[Dict[str, List], List[int]]]:
+    """
+    ``ocr_mosaic()`` before the texts are rebuilt: for each region, the
+    ``image_to_words()`` data of its mosaic and the indexes of its words.
+    """
+    words: List[Tuple[Dict[str, List], List[int]]] = [({}, [])] * len(regions)
+    start = 0
+    while start < len(regions):
+        # fill a mosaic up to MOSAIC_MAX_HEIGHT (always at least one region):
+        end = start
+        height = MOSAIC_MARGIN
+        while end < len(regions) and (
+            end == start
+            or height + regions[end].shape[0] + MOSAIC_MARGIN <= MOSAIC_MAX_HEIGHT
+        ):
+            height += regions[end].shape[0] + MOSAIC_MARGIN
+            end += 1
+        width = max(region.shape[1] for region in regions[start:end])
+        mosaic = np.full((height, width + 2 * MOSAIC_MARGIN), 255, dtype=np.uint8)
+        tops = []
+        top = MOSAIC_MARGIN
+        for region in regions[start:end]:
+            h, w = region.shape[:2]
+            mosaic[top : top + h, MOSAIC_MARGIN : MOSAIC_MARGIN + w] = region
+            tops.append(top)
+            top += h + MOSAIC_MARGIN
+
+        data = image_to_words(mosaic, config)
+        centers = np.array(data["top"]) + np.array(data["height"]) / 2
+        bands = np.searchsorted(np.array(tops), centers, side="right") - 1
+        for offset in range(end - start):
+            h = regions[start + offset].shape[0]
+            indices = [
+                i
+                for i, band in enumerate(bands)
+                if band == offset and centers[i] < tops[offset] + h
+            ]
+            words[start + offset] = (data, indices)
+        start = end
+    return words
+
+
+def ocr_page(
+    binarized_page: np.ndarray, boxes: List[Region], config: str = TESSERACT_CONFIG
+) -> List[str]:
+    """
+    OCR the whole (binarized) page once, then give each word to the regions
+    that contain its center.
+    """
+    if not boxes:
+        return []
+    data = image_to_words(binarized_page, config)
+    cx = np.array(data["left"]) + np.array(data["width"]) / 2
+    cy = np.array(data["top"]) + np.array(data["height"]) / 2
+    texts = []
+    for x, y, w, h in boxes:
+        inside = (cx >= x) & (cx < x + w) & (cy >= y) & (cy < y + h)
+        texts.append(words_to_text(data, np.flatnonzero(inside).tolist()))
+    return texts
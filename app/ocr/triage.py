@@ -0,0 +1,141 @@
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+PAGE_CLASSES: List[str] = ["blank", "image", "light", "dense"]
+# route of each class: "skip" = no detection nor OCR (empty results),
+# "sparse" = detection on the page reduced SPARSE_DETECT_SCALE times then
+# denoising of the regions only, "full" = the pipeline as configured
+TRIAGE_ROUTES: Dict[str, Dict[str, str]] = {
+    "blank": {"blank": "skip", "image": "full", "light": "full", "dense": "full"},
+    "all": {"blank": "skip", "image": "skip", "light": "sparse", "dense": "full"},
+}
+TRIAGE_MODES: List[str] = ["off", *TRIAGE_ROUTES]
+SPARSE_DETECT_SCALE: int = 2
+# biggest side of the page the statistics are computed on:
+TRIAGE_SIZE: int = 512
+# the paper around a pixel: brightest pixel of this window (thumbnail pixels)
+BACKGROUND_WINDOW: int = 15
+# ink = darker than the paper around it by the Otsu threshold of these
+# contrasts, but more than the paper itself by at least this many times the
+# noise of the page, and at least MIN_INK_CONTRAST levels (faint print: a
+# few dozen levels)
+NOISE_FACTOR: float = 4.0
+MIN_INK_CONTRAST: int = 8
+# blank = no blob of ink at all, and (almost) no edges: a single word is
+# not blank
+BLANK_MAX_COMPONENTS: int = 0
+BLANK_MAX_EDGES: float = 0.0005
+# a connected blob of ink this big (part of the page) is not text:
+IMAGE_MIN_COMPONENT: float = 0.02
+LIGHT_MAX_COMPONENTS: int = 100
+LIGHT_MAX_EDGES: float = 0.02
+
+
+def page_statistics(gray: np.ndarray) -> Dict[str, float]:
+    """
+    Cheap statistics of a grayscale page, computed on a TRIAGE_SIZE
+    thumbnail without its borders (scanner edges, gutter shadow):
+
+    - coverage: part of the page covered by ink
+    - edges: part of the page on a Canny edge (thresholds relative to the
+      ink contrast: faint print has edges too)
+    - components: connected blobs of ink (letters or words at this size)
+    - largest: part of the page covered by the biggest blob
+    """
+    height, width = gray.shape[:2]
+    factor = TRIAGE_SIZE / max(height, width)
+    small = gray
+    if factor < 1:
+        small = cv2.resize(
+            gray,
+            (max(1, round(width * factor)), max(1, round(height * factor))),
+            interpolation=cv2.INTER_AREA,
+        )
+    margin_y, margin_x = small.shape[0] // 20, small.shape[1] // 20
+    small = small[
+        margin_y : small.shape[0] - margin_y, margin_x : small.shape[1] - margin_x
+    ]
+    # contrast with the paper around (shadows, yellowed or uneven paper):
+    background = cv2.dilate(
+        small, np.ones((BACKGROUND_WINDOW, BACKGROUND_WINDOW), dtype=np.uint8)
+    )
+    contrast = cv2.subtract(background, small)
+    # robust standard deviation of the noise (median absolute deviation):
+    noise = 1.4826 * float(np.median(cv2.absdiff(small, cv2.medianBlur(small, 3))))
+    otsu, _ = cv2.threshold(contrast, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # the brightest pixel of a window is itself lifted by the noise: the
+    # contrast of the paper is the median one
+    paper = float(np.median(contrast))
+    threshold = max(otsu, paper + max(NOISE_FACTOR * noise, MIN_INK_CONTRAST))
+    ink = (contrast > threshold).astype(np.uint8)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    # a step of the ink contrast gives a Sobel gradient about 4 times bigger:
+    edges = cv2.Canny(small, 2 * threshold, 4 * threshold)
+    return {
+        "coverage": float(ink.mean()),
+        "edges": float(np.count_nonzero(edges) / small.size),
+        # single pixels are noise:
+        "components": int(np.count_nonzero(areas >= 2)),
+        "largest": float(areas.max() / ink.size) if len(areas) else 0.0,
+    }
+
+
+def classify_page(statistics: Dict[str, float]) -> str:
+    """
+    Class of a page (see ``PAGE_CLASSES``) from its ``page_statistics()``.
+    In doubt a page goes to the class of more content: a page skipped by
+    mistake loses its text, one analyzed by mistake only costs time.
+    """
+    if (
+        statistics["components"] <= BLANK_MAX_COMPONENTS
+        and statistics["edges"] <= BLANK_MAX_EDGES
+    ):
+        return "blank"
+    if statistics["largest"] >= IMAGE_MIN_COMPONENT:
+        return "image"
+    if (
+        statistics["components"] < LIGHT_MAX_COMPONENTS
+        and statistics["edges"] < LIGHT_MAX_EDGES
+    ):
+        return "light"
+    return "dense"
+
+
+def triage_summary(profiles: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Pages and mean wall time per class and route, from the profiles of the
+    pages (``"triage"`` key). The time saved is estimated as what the pages
+    not sent to the full pipeline would have cost at the mean time of the
+    ones that were (None when no page was).
+    """
+    classes: Dict[str, Dict[str, Any]] = {}
+    routes: Dict[str, List[float]] = {}
+    for profile in profiles:
+        triage = profile.get("triage")
+        if not triage:
+            continue
+        wall = profile["stages"]["page"]["wall"]
+        page_class = classes.setdefault(
+            triage["class"], {"pages": 0, "wall": 0.0, "route": triage["route"]}
+        )
+        page_class["pages"] += 1
+        page_class["wall"] += wall
+        routes.setdefault(triage["route"], []).append(wall)
+    for page_class in classes.values():
+        page_class["mean"] = page_class.pop("wall") / page_class["pages"]
+    saved: Optional[float] = None
+    if routes.get("full"):
+        full_mean = float(np.mean(routes["full"]))
+        saved = sum(
+            len(walls) * full_mean - sum(walls)
+            for route, walls in routes.items()
+            if route != "full"
+        )
+    return {
+        "classes": classes,
+        "routes": {route: len(walls) for route, walls in routes.items()},
+        "saved": saved,
+    }
@@ -0,0 +1,108 @@
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+# default thresholds of a "text like" region:
+MIN_SIZE = 10
+MAX_PAGE_RATIO = 0.8
+MIN_ASPECT_RATIO = 0.1
+MAX_ASPECT_RATIO = 15
+# --min-variance and --min-edge-density of analyze_image, see evaluate_ocr:
+MIN_VARIANCE = 100
+MIN_EDGE_DENSITY = 0.1
+
+
+class RegionValidator:
+    """
+    Validation of candidate text regions of a page.
+
+    The edge map of the page and the integral images of its pixels, of their
+    squares and of the edge map are computed once; then variance and edge
+    density of any box are O(1) lookups, done for all the boxes at once.
+
+    Usage:
+        validator = RegionValidator(gray)
+        keep = validator.validate(boxes)  # boxes = (N, 4) array of x, y, w, h
+    """
+
+    def __init__(self, gray: np.ndarray):
+        self.height, self.width = gray.shape[:2]
+        self.sums, self.sq_sums = cv2.integral2(
+            gray, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F
+        )
+        self.edge_sums = cv2.integral(cv2.Canny(gray, 100, 200), sdepth=cv2.CV_64F)
+
+    @staticmethod
+    def box_sums(
+        integral: np.ndarray,
+        x1: np.ndarray,
+        y1: np.ndarray,
+        x2: np.ndarray,
+        y2: np.ndarray,
+    ) -> np.ndarray:
+        return integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+
+    def clip(
+        self, boxes: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """(x, y, w, h) boxes -> corners clipped to the page."""
+        x1 = np.clip(boxes[:, 0], 0, self.width)
+        y1 = np.clip(boxes[:, 1], 0, self.height)
+        x2 = np.clip(boxes[:, 0] + boxes[:, 2], 0, self.width)
+        y2 = np.clip(boxes[:, 1] + boxes[:, 3], 0, self.height)
+        return x1, y1, x2, y2
+
+    def statistics(self, boxes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Variance and edge density of each box (0 for empty boxes)."""
+        x1, y1, x2, y2 = self.clip(boxes)
+        area = ((x2 - x1) * (y2 - y1)).astype(np.float64)
+        safe_area = np.maximum(area, 1)
+        mean = self.box_sums(self.sums, x1, y1, x2, y2) / safe_area
+        sq_mean = self.box_sums(self.sq_sums, x1, y1, x2, y2) / safe_area
+        variance = np.where(area > 0, np.maximum(sq_mean - mean * mean, 0), 0)
+        # like np.sum(edges) / (w * h) on the region: edges are 0 or 255
+        edge_density = np.where(
+            area > 0, self.box_sums(self.edge_sums, x1, y1, x2, y2) / safe_area, 0
+        )
+        return variance, edge_density
+
+    def validate(
+        self,
+        boxes: np.ndarray,
+        min_variance: float = MIN_VARIANCE,
+        min_edge_density: float = MIN_EDGE_DENSITY,
+    ) -> np.ndarray:
+        """Boolean mask of the (x, y, w, h) boxes that look like text."""
+        if not len(boxes):
+            return np.zeros(0, dtype=bool)
+        boxes = np.asarray(boxes, dtype=np.int64)
+        w = boxes[:, 2]
+        h = boxes[:, 3]
+        keep = (
+            (w >= MIN_SIZE)
+            & (h >= MIN_SIZE)
+            & (w <= self.width * MAX_PAGE_RATIO)
+            & (h <= self.height * MAX_PAGE_RATIO)
+        )
+        aspect_ratio = w / np.maximum(h, 1)
+        keep &= (aspect_ratio >= MIN_ASPECT_RATIO) & (aspect_ratio <= MAX_ASPECT_RATIO)
+        # statistics only for the boxes still candidates:
+        candidates = np.flatnonzero(keep)
+        variance, edge_density = self.statistics(boxes[candidates])
+        keep[candidates] = (variance >= min_variance) & (edge_density >= min_edge_density)
+        return keep
+
+
+def filter_regions(
+    gray: np.ndarray,
+    regions: List[Tuple[int, int, int, int]],
+    min_variance: float = MIN_VARIANCE,
+    min_edge_density: float = MIN_EDGE_DENSITY,
+) -> List[Tuple[int, int, int, int]]:
+    """Keep the (x, y, w, h) regions of ``gray`` that look like text."""
+    if not regions:
+        return []
+    boxes = np.asarray(regions, dtype=np.int64).reshape(-1, 4)
+    keep = RegionValidator(gray).validate(boxes, min_variance, min_edge_density)
+    return [tuple(int(v) for v in box) for box in boxes[keep]]
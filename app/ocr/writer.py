@@ -0,0 +1,125 @@
+import os
+import queue
+import sys
+import threading
+import traceback
+from multiprocessing.util import Finalize
+from typing import Any, Callable, Dict, List, Optional
+
+
+class BackgroundWriter:
+    """
+    A thread writing the outputs of the pages (JSON, annotated image) while
+    the process goes on with the analysis of the next pages.
+
+    The queue is bounded: when ``max_pending`` writes are waiting,
+    ``submit()`` blocks until the disk catches up, so memory stays bounded.
+    A write that fails doesn't stop the others, its error is kept until
+    ``pop_failures()``. With a ``reports`` queue (``set_write_reports()``),
+    each write submitted with ``report=True`` (the outputs of a page), done
+    or failed, is reported there instead: the parent process of a pool
+    learns which outputs are on the disk, including the ones written when
+    the worker exits.
+
+    Usage:
+        writer = get_writer(max_pending=4)
+        writer.submit(str(image_path), save_results, results, annotated)
+        ...
+        failures = writer.pop_failures()
+    """
+
+    def __init__(self, max_pending: int, reports: Optional[Any] = None):
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, max_pending))
+        self._reports = reports
+        self._failures: List[Dict[str, str]] = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._run, name="output-writer", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                key, func, args, report = item
+                failure: Optional[Dict[str, str]] = None
+                try:
+                    func(*args)
+                except Exception as e:
+                    failure = {
+                        "image": key,
+                        "error": f"Writing outputs: {e}",
+                        "traceback": traceback.format_exc(),
+                    }
+                if report and self._reports is not None:
+                    self._reports.put((key, failure))
+                elif failure is not None:
+                    with self._lock:
+                        self._failures.append(failure)
+            finally:
+                self._queue.task_done()
+
+    def submit(
+        self, key: str, func: Callable[..., Any], *args: Any, report: bool = True
+    ) -> None:
+        """
+        Queue ``func(*args)`` (blocks while the queue is full). ``report`` =
+        False: never reported to the parent (files that aren't outputs of a
+        page, like caches), only its failure is kept for ``pop_failures()``.
+        """
+        self._queue.put((key, func, args, report))
+
+    def flush(self) -> None:
+        """Wait until all the writes submitted are done."""
+        self._queue.join()
+
+    def pop_failures(self) -> List[Dict[str, str]]:
+        with self._lock:
+            failures, self._failures = self._failures, []
+        return failures
+
+    def close(self) -> None:
+        """Finish the pending writes then stop the thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        # nobody will ask for them anymore:
+        for failure in self.pop_failures():
+            sys.stderr.write(f"{failure['image']}: {failure['error']}\n")
+
+
+_writer: Optional[BackgroundWriter] = None
+_writer_pid: Optional[int] = None
+_writer_lock = threading.Lock()
+# ``mp.Queue`` of the pool the process belongs to, None = no reports
+_reports: Optional[Any] = None
+
+
+def set_write_reports(reports: Optional[Any]) -> None:
+    """
+    Called by the ``mp.Pool`` initializer: the writes of the process are
+    reported to the parent as ``(key, failure or None)`` tuples.
+    """
+    global _reports
+    _reports = reports
+
+
+def get_writer(max_pending: int) -> BackgroundWriter:
+    """
+    Writer of the current process, created on first use (and after a fork:
+    threads don't survive it). It's closed, pending writes done, when the
+    process exits normally, including ``mp.Pool`` workers (``pool.close()``
+    + ``pool.join()``, or ``maxtasksperchild``), but not after
+    ``pool.terminate()``.
+    """
+    global _writer, _writer_pid
+    with _writer_lock:
+        if _writer is None or _writer_pid != os.getpid():
+            _writer = BackgroundWriter(max_pending, _reports)
+            _writer_pid = os.getpid()
+            # before the ``mp.Queue`` of the reports closes (priority 10):
+            Finalize(_writer, _writer.close, exitpriority=20)
+        return _writer
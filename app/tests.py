@@ -1,3 +1,91 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
 from django.test import TestCase
+from django.utils import timezone
+
+from app.models.ocr_job import OcrJob
+
+
+class OcrJobTest(TestCase):
+    """Leases of the distributed queue (the single UPDATE of SQLite)."""
+
+    def setUp(self):
+        for n in range(5):
+            OcrJob.objects.create(source='/src', page=f'page-{n}.png',
+                                  folder_dst='/dst')
+
+    def expire(self, jobs):
+        OcrJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            lease_expires=timezone.now() - timedelta(seconds=1))
+
+    def test_claim_disjoint_batches(self):
+        first = OcrJob.claim('a', 2, 60)
+        second = OcrJob.claim('b', 2, 60)
+        third = OcrJob.claim('c', 2, 60)
+        self.assertEqual([len(first), len(second), len(third)], [2, 2, 1])
+        self.assertEqual(OcrJob.claim('d', 2, 60), [])
+        pages = [job.page for job in first + second + third]
+        self.assertEqual(sorted(pages), [f'page-{n}.png' for n in range(5)])
+        for jobs, worker in [(first, 'a'), (second, 'b'), (third, 'c')]:
+            self.assertEqual({job.worker for job in jobs}, {worker})
+            self.assertEqual(len({job.lease_token for job in jobs}), 1)
+            for job in jobs:
+                self.assertEqual(job.status, OcrJob.Status.RUNNING)
+                self.assertEqual(job.attempts, 1)
+                self.assertGreater(job.lease_expires, timezone.now())
+
+    def test_expired_lease_claimed_again(self):
+        lost = OcrJob.claim('a', 5, 60)
+        self.expire(lost[:2])
+        again = OcrJob.claim('b', 5, 60)
+        self.assertEqual([job.pk for job in again],
+                         [job.pk for job in lost[:2]])
+        self.assertEqual([job.attempts for job in again], [2, 2])
+        # the first worker can't store its results any more:
+        self.assertFalse(lost[0].complete([], b'', {}))
+        self.assertFalse(lost[0].fail('error'))
+        self.assertEqual(OcrJob.renew(lost[0].lease_token, 60), 3)
+        self.assertTrue(again[0].complete([[0, 0, 1, 1]], b'\0', {'ok': 1}))
+        job = OcrJob.objects.get(pk=again[0].pk)
+        self.assertEqual(job.status, OcrJob.Status.DONE)
+        self.assertEqual(job.result, {'ok': 1})
+
+    def test_renew(self):
+        jobs = OcrJob.claim('a', 5, 60)
+        self.expire(jobs)
+        self.assertEqual(OcrJob.renew(jobs[0].lease_token, 60), 5)
+        self.assertEqual(OcrJob.claim('b', 5, 60), [])
+
+    def test_fail_retried_then_failed(self):
+        OcrJob.objects.exclude(page='page-0.png').delete()
+        for attempt in range(1, 4):
+            job, = OcrJob.claim('a', 1, 60)
+            self.assertEqual(job.attempts, attempt)
+            self.assertTrue(job.fail('error'))
+        job = OcrJob.objects.get()
+        self.assertEqual(job.status, OcrJob.Status.FAILED)
+        self.assertEqual(job.error, 'error')
+        self.assertEqual(OcrJob.claim('a', 1, 60), [])
+
+    def test_fail_expired(self):
+        OcrJob.objects.update(max_attempts=1)
+        jobs = OcrJob.claim('a', 5, 60)
+        self.expire(jobs[:2])
+        # last attempt: not claimed again, failed
+        self.assertEqual(OcrJob.claim('b', 5, 60), [])
+        self.assertEqual(OcrJob.fail_expired(), 2)
+        self.assertEqual(
+            OcrJob.objects.filter(status=OcrJob.Status.FAILED).count(), 2)
+        self.assertEqual(
+            OcrJob.objects.filter(status=OcrJob.Status.RUNNING).count(), 3)
+
 
-# Create your tests here.
+@mock.patch.object(connection.features, 'has_select_for_update_skip_locked',
+                   True)
+class OcrJobSkipLockedTest(OcrJobTest):
+    """
+    Same tests, claimed by the ``SELECT ... FOR UPDATE SKIP LOCKED`` branch
+    (without the lock on SQLite, which ignores ``select_for_update()``).
+    """
@@ -1,14 +1,15 @@
 import binascii
 import math
-import os
-import tempfile
+import queue
 from base64 import b64decode
 
 import cv2
-import pytesseract
+import numpy as np
+from django.conf import settings
 from django.http import JsonResponse
 from django.utils.translation import gettext_lazy as _
 
+from app.ocr.engine_pool import get_pool
 from app.views.json.base import BaseJsonView
 
 
@@ -43,20 +44,20 @@ class TextDetectByUploadView(BaseJsonView):
         except binascii.Error:
             return self.json_error(_("bad image data"))
 
-        f, tmp_name = tempfile.mkstemp(suffix=f'.{img_type}')
-        try:
-            os.write(f, image_data)
-            os.close(f)
-            img = cv2.imread(tmp_name)
-        finally:
-            os.remove(tmp_name)
+        img = cv2.imdecode(np.frombuffer(image_data, np.uint8),
+                           cv2.IMREAD_COLOR)
+        if img is None:
+            return self.json_error(_("bad image data"))
 
         (height, width) = img.shape[:2]
         # round to upper int multiple of 32:
         height = max(32, math.ceil(height / 32) * 32)
         width = max(32, math.ceil(width / 32) * 32)
         img = cv2.resize(img, (width, height))
-        print(pytesseract.image_to_string(img))
-        return JsonResponse({'success': True,
-                             'result': pytesseract.image_to_string(img)},
-                            safe=False)
+        try:
+            with get_pool().borrow(
+                    timeout=settings.TESSERACT_POOL_TIMEOUT) as engine:
+                result = engine.image_to_string(img)
+        except queue.Empty:
+            return self.json_error(_("OCR engines busy, try again later"))
+        return JsonResponse({'success': True, 'result': result}, safe=False)
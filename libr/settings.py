@@ -80,6 +80,14 @@ environment_variables = LazyDict({
     'THUMBNAIL_DIMENSIONS': {
         'default': '(1125, 2436)',  # iPhone X resolution
         'parser': [eval, lambda v: (type(v) is tuple) and len(v) == 2]},
+    # OCR: number of Tesseract engines kept alive by each web worker:
+    'TESSERACT_POOL_SIZE': {
+        'default': '2',
+        'parser': [eval, lambda v: isinstance(v, int) and v > 0]},
+    'TESSERACT_POOL_TIMEOUT': {
+        'default': '30',
+        'parser': [eval, lambda v: isinstance(v, (int, float)) and v > 0]},
+    'TESSERACT_LANG': {'default': 'eng'},
 
     # https://docs.djangoproject.com/en/dev/ref/settings/
     'ALLOWED_HOSTS': {
@@ -150,6 +158,9 @@ UPLOAD_FOLDER_CHATS_DOCUMENT = settings['UPLOAD_FOLDER_CHATS_DOCUMENT']
 UPLOAD_FOLDER_IMAGES = settings['UPLOAD_FOLDER_IMAGES']
 THUMBNAIL_SUBDIRECTORY = settings['THUMBNAIL_SUBDIRECTORY']
 THUMBNAIL_DIMENSIONS = settings['THUMBNAIL_DIMENSIONS']
+TESSERACT_POOL_SIZE = settings['TESSERACT_POOL_SIZE']
+TESSERACT_POOL_TIMEOUT = settings['TESSERACT_POOL_TIMEOUT']
+TESSERACT_LANG = settings['TESSERACT_LANG']
 ALLOWED_HOSTS = settings['ALLOWED_HOSTS']
 INTERNAL_IPS = settings['INTERNAL_IPS']
 STATIC_ROOT = settings['STATIC_ROOT']
@@ -0,0 +1,98 @@
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+from app.ocr.consensus import agree, align, vote, words_to_reading
+
+
+def vote_reference(readings):
+    """
+    Readings of the same length (substitutions only): the character of
+    highest total confidence at each position, the most confident reading
+    on a tie.
+    """
+    pivot = max(readings, key=lambda reading: np.mean(reading[1]))[0]
+    text = []
+    for position, pivot_char in enumerate(pivot):
+        votes = defaultdict(float)
+        for reading_text, confidences in readings:
+            votes[reading_text[position]] += max(confidences[position], 1.0)
+        best = max(votes.values())
+        text.append(
+            pivot_char
+            if votes[pivot_char] == best
+            else next(c for c, v in votes.items() if v == best)
+        )
+    return "".join(text)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_vote_substitutions_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    truth = "The quick brown fox jumps over the lazy dog, 1234567890."
+    readings = []
+    for _ in range(3):
+        text = list(truth)
+        # a few isolated misreadings, by characters absent from the text:
+        for position in rng.choice(np.arange(0, len(truth), 4), 3, replace=False):
+            text[position] = "#%&"[int(rng.integers(0, 3))]
+        readings.append(
+            ("".join(text), rng.integers(0, 100, len(truth)).astype(float).tolist())
+        )
+    assert vote(readings) == vote_reference(readings)
+
+
+def test_vote_majority():
+    readings = [
+        ("cat", [90.0, 90.0, 90.0]),
+        ("cot", [60.0, 60.0, 60.0]),
+        ("cot", [60.0, 60.0, 60.0]),
+    ]
+    assert vote(readings) == "cot"
+    assert vote(readings[:2]) == "cat"
+
+
+def test_vote_insertions_and_deletions():
+    readings = [
+        ("hello", [80.0] * 5),
+        ("helo", [70.0] * 4),
+        ("hello!", [70.0] * 6),
+        ("hello", [60.0] * 5),
+    ]
+    assert vote(readings) == "hello"
+    assert vote([("ab", [50.0, 50.0]), ("a-b", [60.0] * 3), ("a-b", [60.0] * 3)]) == (
+        "a-b"
+    )
+
+
+def test_vote_one_reading():
+    assert vote([("same", [10.0] * 4)]) == "same"
+    assert vote([("", []), ("x", [50.0])]) == "x"
+
+
+def test_align():
+    chars, gaps = align("abc", ("aXbcd", [10.0, 20.0, 30.0, 40.0, 50.0]))
+    assert [c for c, _ in chars] == ["a", "b", "c"]
+    assert [g for g, _ in gaps] == ["", "X", "", "d"]
+    assert gaps[1][1] == 20.0
+    chars, gaps = align("abc", ("ac", [10.0, 30.0]))
+    assert chars == [("a", 10.0), ("", 20.0), ("c", 30.0)]
+
+
+def test_agree():
+    assert agree([("a  b\nc", [0.0] * 6), ("a b c", [0.0] * 5)])
+    assert not agree([("a b", [0.0] * 3), ("a c", [0.0] * 3)])
+
+
+def test_words_to_reading():
+    data = {
+        "block_num": [1, 1, 1],
+        "par_num": [1, 1, 1],
+        "line_num": [1, 1, 2],
+        "text": ["ab", "c", "d"],
+        "conf": [90, -1, 50],
+    }
+    text, confidences = words_to_reading(data, [0, 1, 2])
+    assert text == "ab c\nd"
+    assert confidences == [90.0, 90.0, 90.0, 0.0, 0.0, 50.0]
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from app.ocr.east import (
+    decode_predictions,
+    decode_predictions_loop,
+    non_max_suppression,
+)
+
+
+def non_max_suppression_reference(boxes, probs, overlap_thresh=0.5):
+    """imutils.object_detection.non_max_suppression, returning indices."""
+    boxes = boxes.astype(np.float32)
+    x1, y1, x2, y2 = boxes.T
+    area = (x2 - x1 + 1) * (y2 - y1 + 1)
+    idxs = list(np.argsort(probs))
+    pick = []
+    while idxs:
+        i = idxs.pop()
+        pick.append(i)
+        kept = []
+        for j in idxs:
+            w = max(0, min(x2[i], x2[j]) - max(x1[i], x1[j]) + 1)
+            h = max(0, min(y2[i], y2[j]) - max(y1[i], y1[j]) + 1)
+            if (w * h) / area[j] <= overlap_thresh:
+                kept.append(j)
+        idxs = kept
+    return pick
+
+
+def random_maps(rng, rows=20, cols=24):
+    scores = rng.random((1, 1, rows, cols), dtype=np.float32)
+    geometry = np.empty((1, 5, rows, cols), dtype=np.float32)
+    geometry[0, :4] = rng.random((4, rows, cols), dtype=np.float32) * 40
+    geometry[0, 4] = (rng.random((rows, cols), dtype=np.float32) - 0.5) * np.pi / 2
+    return scores, geometry
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("min_confidence", [0.0, 0.5, 0.9])
+def test_decode_predictions_matches_loop(seed, min_confidence):
+    scores, geometry = random_maps(np.random.default_rng(seed))
+    expected = decode_predictions_loop(scores, geometry, min_confidence)
+    actual = decode_predictions(scores, geometry, min_confidence)
+    assert len(actual) == len(expected)
+    for a, e in zip(actual, expected):
+        np.testing.assert_array_equal(a, e)
+
+
+def test_decode_predictions_nothing_confident():
+    scores, geometry = random_maps(np.random.default_rng(0))
+    boxes, confidences, angles = decode_predictions(scores, geometry, 1.1)
+    assert len(boxes) == len(confidences) == len(angles) == 0
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("overlap_thresh", [0.1, 0.5, 0.9])
+def test_non_max_suppression_matches_reference(seed, overlap_thresh):
+    rng = np.random.default_rng(seed)
+    starts = rng.integers(0, 200, (300, 2))
+    sizes = rng.integers(5, 60, (300, 2))
+    boxes = np.concatenate([starts, starts + sizes], axis=1)
+    probs = rng.random(300)
+    expected = non_max_suppression_reference(boxes, probs, overlap_thresh)
+    actual = non_max_suppression(boxes, probs, overlap_thresh)
+    assert actual.tolist() == expected
+
+
+def test_non_max_suppression_empty():
+    assert len(non_max_suppression(np.zeros((0, 4)), np.zeros(0))) == 0
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from app.ocr.features import (
+    FONT_PATCH_SIZE,
+    HOG_FEATURES,
+    font_patches,
+    hog_features,
+    hog_features_skimage,
+)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_hog_features_matches_skimage(seed):
+    rng = np.random.default_rng(seed)
+    images = [
+        rng.integers(0, 256, (int(h), int(w)), dtype=np.uint8)
+        for h, w in rng.integers(10, 200, (20, 2))
+    ]
+    patches = font_patches(images)
+    assert patches.shape == (20, FONT_PATCH_SIZE, FONT_PATCH_SIZE)
+    actual = hog_features(patches)
+    expected = np.array([hog_features_skimage(patch) for patch in patches])
+    assert actual.shape == (20, HOG_FEATURES)
+    np.testing.assert_allclose(actual, expected, atol=1e-4)
+
+
+def test_hog_features_flat_patch():
+    patches = np.full((2, FONT_PATCH_SIZE, FONT_PATCH_SIZE), 128, dtype=np.uint8)
+    np.testing.assert_allclose(
+        hog_features(patches), [hog_features_skimage(patch) for patch in patches]
+    )
+
+
+def test_hog_features_binarized():
+    """Gradients exactly on bin boundaries (45, 135 degrees) fall in the same bin."""
+    rng = np.random.default_rng(0)
+    images = [
+        np.where(rng.random((40, 120)) < 0.3, 0, 255).astype(np.uint8)
+        for _ in range(10)
+    ]
+    patches = font_patches(images)
+    np.testing.assert_allclose(
+        hog_features(patches),
+        [hog_features_skimage(patch) for patch in patches],
+        atol=1e-4,
+    )
@@ -0,0 +1,164 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.ocr.font_store import FontStore
+
+DIM = 16
+
+
+def fill(store, rng, pages=10, regions=5):
+    """Random features of ``pages`` pages, some analyzed again (dead rows)."""
+    features = {}
+    for n in [*range(pages), 2, 7, 2]:
+        page = f"page-{n}.png"
+        count = int(rng.integers(1, regions + 1))
+        boxes = [(i, (i, i, 10, 10)) for i in range(count)]
+        page_features = rng.random((count, DIM), dtype=np.float32)
+        store.append(page, boxes, page_features)
+        for (region_id, _), vector in zip(boxes, page_features):
+            features[page, region_id] = vector
+        # regions of the previous analysis of the page aren't live any more:
+        features = {
+            key: value
+            for key, value in features.items()
+            if key[0] != page or key[1] < count
+        }
+    return features
+
+
+def nearest_reference(features, query, k, exclude=None):
+    distances = sorted(
+        (float(np.linalg.norm(vector - query)), key)
+        for key, vector in features.items()
+        if key != exclude
+    )
+    return distances[:k]
+
+
+def test_append_find(tmp_path):
+    store = FontStore(tmp_path, DIM)
+    features = fill(store, np.random.default_rng(0))
+    assert store.live_rows == len(features)
+    assert store.dead_rows > 0
+    for (page, region_id), vector in features.items():
+        np.testing.assert_array_equal(store.vector(store.find(page, region_id)), vector)
+    assert store.find("page-0.png", 99) is None
+    assert store.find("unknown.png", 0) is None
+
+
+def test_nearest_matches_brute_force(tmp_path, monkeypatch):
+    monkeypatch.setattr(FontStore, "SEARCH_CHUNK_ROWS", 4)
+    store = FontStore(tmp_path, DIM)
+    rng = np.random.default_rng(1)
+    features = fill(store, rng)
+    for k in (1, 5, 1000):
+        query = rng.random(DIM, dtype=np.float32)
+        expected = nearest_reference(features, query, k)
+        actual = store.nearest(query, k)
+        assert [(page, region_id) for page, region_id, _, _ in actual] == [
+            key for _, key in expected
+        ]
+        np.testing.assert_allclose(
+            [distance for *_, distance in actual],
+            [distance for distance, _ in expected],
+            rtol=1e-4,
+            atol=1e-4,
+        )
+    row = store.find("page-2.png", 0)
+    actual = store.nearest(store.vector(row), 3, exclude=row)
+    expected = nearest_reference(
+        features, features["page-2.png", 0], 3, ("page-2.png", 0)
+    )
+    assert [(page, region_id) for page, region_id, _, _ in actual] == [
+        key for _, key in expected
+    ]
+
+
+def test_reload(tmp_path):
+    store = FontStore(tmp_path, DIM)
+    features = fill(store, np.random.default_rng(2))
+    reloaded = FontStore(tmp_path, DIM)
+    assert reloaded.pages == store.pages
+    assert reloaded.next_id == store.next_id
+    for (page, region_id), vector in features.items():
+        np.testing.assert_array_equal(
+            reloaded.vector(reloaded.find(page, region_id)), vector
+        )
+
+
+def test_partial_row_ignored(tmp_path):
+    store = FontStore(tmp_path, DIM)
+    features = fill(store, np.random.default_rng(3))
+    rows = store.rows_count()
+    # an interrupted run: half a row, and an index line without its rows
+    with open(store.data_path, "ab") as f:
+        f.write(b"\0" * (store.row_bytes // 2))
+    with open(store.index_path, "a", encoding="utf-8") as f:
+        f.write(
+            '{"page": "lost.png", "id": 99, "start": %d, "regions": [[0, 0, 0, 1, 1]]}\n'
+            % rows
+        )
+        f.write('{"page": "truncat')
+    reloaded = FontStore(tmp_path, DIM)
+    assert reloaded.rows_count() == rows
+    assert "lost.png" not in reloaded.pages
+    assert reloaded.live_rows == len(features)
+    # the next append drops the partial row
+    reloaded.append("new.png", [(0, (0, 0, 1, 1))], np.ones((1, DIM)))
+    np.testing.assert_array_equal(reloaded.vector(reloaded.find("new.png", 0)), 1)
+    assert reloaded.rows_count() == rows + 1
+
+
+def test_compact(tmp_path):
+    store = FontStore(tmp_path, DIM)
+    features = fill(store, np.random.default_rng(4))
+    ids = {page: entry["id"] for page, entry in store.pages.items()}
+    store.compact()
+    assert store.generation == 1
+    assert store.dead_rows == 0
+    assert store.rows_count() == len(features)
+    for reloaded in (store, FontStore(tmp_path, DIM)):
+        assert reloaded.generation == 1
+        assert {page: entry["id"] for page, entry in reloaded.pages.items()} == ids
+        for (page, region_id), vector in features.items():
+            np.testing.assert_array_equal(
+                reloaded.vector(reloaded.find(page, region_id)), vector
+            )
+    # ids keep increasing after a compaction:
+    store.append("new.png", [(0, (0, 0, 1, 1))], np.ones((1, DIM)))
+    assert store.pages["new.png"]["id"] == max(ids.values()) + 1
+
+
+def test_compact_interrupted_between_renames(tmp_path, monkeypatch):
+    store = FontStore(tmp_path, DIM)
+    features = fill(store, np.random.default_rng(5))
+    replace = os.replace
+
+    def replace_data_only(src, dst):
+        if dst == store.index_path:
+            raise KeyboardInterrupt
+        replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", replace_data_only)
+    with pytest.raises(KeyboardInterrupt):
+        store.compact()
+    monkeypatch.setattr(os, "replace", replace)
+    reloaded = FontStore(tmp_path, DIM)
+    assert reloaded.generation == 1
+    assert not store.index_path.with_suffix(".tmp").exists()
+    for (page, region_id), vector in features.items():
+        np.testing.assert_array_equal(
+            reloaded.vector(reloaded.find(page, region_id)), vector
+        )
+
+
+def test_generation_mismatch(tmp_path):
+    store = FontStore(tmp_path, DIM)
+    fill(store, np.random.default_rng(6))
+    old_index = store.index_path.read_bytes()
+    store.compact()
+    store.index_path.write_bytes(old_index)
+    with pytest.raises(ValueError):
+        FontStore(tmp_path, DIM)
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from app.ocr import merge
+from app.ocr.merge import merge_regions
+
+
+def merge_regions_reference(regions, pad_x=0, pad_y=0):
+    """Merge any two touching (once padded) boxes until none touch."""
+    boxes = [list(region) for region in regions]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                (ax, ay, aw, ah), (bx, by, bw, bh) = boxes[i], boxes[j]
+                if (
+                    ax - pad_x <= bx + bw + pad_x
+                    and bx - pad_x <= ax + aw + pad_x
+                    and ay - pad_y <= by + bh + pad_y
+                    and by - pad_y <= ay + ah + pad_y
+                ):
+                    x, y = min(ax, bx), min(ay, by)
+                    boxes[i] = [
+                        x,
+                        y,
+                        max(ax + aw, bx + bw) - x,
+                        max(ay + ah, by + bh) - y,
+                    ]
+                    del boxes[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return sorted(tuple(box) for box in boxes)
+
+
+def random_regions(rng, count, page=500, size=30):
+    xy = rng.integers(0, page, (count, 2))
+    wh = rng.integers(1, size, (count, 2))
+    return [tuple(int(v) for v in box) for box in np.concatenate([xy, wh], axis=1)]
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("pad", [(0, 0), (3, 0), (2, 5)])
+def test_merge_regions_matches_reference(seed, pad):
+    regions = random_regions(np.random.default_rng(seed), 150)
+    expected = merge_regions_reference(regions, *pad)
+    actual = merge_regions(regions, *pad)
+    assert sorted(actual) == expected
+    assert actual == sorted(actual, key=lambda box: (box[0], box[1]))
+
+
+def test_merge_regions_small_chunks(monkeypatch):
+    """Candidate pairs split over many chunks give the same result."""
+    regions = random_regions(np.random.default_rng(0), 300, page=300)
+    expected = merge_regions(regions, 1, 1)
+    monkeypatch.setattr(merge, "CANDIDATES_CHUNK", 7)
+    assert merge_regions(regions, 1, 1) == expected
+
+
+def test_merge_regions_transitive():
+    # the merged box of the first two overlaps the third one, neither did:
+    regions = [(0, 0, 10, 2), (8, 0, 2, 20), (0, 18, 3, 3)]
+    assert merge_regions(regions) == [(0, 0, 10, 21)]
+
+
+def test_merge_regions_touching_and_apart():
+    assert merge_regions([(0, 0, 5, 5), (5, 0, 5, 5)]) == [(0, 0, 10, 5)]
+    assert merge_regions([(0, 0, 5, 5), (6, 0, 5, 5)]) == [(0, 0, 5, 5), (6, 0, 5, 5)]
+    assert merge_regions([]) == []
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from app.ocr.metrics import edit_distance, error_counts, error_rates
+
+
+def edit_distance_reference(a, b):
+    """Levenshtein distance, dynamic programming row by row."""
+    previous = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        current = [i]
+        for j, y in enumerate(b, 1):
+            current.append(
+                min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (x != y))
+            )
+        previous = current
+    return previous[-1]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_edit_distance_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    alphabet = "abcde "[: int(rng.integers(1, 7))]
+    for _ in range(20):
+        a = "".join(rng.choice(list(alphabet), int(rng.integers(0, 80))))
+        b = "".join(rng.choice(list(alphabet), int(rng.integers(0, 80))))
+        assert edit_distance(a, b) == edit_distance_reference(a, b)
+        assert edit_distance(b, a) == edit_distance_reference(a, b)
+
+
+def test_edit_distance_long_sequences():
+    """Bit vectors longer than a machine word, and word sequences."""
+    rng = np.random.default_rng(0)
+    a = rng.integers(0, 30, 300).tolist()
+    b = [v if rng.random() < 0.8 else int(rng.integers(0, 30)) for v in a]
+    del b[50:60]
+    b[100:100] = [1, 2, 3]
+    assert edit_distance(a, b) == edit_distance_reference(a, b)
+    words = "the quick brown fox jumps over the lazy dog".split()
+    assert edit_distance(words, words[1:] + ["cat"]) == 2
+
+
+def test_edit_distance_edge_cases():
+    assert edit_distance("", "") == 0
+    assert edit_distance("abc", "") == 3
+    assert edit_distance("", "abc") == 3
+    assert edit_distance("kitten", "sitting") == 3
+
+
+def test_error_rates():
+    counts = [
+        error_counts("the  cat\nsat", "the cat sat"),
+        error_counts("a dog", "a dig"),
+    ]
+    assert counts[0]["char_errors"] == 0
+    assert counts[0]["word_errors"] == 0
+    rates = error_rates(counts)
+    assert rates["cer"] == pytest.approx(1 / (len("the cat sat") + len("a dog")))
+    assert rates["wer"] == pytest.approx(1 / 5)